@@ -6,3 +6,6 @@ default_app_config = "grunge.GrungeAppConfig"
 class GrungeAppConfig(AppConfig):
     name = "grunge"
     verbose_name = "Grunge"
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
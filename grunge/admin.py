@@ -1,13 +1,36 @@
+from uuid import UUID
+
 from django.conf import settings
-from django.contrib import admin
-from django.db.models import Count, F
-from django.urls import reverse
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Count, F, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.forms.models import BaseInlineFormSet
+from django.http import HttpResponseBadRequest, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django.utils.html import format_html
 from django.utils.translation import gettext as _
 from furl import furl
 from rest_framework.reverse import reverse as drf_reverse
 
-from .models import Album, Artist, Playlist, PlaylistTrack, Track
+from . import changes
+from .models import (
+    Album,
+    Artist,
+    ArtistSummary,
+    Playlist,
+    PlaylistChange,
+    PlaylistTrack,
+    SmartPlaylist,
+    StaleCooccurrence,
+    Track,
+)
+from .operations import reorder_playlist_tracks
+from .packed import pack_playlist, unpack_playlist
+from .pagination import EstimatedCountPaginator
 
 
 def get_api_url(obj, view="detail", params=None, title=None, request=None):
@@ -44,12 +67,13 @@ class ArtistDecadeActiveListFilter(admin.SimpleListFilter):
     parameter_name = "decade_active"
 
     def lookups(self, request, model_admin):
-        return (
-            ("1980", _("1980s")),
-            ("1990", _("1990s")),
-            ("2000", _("2000s")),
-            ("2010", _("2010s")),
-            ("2020", _("2020s")),
+        decades = 0
+        for mask in ArtistSummary.objects.values_list("decades", flat=True).distinct():
+            decades |= mask
+
+        return tuple(
+            (str(decade), _("%ds") % decade)
+            for decade in ArtistSummary.get_decades(decades)
         )
 
     def queryset(self, request, queryset):
@@ -59,14 +83,113 @@ class ArtistDecadeActiveListFilter(admin.SimpleListFilter):
             return queryset
 
         try:
-            year_since = int(value)
-            year_until = year_since + 10
+            decade = int(value)
         except ValueError:
             return queryset
 
-        return queryset.filter(
-            albums__year__gte=year_since, albums__year__lt=year_until
-        )
+        return queryset.filter(ArtistSummary.active_in(decade))
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """
+    Inline formset that only renders and saves one page of related objects,
+    chosen by the ``<prefix>-page`` query parameter.
+    """
+
+    per_page = 50
+    request = None
+
+    def get_queryset(self):
+        if not hasattr(self, "page"):
+            self.paginator = Paginator(super().get_queryset(), self.per_page)
+            self.page = self.paginator.get_page(
+                self.request.GET.get(self.page_query_param) if self.request else 1
+            )
+        return self.page.object_list
+
+    @property
+    def page_query_param(self):
+        return f"{self.prefix}-page"
+
+    def get_page_links(self):
+        """
+        Returns ``(label, url)`` pairs for the page navigation, where ``url``
+        is ``None`` for the current page and the ellipses.
+        """
+        self.get_queryset()
+        params = self.request.GET.copy()
+        links = []
+
+        for number in self.paginator.get_elided_page_range(self.page.number):
+            if number in (self.page.number, self.paginator.ELLIPSIS):
+                links.append((number, None))
+            else:
+                params[self.page_query_param] = number
+                links.append((number, f"?{params.urlencode()}"))
+
+        return links
+
+
+class PaginatedInlineMixin:
+    """
+    Splits large inlines into pages instead of rendering every row.
+    """
+
+    formset = PaginatedInlineFormSet
+    template = "admin/edit_inline/paginated_tabular.html"
+    per_page = 50
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.request = request
+        formset.per_page = self.per_page
+        return formset
+
+
+class IndexedSearchMixin:
+    """
+    Searches with indexed lookups only: a UUID finds its object by
+    equality, and any other term finds the objects whose name, or whose
+    ``search_relations``' name, starts with it, using the name search
+    indexes.  Related objects are matched first and then filtered on by
+    key, so no ``LIKE`` runs across a join.
+    """
+
+    search_fields = ("uuid", "name")
+    search_help_text = _("Search by UUID, or by the start of a name.")
+    search_relations = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        try:
+            uuid = UUID(search_term)
+        except ValueError:
+            pass
+        else:
+            return queryset.filter(uuid=uuid), False
+
+        query = Q(name__istartswith=search_term)
+        for relation in self.search_relations:
+            query |= self.get_relation_query(queryset.model, relation, search_term)
+        return queryset.filter(query), False
+
+    def get_relation_query(self, model, relation, search_term):
+        """
+        Matches the objects whose ``relation`` has a name starting with the
+        term, one foreign key per subquery, so each level filters on an
+        indexed column of its own table.
+        """
+        name, _, rest = relation.partition(LOOKUP_SEP)
+        related_model = model._meta.get_field(name).related_model
+        if rest:
+            query = self.get_relation_query(related_model, rest, search_term)
+        else:
+            query = Q(name__istartswith=search_term)
+        related = related_model._default_manager.filter(query).values("pk")
+        return Q(**{f"{name}__in": related})
 
 
 class ArtistAlbumInline(admin.TabularInline):
@@ -93,35 +216,32 @@ class ArtistAlbumInline(admin.TabularInline):
         )
 
 
-class AlbumTrackInline(admin.TabularInline):
+class AlbumTrackInline(PaginatedInlineMixin, admin.TabularInline):
     model = Track
     fields = ("number", "name")
     extra = 0
 
 
 @admin.register(Artist)
-class ArtistAdmin(admin.ModelAdmin):
+class ArtistAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ("name", "albums_admin_link")
     list_filter = (ArtistDecadeActiveListFilter,)
     fields = ("name", "uuid", "albums_admin_link", "artist_api_link")
     readonly_fields = ("uuid", "albums_admin_link", "artist_api_link")
-    search_fields = ("uuid", "name")
     inlines = (ArtistAlbumInline,)
 
     def get_queryset(self, request):
         self.request = request
         queryset = super().get_queryset(request)
-        return queryset.prefetch_related("albums").annotate(
-            album_count=Count("albums", distinct=True)
-        )
+        return queryset.select_related("summary")
 
-    @admin.display(description=_("Albums"), ordering="album_count")
+    @admin.display(description=_("Albums"), ordering="summary__album_count")
     def albums_admin_link(self, artist):
         return get_admin_url(
             Album,
             view="changelist",
             params={"artist": artist.pk},
-            title=artist.album_count or "0",
+            title=artist.summary.album_count or "0",
         )
 
     @admin.display(description=_("API"))
@@ -130,10 +250,10 @@ class ArtistAdmin(admin.ModelAdmin):
 
 
 @admin.register(Album)
-class AlbumAdmin(admin.ModelAdmin):
+class AlbumAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ("name", "artist_admin_link", "album_year", "tracks_admin_link")
     list_filter = ("year",)
-    search_fields = ("uuid", "name", "artist__name")
+    search_relations = ("artist",)
     fields = (
         "name",
         "year",
@@ -150,6 +270,8 @@ class AlbumAdmin(admin.ModelAdmin):
     )
     list_select_related = ("artist",)
     inlines = (AlbumTrackInline,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def has_add_permission(self, request):
         # Add albums from the Artist album inline
@@ -185,10 +307,10 @@ class AlbumAdmin(admin.ModelAdmin):
 
 
 @admin.register(Track)
-class TrackAdmin(admin.ModelAdmin):
+class TrackAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ("name", "artist_admin_link", "album_admin_link", "album_year")
     list_filter = ("album__year",)
-    search_fields = ("uuid", "name", "album__name", "album__artist__name")
+    search_relations = ("album", "album__artist")
     fields = (
         "name",
         "uuid",
@@ -206,6 +328,8 @@ class TrackAdmin(admin.ModelAdmin):
     )
     list_select_related = ("album", "album__artist")
     ordering = ("name", "album__artist__name", "album__name")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def has_add_permission(self, request):
         # Add tracks from the Album track inline
@@ -240,16 +364,202 @@ class TrackAdmin(admin.ModelAdmin):
     track_api_link.short_description = _("API")
 
 
-class PlaylistTrackInline(admin.TabularInline):
+class PlaylistTrackInline(PaginatedInlineMixin, admin.TabularInline):
     model = PlaylistTrack
     extra = 1
     fields = ["track", "order"]
     ordering = ["order"]
+    autocomplete_fields = ["track"]
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return queryset.select_related("playlist", "track__album__artist")
 
 
 @admin.register(Playlist)
 class PlaylistAdmin(admin.ModelAdmin):
-    list_display = ["name"]
-    list_filter = ["name"]
+    list_display = ["name", "storage"]
+    list_filter = ["name", "storage"]
     search_fields = ["name"]
+    readonly_fields = ["storage", "version"]
     inlines = [PlaylistTrackInline]
+    actions = ["convert_to_packed", "convert_to_rows"]
+    change_form_template = "admin/grunge/playlist/change_form.html"
+
+    def get_inline_edits(self, formsets):
+        """
+        Sorts the changed forms of the entry inline into those removing,
+        moving and adding entries.  An entry switching track is removed and
+        added again, as its pairs and the track it logs both change.
+        """
+        removed, moved, added = [], [], []
+        for formset in formsets:
+            if formset.model is not PlaylistTrack or not formset.has_changed():
+                continue
+            deleted = formset.deleted_forms
+            for form in formset.initial_forms:
+                if form in deleted:
+                    removed.append(form)
+                elif "track" in form.changed_data:
+                    removed.append(form)
+                    added.append(form)
+                elif "order" in form.changed_data:
+                    moved.append(form)
+            for form in formset.extra_forms:
+                if form.has_changed() and form not in deleted:
+                    added.append(form)
+        return removed, moved, added
+
+    def save_related(self, request, form, formsets, change):
+        Operation = PlaylistChange.Operation
+        removed, moved, added = self.get_inline_edits(formsets)
+        # The removed entries are read before the inline deletes or changes them
+        track_uuids = dict(
+            Track.objects.filter(
+                pk__in=[entry.initial["track"] for entry in removed]
+            ).values_list("pk", "uuid")
+        )
+        removals = [
+            (
+                entry.instance.uuid,
+                track_uuids.get(entry.initial["track"]),
+                entry.initial["order"],
+            )
+            for entry in removed
+        ]
+
+        super().save_related(request, form, formsets, change)
+
+        playlist_id = form.instance.pk
+        changes.record_entries(playlist_id, Operation.REMOVE, removals)
+        for operation, forms in ((Operation.MOVE, moved), (Operation.ADD, added)):
+            changes.record_entries(
+                playlist_id,
+                operation,
+                [
+                    (
+                        entry.instance.uuid,
+                        entry.instance.track.uuid,
+                        entry.instance.order,
+                    )
+                    for entry in forms
+                ],
+            )
+        track_ids = {entry.initial["track"] for entry in removed}
+        track_ids.update(entry.instance.track_id for entry in added)
+        if track_ids:
+            StaleCooccurrence.mark(track_ids)
+        # API clients holding the previous version no longer overwrite this
+        changed = form.has_changed() or any(f.has_changed() for f in formsets)
+        if change and changed:
+            form.instance.bump_version()
+
+    @admin.action(description=_("Convert to packed storage"))
+    def convert_to_packed(self, request, queryset):
+        for playlist in queryset.filter(storage=Playlist.Storage.ROWS):
+            pack_playlist(playlist)
+
+    @admin.action(description=_("Convert to row storage"))
+    def convert_to_rows(self, request, queryset):
+        for playlist in queryset.filter(storage=Playlist.Storage.PACKED):
+            unpack_playlist(playlist)
+
+    def get_urls(self):
+        return [
+            path(
+                "<path:object_id>/reorder/",
+                self.admin_site.admin_view(self.reorder_view),
+                name="grunge_playlist_reorder",
+            ),
+        ] + super().get_urls()
+
+    def reorder_view(self, request, object_id):
+        """
+        Lets admin users drag the playlist's tracks into a new order, which
+        is saved in a single bulk update.  Offered for row playlists of up
+        to ``ADMIN_REORDER_MAX_ENTRIES`` entries, as it lists every one.
+        """
+        playlist = get_object_or_404(Playlist, pk=object_id)
+        if not self.has_change_permission(request, playlist):
+            raise PermissionDenied
+
+        change_url = reverse("admin:grunge_playlist_change", args=(playlist.pk,))
+
+        if playlist.is_packed:
+            self.message_user(
+                request,
+                _("Packed playlists have no entries to reorder."),
+                messages.ERROR,
+            )
+            return HttpResponseRedirect(change_url)
+        # The page lists, and saves, the whole order at once
+        playlist_tracks = playlist.playlist_tracks.select_related(
+            "track__album__artist"
+        )
+        if playlist_tracks.count() > settings.ADMIN_REORDER_MAX_ENTRIES:
+            self.message_user(
+                request,
+                _(
+                    "Playlists of more than %d tracks are too long to reorder "
+                    "here; change the order of their tracks below instead."
+                )
+                % settings.ADMIN_REORDER_MAX_ENTRIES,
+                messages.ERROR,
+            )
+            return HttpResponseRedirect(change_url)
+
+        if request.method == "POST":
+            sequence = request.POST.get("sequence", "")
+            try:
+                reorder_playlist_tracks(playlist, filter(None, sequence.split(",")))
+            except ValueError as exc:
+                return HttpResponseBadRequest(str(exc))
+            playlist.bump_version()
+
+            self.message_user(
+                request, _("The tracks were reordered."), messages.SUCCESS
+            )
+            return HttpResponseRedirect(change_url)
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "original": playlist,
+            "title": _("Reorder %s") % playlist,
+            "change_url": change_url,
+            "playlist_tracks": playlist_tracks,
+        }
+        return TemplateResponse(request, "admin/grunge/playlist/reorder.html", context)
+
+
+@admin.register(SmartPlaylist)
+class SmartPlaylistAdmin(admin.ModelAdmin):
+    list_display = ("name", "artist", "year_from", "year_until", "sample_size")
+    search_fields = ("name",)
+    fields = (
+        "name",
+        "uuid",
+        "artist",
+        "year_from",
+        "year_until",
+        "name_contains",
+        "sample_size",
+        "seed",
+        "smart_playlist_api_link",
+    )
+    readonly_fields = ("uuid", "smart_playlist_api_link")
+    list_select_related = ("artist",)
+    autocomplete_fields = ("artist",)
+
+    def get_queryset(self, request):
+        self.request = request
+        return super().get_queryset(request)
+
+    @admin.display(description=_("Tracks"))
+    def smart_playlist_api_link(self, smart_playlist):
+        return get_api_url(
+            smart_playlist,
+            view="tracks",
+            title=_("Tracks"),
+            request=self.request,
+        )
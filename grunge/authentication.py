@@ -0,0 +1,157 @@
+import copy
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+GENERATION_KEY = "auth:tokens:generation"
+
+Entry = namedtuple("Entry", ("token", "expires", "generation"))
+
+
+class TokenCache:
+    """
+    The API tokens recently authenticated by this process, with their
+    users, so a request with one of them needs no query.
+
+    At most ``max_size`` tokens are kept in process, the least recently
+    used dropped first, each for ``timeout`` seconds.  With a ``shared``
+    cache, tokens are also kept there for the other workers, and
+    ``forget`` reaches their process caches through a generation stored
+    with it: process entries of an older generation are ignored.
+    """
+
+    def __init__(self, max_size, timeout, shared=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.shared = shared
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        # Counts forgets, so tokens read meanwhile are not cached
+        self.revision = 0
+
+    def get_shared_key(self, key):
+        return f"auth:token:{key}"
+
+    def get_generation(self):
+        """
+        Returns the generation to pass to ``get`` and ``set`` for a lookup.
+        """
+        shared_generation = None
+        if self.shared is not None:
+            shared_generation = self.shared.get_or_set(GENERATION_KEY, 0, timeout=None)
+        return self.revision, shared_generation
+
+    def get(self, key, generation):
+        """
+        Returns the cached token with ``key``, its user selected, or
+        ``None``.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if (
+                    entry.expires > time.monotonic()
+                    and entry.generation[1] == generation[1]
+                ):
+                    self.entries.move_to_end(key)
+                    return entry.token
+                del self.entries[key]
+
+        token = None
+        if self.shared is not None:
+            token = self.shared.get(self.get_shared_key(key))
+        if token is not None:
+            with self.lock:
+                self.add(key, token, generation)
+        return token
+
+    def set(self, key, token, generation):
+        """
+        Caches ``token`` unless one was forgotten since ``generation``.
+        """
+        if generation != self.get_generation():
+            return
+        if self.shared is not None:
+            self.shared.set(self.get_shared_key(key), token, self.timeout)
+        with self.lock:
+            self.add(key, token, generation)
+
+    def add(self, key, token, generation):
+        self.entries[key] = Entry(token, time.monotonic() + self.timeout, generation)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def forget(self, keys):
+        with self.lock:
+            self.revision += 1
+            for key in keys:
+                self.entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete_many([self.get_shared_key(key) for key in keys])
+            try:
+                self.shared.incr(GENERATION_KEY)
+            except ValueError:
+                self.shared.set(GENERATION_KEY, 1, timeout=None)
+
+
+_token_caches = {}
+_token_caches_lock = threading.Lock()
+
+
+def get_token_cache():
+    """
+    Returns this process's token cache, as configured by the
+    ``TOKEN_CACHE_*`` settings.
+    """
+    options = (
+        settings.TOKEN_CACHE_SIZE,
+        settings.TOKEN_CACHE_TIMEOUT,
+        settings.TOKEN_CACHE_ALIAS,
+    )
+    with _token_caches_lock:
+        if options not in _token_caches:
+            max_size, timeout, alias = options
+            shared = caches[alias] if alias else None
+            _token_caches[options] = TokenCache(max_size, timeout, shared)
+        return _token_caches[options]
+
+
+def forget_tokens(keys):
+    """
+    Drops the tokens with ``keys`` from the token caches, now and again
+    once the current transaction commits, as lookups meanwhile read them
+    as they were.
+    """
+
+    def forget():
+        with _token_caches_lock:
+            token_caches = list(_token_caches.values())
+        for token_cache in token_caches:
+            token_cache.forget(keys)
+
+    forget()
+    transaction.on_commit(forget)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that looks tokens up in the token cache before
+    the database.  Deleting a token, or saving its user, as when
+    deactivating them, drops it from the cache.
+    """
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        generation = token_cache.get_generation()
+        token = token_cache.get(key, generation)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token, generation)
+        # Each request gets its own user, as views may change it
+        return copy.copy(token.user), token
@@ -0,0 +1,270 @@
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .events import publish_playlist_change
+from .models import Album, CatalogueChange, PlaylistChange, Track
+
+# The values of a ``PlaylistTrack`` that adds, removes and moves record
+ENTRY_FIELDS = ("uuid", "track__uuid", "order")
+
+
+def record_entries(playlist_id, operation, entries):
+    """
+    Records one ``operation`` per ``(entry_uuid, track_uuid, order)`` of
+    ``entries`` with a single bulk insert.
+    """
+    created = PlaylistChange.objects.bulk_create(
+        PlaylistChange(
+            playlist_id=playlist_id,
+            operation=operation,
+            entry_uuid=entry_uuid,
+            track_uuid=track_uuid,
+            order=order,
+        )
+        for entry_uuid, track_uuid, order in entries
+    )
+    if created:
+        publish_playlist_change(playlist_id)
+
+
+def record_playlist_tracks(playlist, operation, playlist_tracks):
+    record_entries(playlist.pk, operation, playlist_tracks.values_list(*ENTRY_FIELDS))
+
+
+def record_removals(playlist_tracks):
+    """
+    Records the removal of the entries of the ``playlist_tracks`` queryset,
+    which may span playlists, with one query and a single bulk insert.
+    """
+    created = PlaylistChange.objects.bulk_create(
+        PlaylistChange(
+            playlist_id=playlist_id,
+            operation=PlaylistChange.Operation.REMOVE,
+            entry_uuid=entry_uuid,
+            track_uuid=track_uuid,
+            order=order,
+        )
+        for playlist_id, entry_uuid, track_uuid, order in playlist_tracks.values_list(
+            "playlist", *ENTRY_FIELDS
+        )
+    )
+    for playlist_id in {change.playlist_id for change in created}:
+        publish_playlist_change(playlist_id)
+
+
+def record_edits(playlist, previous_orders):
+    """
+    Records the entries added to the playlist and those moved since it had
+    ``previous_orders``, a mapping of its entries' primary keys to their
+    orders, with one query and at most two bulk inserts.
+    """
+    Operation = PlaylistChange.Operation
+    added, moved = [], []
+    for pk, *entry in playlist.playlist_tracks.values_list("pk", *ENTRY_FIELDS):
+        if pk not in previous_orders:
+            added.append(entry)
+        elif previous_orders[pk] != entry[2]:
+            moved.append(entry)
+    record_entries(playlist.pk, Operation.MOVE, moved)
+    record_entries(playlist.pk, Operation.ADD, added)
+
+
+def record_rename(playlist):
+    PlaylistChange.objects.create(
+        playlist=playlist, operation=PlaylistChange.Operation.RENAME, name=playlist.name
+    )
+    publish_playlist_change(playlist.pk)
+
+
+def get_snapshot(playlist, track_ids=None):
+    """
+    Returns the playlist's current name and entries in the format of
+    ``PlaylistChange.snapshot``.
+
+    Packed playlists pass their ``track_ids``; their entries have no UUIDs
+    and are ordered by position.
+    """
+    if track_ids is None:
+        entries = [
+            [str(entry_uuid), str(track_uuid), order]
+            for entry_uuid, track_uuid, order in playlist.playlist_tracks.values_list(
+                *ENTRY_FIELDS
+            )
+        ]
+    else:
+        tracks = Track.objects.in_bulk(track_ids)
+        entries = [
+            [None, str(tracks[track_id].uuid), order]
+            for order, track_id in enumerate(track_ids, start=1)
+            if track_id in tracks
+        ]
+    return {"name": playlist.name, "entries": entries}
+
+
+def record_snapshot(playlist, track_ids=None):
+    """
+    Records the playlist's whole current state, for writes that replace it
+    rather than edit single entries.
+    """
+    PlaylistChange.objects.create(
+        playlist=playlist,
+        operation=PlaylistChange.Operation.SNAPSHOT,
+        snapshot=get_snapshot(playlist, track_ids),
+    )
+    publish_playlist_change(playlist.pk)
+
+
+def apply_changes(changes, snapshot=None):
+    """
+    Replays ``changes`` over ``snapshot`` and returns the resulting state as
+    a snapshot.  This is what clients do with the change feed.
+    """
+    Operation = PlaylistChange.Operation
+
+    snapshot = snapshot or {"name": "", "entries": []}
+    name = snapshot["name"]
+    # Entries without a UUID come from packed playlists, keyed by position
+    entries = {entry[0] or entry[2]: entry for entry in snapshot["entries"]}
+
+    for change in changes:
+        entry_uuid = change.entry_uuid and str(change.entry_uuid)
+        if change.operation == Operation.SNAPSHOT:
+            name = change.snapshot["name"]
+            entries = {
+                entry[0] or entry[2]: entry for entry in change.snapshot["entries"]
+            }
+        elif change.operation == Operation.RENAME:
+            name = change.name
+        elif change.operation == Operation.ADD:
+            entries[entry_uuid] = [entry_uuid, str(change.track_uuid), change.order]
+        elif change.operation == Operation.REMOVE:
+            entries.pop(entry_uuid, None)
+        elif change.operation == Operation.MOVE and entry_uuid in entries:
+            entries[entry_uuid] = [*entries[entry_uuid][:2], change.order]
+
+    return {
+        "name": name,
+        "entries": sorted(entries.values(), key=lambda entry: entry[2]),
+    }
+
+
+def compact_playlist_changes(playlist, keep=None):
+    """
+    Replaces all but the ``keep`` latest changes of the playlist with one
+    snapshot of the state they lead to.
+
+    The snapshot takes the sequence number of the last change it replaces,
+    so a client whose token is older than it reads the snapshot, and a
+    client with a newer token still reads exactly the changes it missed.
+
+    Returns the number of changes removed.
+    """
+    keep = settings.PLAYLIST_CHANGE_LOG_LENGTH if keep is None else keep
+    changes = PlaylistChange.objects.filter(playlist=playlist)
+
+    with transaction.atomic():
+        last_id = next(
+            iter(changes.order_by("-id").values_list("id", flat=True)[keep:][:1]),
+            None,
+        )
+        if last_id is None:
+            return 0
+
+        compacted = changes.filter(id__lte=last_id)
+        base = (
+            compacted.filter(operation=PlaylistChange.Operation.SNAPSHOT)
+            .order_by("-id")
+            .first()
+        )
+        if base is not None and base.pk == last_id:
+            return 0
+
+        replayed = compacted if base is None else compacted.filter(id__gt=base.pk)
+        snapshot = apply_changes(
+            replayed.iterator(), None if base is None else base.snapshot
+        )
+        removed, _ = compacted.delete()
+        PlaylistChange.objects.create(
+            id=last_id,
+            playlist=playlist,
+            operation=PlaylistChange.Operation.SNAPSHOT,
+            snapshot=snapshot,
+        )
+
+    return removed - 1
+
+
+def record_catalogue_changes(written, created=()):
+    """
+    Moves the objects of ``written``, ``(kind, uuid, deleted)`` triples, to
+    the head of the catalogue change sequence, as upserts or as tombstones,
+    with one delete and one bulk insert.  The ``created`` UUIDs are of new
+    objects, with no previous row to replace.
+    """
+    written = list(written)
+    replaced = {}
+    for kind, uuid, deleted in written:
+        if uuid not in created:
+            replaced.setdefault(kind, []).append(uuid)
+
+    with transaction.atomic(savepoint=False):
+        CatalogueChange.lock()
+        if replaced:
+            CatalogueChange.objects.filter(
+                reduce(
+                    operator.or_,
+                    (
+                        Q(kind=kind, object_uuid__in=uuids)
+                        for kind, uuids in replaced.items()
+                    ),
+                )
+            ).delete()
+        CatalogueChange.objects.bulk_create(
+            CatalogueChange(kind=kind, object_uuid=uuid, deleted=deleted)
+            for kind, uuid, deleted in written
+        )
+
+
+def record_catalogue_write(
+    instance, created=False, deleted=False, album_ids=(), raw=False
+):
+    """
+    Records an upsert or a tombstone of an artist, album or track, and
+    those of the objects whose representation nests it or that it nests:
+    the albums listing a track, given as ``album_ids``, are upserted, and
+    an artist's albums and tracks, or an album's tracks, follow it.
+
+    Raw saves, such as fixture loading, record only the object itself, and
+    new artists and albums nest nothing yet.
+    """
+    Kind = CatalogueChange.Kind
+    kind = Kind(instance._meta.model_name)
+    written = [(kind, instance.uuid, deleted)]
+
+    if raw or (created and kind != Kind.TRACK):
+        pass
+    elif kind == Kind.TRACK:
+        albums = Album.objects.filter(pk__in=album_ids)
+        written += (
+            (Kind.ALBUM, uuid, False) for uuid in albums.values_list("uuid", flat=True)
+        )
+    else:
+        if kind == Kind.ARTIST:
+            albums = Album.objects.filter(artist=instance.pk)
+            tracks = Track.objects.filter(album__artist=instance.pk)
+            written += (
+                (Kind.ALBUM, uuid, deleted)
+                for uuid in albums.values_list("uuid", flat=True)
+            )
+        else:
+            tracks = Track.objects.filter(album=instance.pk)
+        written += (
+            (Kind.TRACK, uuid, deleted)
+            for uuid in tracks.values_list("uuid", flat=True)
+        )
+
+    record_catalogue_changes(written, created={instance.uuid} if created else ())
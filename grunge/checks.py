@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core import checks
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from .filters import get_tiebroken_ordering
+
+# The plan steps of a sort that the indexes did not spare
+SORT_STEPS = {
+    "sqlite": ("TEMP B-TREE FOR ORDER BY", "TEMP B-TREE FOR RIGHT PART OF ORDER BY"),
+    "postgresql": ("Sort  (", "Sort Key:"),
+}
+
+
+def get_ordered_viewsets():
+    from .viewsets import (
+        AlbumViewSet,
+        ArtistViewSet,
+        PlaylistViewSet,
+        SmartPlaylistViewSet,
+        TrackViewSet,
+    )
+
+    return (
+        ArtistViewSet,
+        AlbumViewSet,
+        TrackViewSet,
+        PlaylistViewSet,
+        SmartPlaylistViewSet,
+    )
+
+
+def get_ordering_plan(queryset, field, using):
+    """
+    Returns the query plan of the first page of ``queryset`` in the order
+    the API sorts it by ``field``.
+    """
+    queryset = queryset.using(using).order_by(*get_tiebroken_ordering(field))
+    return queryset[:100].explain()
+
+
+@checks.register(checks.Tags.database)
+def check_ordering_indexes(app_configs=None, databases=None, **kwargs):
+    """
+    Checks that every ordering the API allows is read in index order,
+    without sorting the rows.  These are warnings, so that ``migrate`` can
+    still add the missing indexes.
+    """
+    errors = []
+    for using in databases or ():
+        connection = connections[using]
+        sort_steps = SORT_STEPS.get(connection.vendor)
+        if sort_steps is None:
+            continue
+        # Run before the tables are migrated, there are no plans to check
+        tables = set(connection.introspection.table_names())
+
+        for viewset in get_ordered_viewsets():
+            queryset = viewset().get_queryset()
+            if queryset.model._meta.db_table not in tables:
+                continue
+            for field in viewset.ordering_fields:
+                for ordering in (field, f"-{field}"):
+                    plan = get_ordering_plan(queryset, ordering, using)
+                    if any(step in plan for step in sort_steps):
+                        errors.append(
+                            checks.Warning(
+                                f"Ordering by '{ordering}' sorts the rows on "
+                                f"the '{using}' database.",
+                                hint="Add an index on the ordering's columns, "
+                                "followed by the primary key, or refresh the "
+                                "planner's statistics with ANALYZE.",
+                                obj=viewset,
+                                id="grunge.W001",
+                            )
+                        )
+    return errors
+
+
+@checks.register(checks.Tags.caches)
+def check_events_cache(app_configs=None, **kwargs):
+    """
+    Checks that the cache events are shared through is shared between
+    workers, rather than kept in each process.
+    """
+    from .events import CacheBroker
+
+    broker_class = import_string(settings.PLAYLIST_EVENTS_BROKER)
+    backend = import_string(settings.CACHES["default"]["BACKEND"])
+    if issubclass(broker_class, CacheBroker) and issubclass(
+        backend, (DummyCache, LocMemCache)
+    ):
+        return [
+            checks.Error(
+                f"{settings.PLAYLIST_EVENTS_BROKER} shares playlist events "
+                "through the default cache, which is not shared between "
+                "workers.",
+                hint="Set CACHE_URL to a shared cache, such as Redis or "
+                "Memcached, or PLAYLIST_EVENTS_BROKER to "
+                "grunge.events.LocalBroker.",
+                id="grunge.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,242 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+    set_response_etag,
+)
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Responses shorter than this are not worth compressing
+MIN_LENGTH = 200
+
+# Pages such as the admin's and the browsable API's carry CSRF tokens,
+# which compression would expose to BREACH
+COMPRESSIBLE_TYPES = ("application/json",)
+
+# Random bytes added to gzip output, as GZipMiddleware does against BREACH
+MAX_RANDOM_BYTES = 100
+
+# The content codings available, in the order they are preferred
+CODINGS = {}
+if brotli is not None:
+    CODINGS["br"] = brotli.compress
+if zstandard is not None:
+    CODINGS["zstd"] = zstandard.ZstdCompressor().compress
+CODINGS["gzip"] = lambda content: compress_string(
+    content, max_random_bytes=MAX_RANDOM_BYTES
+)
+
+CACHED_HEADERS = ("Content-Type", "Content-Language", "Allow", "Vary")
+
+
+def get_accepted_coding(request, codings=CODINGS):
+    """
+    Returns the coding in ``codings`` the request's ``Accept-Encoding``
+    gives the highest weight, the earliest on a tie, or ``None`` if only
+    the identity coding is acceptable.
+    """
+    weights = {}
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, parameters = item.strip().partition(";")
+        weight = 1.0
+        name, _, value = parameters.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                continue
+        weights[coding.strip().lower()] = weight
+
+    accepted = [
+        (weights.get(coding, weights.get("*", 0)), -index, coding)
+        for index, coding in enumerate(codings)
+    ]
+    weight, _, coding = max(accepted, default=(0, 0, None))
+    return coding if weight > 0 else None
+
+
+def is_anonymous(request):
+    """
+    Returns whether the request carries no credentials, so its response is
+    the same for every client.  Checked before authentication runs.
+    """
+    return (
+        "Authorization" not in request.headers
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+def get_catalogue_generation():
+    return cache.get_or_set("responses:catalogue:generation", 0, timeout=None)
+
+
+def next_catalogue_generation():
+    try:
+        cache.incr("responses:catalogue:generation")
+    except ValueError:
+        cache.set("responses:catalogue:generation", 1, timeout=None)
+
+
+def invalidate_catalogue_responses():
+    """
+    Drops the cached catalogue responses, now and again once the current
+    transaction commits, as responses read meanwhile do not show the write.
+    """
+    next_catalogue_generation()
+    transaction.on_commit(next_catalogue_generation)
+
+
+def get_response_key(request):
+    url = hashlib.sha256(
+        f"{request.build_absolute_uri()}\n{request.headers.get('Accept', '')}".encode()
+    ).hexdigest()
+    return f"responses:catalogue:{get_catalogue_generation()}:{url}"
+
+
+def get_variant_key(etag, coding):
+    etag = hashlib.sha256(etag.encode()).hexdigest()
+    return f"responses:variant:{etag}:{coding or 'identity'}"
+
+
+def is_compressible(response):
+    content_type = response.get("Content-Type", "").partition(";")[0].strip()
+    return content_type in COMPRESSIBLE_TYPES and not response.has_header(
+        "Content-Encoding"
+    )
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses and caches the JSON responses of views with
+    ``cache_responses`` set, such as the catalogue API's, to anonymous
+    ``GET`` and ``HEAD`` requests: they hold no secrets, and are the same
+    for every client.  Other responses are left alone.
+
+    Responses are compressed in the coding the client prefers: brotli or
+    zstd when their packages are installed, and gzip.  They are cached
+    until the next catalogue write, with their compressed variants keyed
+    by ETag.  Hits are answered from the cache without running the view or
+    compressing again, and with ``304 Not Modified`` to a matching
+    ``If-None-Match``.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)
+        if (
+            request.method not in ("GET", "HEAD")
+            or not getattr(view_class, "cache_responses", False)
+            or not is_anonymous(request)
+        ):
+            return None
+
+        request._compress = True
+        request._response_key = get_response_key(request)
+        cached = cache.get(request._response_key)
+        if cached is None:
+            return None
+
+        coding = get_accepted_coding(request)
+        content = self.get_variant(cached["etag"], coding)
+        if content is None:
+            return None
+
+        # Already cached, and compressed
+        request._response_key = None
+        response = HttpResponse(content)
+        for header, value in cached["headers"].items():
+            response[header] = value
+        self.set_coding(response, cached["etag"], coding)
+        return get_conditional_response(
+            request, etag=response["ETag"], response=response
+        )
+
+    def process_response(self, request, response):
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if not getattr(request, "_compress", False) or not is_compressible(response):
+            return response
+
+        if response.streaming:
+            # Only gzip is compressed as a stream
+            if get_accepted_coding(request, ("gzip",)) == "gzip":
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=MAX_RANDOM_BYTES
+                )
+                del response["Content-Length"]
+                response["Content-Encoding"] = "gzip"
+            return response
+        if len(response.content) < MIN_LENGTH:
+            return response
+
+        coding = get_accepted_coding(request)
+        key = getattr(request, "_response_key", None)
+        # Responses setting cookies, such as a new session's, are not shared
+        if key is None or response.status_code != 200 or response.cookies:
+            if coding is not None:
+                etag = response.get("ETag")
+                response.content = CODINGS[coding](response.content)
+                self.set_coding(response, etag, coding)
+            return response
+
+        set_response_etag(response)
+        etag = response["ETag"]
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        cache.set(get_variant_key(etag, None), response.content, timeout)
+        cache.set(
+            key,
+            {
+                "etag": etag,
+                "headers": {
+                    header: response[header]
+                    for header in CACHED_HEADERS
+                    if response.has_header(header)
+                },
+            },
+            timeout,
+        )
+        if coding is not None:
+            response.content = self.get_variant(etag, coding)
+            self.set_coding(response, etag, coding)
+        return get_conditional_response(request, etag=etag, response=response)
+
+    def get_variant(self, etag, coding):
+        """
+        Returns the response content of ``etag`` in ``coding``, compressing
+        and caching it if it is not yet, or ``None`` if it is not cached.
+        """
+        content = cache.get(get_variant_key(etag, coding))
+        if content is None and coding is not None:
+            content = cache.get(get_variant_key(etag, None))
+            if content is not None:
+                content = CODINGS[coding](content)
+                cache.set(
+                    get_variant_key(etag, coding),
+                    content,
+                    settings.RESPONSE_CACHE_TIMEOUT,
+                )
+        return content
+
+    def set_coding(self, response, etag, coding):
+        response["Content-Length"] = str(len(response.content))
+        if coding is None:
+            response["ETag"] = etag
+            return
+        response["Content-Encoding"] = coding
+        # The compressed bytes differ from those the strong ETag stands for
+        if etag and not etag.startswith("W/"):
+            response["ETag"] = f"W/{etag}"
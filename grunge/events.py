@@ -0,0 +1,253 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+from .models import Playlist
+
+
+class Subscription:
+    """
+    A subscriber's queue of events, filled from any thread by its broker
+    and read on the subscriber's event loop.
+    """
+
+    def __init__(self, broker, max_size=100):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_size)
+
+    async def __aenter__(self):
+        self.broker.add_subscription(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.remove_subscription(self)
+
+    def put(self, event):
+        # A subscriber too slow to keep up misses events rather than
+        # growing its queue without bound
+        if not self.queue.full():
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class LocalBroker:
+    """
+    In-process pub/sub: events reach the subscribers of this process only.
+    Enough for a single worker, and for tests.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = set()
+
+    def subscribe(self):
+        return Subscription(self)
+
+    def add_subscription(self, subscription):
+        with self.lock:
+            self.subscriptions.add(subscription)
+
+    def remove_subscription(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, event):
+        self.deliver([event])
+
+    def deliver(self, events):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            for event in events:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+
+
+class CacheBroker(LocalBroker):
+    """
+    Pub/sub through the default cache, so every worker sharing it, such as
+    one configured with a Redis or Memcached ``CACHE_URL``, sees every event.
+
+    Events are stored under an incrementing counter.  While a worker has
+    subscribers, one task per event loop polls the counter and delivers the
+    new events to them.
+    """
+
+    key_prefix = "playlist-events"
+
+    def __init__(self, poll_interval=None, timeout=None):
+        super().__init__()
+        self.poll_interval = (
+            settings.PLAYLIST_EVENTS_POLL_INTERVAL
+            if poll_interval is None
+            else poll_interval
+        )
+        self.timeout = settings.PLAYLIST_EVENTS_TIMEOUT if timeout is None else timeout
+        self.pollers = {}
+
+    @property
+    def counter_key(self):
+        return f"{self.key_prefix}:last"
+
+    def get_event_key(self, number):
+        return f"{self.key_prefix}:{number}"
+
+    def publish(self, event):
+        cache.add(self.counter_key, 0, timeout=None)
+        number = cache.incr(self.counter_key)
+        cache.set(self.get_event_key(number), event, timeout=self.timeout)
+
+    def add_subscription(self, subscription):
+        super().add_subscription(subscription)
+        with self.lock:
+            loop = subscription.loop
+            if loop not in self.pollers:
+                self.pollers[loop] = loop.create_task(self.poll(loop))
+
+    def has_subscriptions(self, loop):
+        return any(subscription.loop is loop for subscription in self.subscriptions)
+
+    async def poll(self, loop):
+        try:
+            last = await cache.aget(self.counter_key, 0)
+            while True:
+                with self.lock:
+                    # Checked under the lock subscribers are added with, so
+                    # none can join between this check and the poller leaving
+                    if not self.has_subscriptions(loop):
+                        del self.pollers[loop]
+                        return
+
+                await asyncio.sleep(self.poll_interval)
+                current = await cache.aget(self.counter_key, 0)
+                if current > last:
+                    keys = [
+                        self.get_event_key(number)
+                        for number in range(last + 1, current + 1)
+                    ]
+                    events = await cache.aget_many(keys)
+                    self.deliver([events[key] for key in keys if key in events])
+                # A smaller counter was expired or cleared, and restarts
+                last = current
+        except BaseException:
+            with self.lock:
+                self.pollers.pop(loop, None)
+            raise
+
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Returns this process's instance of the ``PLAYLIST_EVENTS_BROKER`` class.
+    """
+    path = settings.PLAYLIST_EVENTS_BROKER
+    with _brokers_lock:
+        if path not in _brokers:
+            _brokers[path] = import_string(path)()
+        return _brokers[path]
+
+
+_published = threading.local()
+
+
+def publish_playlist_change(playlist_id):
+    """
+    Publishes the playlist's latest change sequence number once the current
+    transaction commits.  A transaction writing many changes publishes once.
+    """
+    pending = transaction.get_connection().run_on_commit
+    if any(getattr(func, "playlist_id", None) == playlist_id for _, func, _ in pending):
+        return
+
+    def publish():
+        # Changes after this one publish again
+        publish.playlist_id = None
+        playlist = (
+            Playlist.objects.filter(pk=playlist_id)
+            .annotate(sequence=Max("changes__id"))
+            .values("uuid", "sequence")
+            .first()
+        )
+        event = playlist and {
+            "playlist": str(playlist["uuid"]),
+            "sequence": playlist["sequence"],
+        }
+        # Transactions committing at once may publish the same sequence
+        if event and event != getattr(_published, "event", None):
+            _published.event = event
+            get_broker().publish(event)
+
+    publish.playlist_id = playlist_id
+    transaction.on_commit(publish)
+
+
+def publish_playlist_delete(playlist):
+    event = {"playlist": str(playlist.uuid), "deleted": True}
+    transaction.on_commit(lambda: get_broker().publish(event))
+
+
+def format_event(event):
+    return f"event: playlist\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream_events(playlist_uuid=None):
+    yield f"retry: {settings.PLAYLIST_EVENTS_RETRY}\n\n"
+
+    async with get_broker().subscribe() as subscription:
+        while True:
+            try:
+                event = await subscription.get(settings.PLAYLIST_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+
+            if playlist_uuid is None or event["playlist"] == playlist_uuid:
+                yield format_event(event)
+
+
+def can_stream_events(request):
+    """
+    Returns whether the request is served under ASGI.  Under WSGI, Django
+    reads an async response to its end before sending it, which an event
+    stream never reaches, holding a worker thread for good.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+async def playlist_events(request, version=None):
+    """
+    Streams playlist change notifications as Server-Sent Events, for every
+    playlist or only the one given as ``playlist``.  Each event gives the
+    playlist's latest change sequence number, to read the changes from
+    with the playlist's change feed, or marks it deleted.
+
+    Only served under ASGI, as by ``grunge.asgi``: WSGI servers get ``501
+    Not Implemented``.
+    """
+    if not can_stream_events(request):
+        return JsonResponse(
+            {"detail": "Playlist events are only streamed when served with ASGI."},
+            status=501,
+        )
+
+    response = StreamingHttpResponse(
+        stream_events(request.GET.get("playlist")),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
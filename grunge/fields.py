@@ -1,3 +1,5 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.encoding import smart_str
 from rest_framework import serializers
 
 
@@ -14,3 +16,25 @@ class UUIDHyperlinkedRelatedField(serializers.HyperlinkedRelatedField):
         kwargs.setdefault("lookup_field", "uuid")
         kwargs.setdefault("lookup_url_kwarg", "uuid")
         super().__init__(*args, **kwargs)
+
+
+class UUIDSlugRelatedField(serializers.SlugRelatedField):
+    """
+    Resolves a related object from its UUID with the model's
+    ``UUIDManager.get_by_uuid``, and so through the request's identity map.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("slug_field", "uuid")
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        manager = self.get_queryset().model._default_manager
+        try:
+            return manager.get_by_uuid(data)
+        except ObjectDoesNotExist:
+            self.fail(
+                "does_not_exist", slug_name=self.slug_field, value=smart_str(data)
+            )
+        except (TypeError, ValueError):
+            self.fail("invalid")
@@ -1,15 +1,21 @@
+from django.db.models.constants import LOOKUP_SEP
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 
-from .models import Album, Artist, Track
+from .models import Album, Artist, ArtistSummary, TrackListing
 
 
 class ArtistFilter(filters.FilterSet):
 
     name = filters.CharFilter(lookup_expr="icontains")
+    decade = filters.NumberFilter(method="filter_decade")
 
     class Meta:
         model = Artist
-        fields = ("name",)
+        fields = ("name", "decade")
+
+    def filter_decade(self, queryset, name, value):
+        return queryset.filter(ArtistSummary.active_in(int(value)))
 
 
 class AlbumFilter(filters.FilterSet):
@@ -24,9 +30,48 @@ class AlbumFilter(filters.FilterSet):
 
 class TrackFilter(filters.FilterSet):
 
-    album_uuid = filters.UUIDFilter("album__uuid")
+    album_uuid = filters.UUIDFilter("album_uuid")
     name = filters.CharFilter(lookup_expr="icontains")
 
     class Meta:
-        model = Track
+        model = TrackListing
         fields = ("album_uuid", "name")
+
+
+def get_tiebroken_ordering(field):
+    """
+    Returns ``field`` followed by the primary keys along its path, the
+    innermost last, in the same direction.  The result is a total order,
+    so pages never overlap, and each level follows a ``(column, id)``
+    index: ``album__year`` on tracks sorts by the album's year and id,
+    then by the track id within the album.
+    """
+    prefix = "-" if field.startswith("-") else ""
+    path = field.lstrip("-").split(LOOKUP_SEP)[:-1]
+    return [
+        field,
+        *(
+            prefix + LOOKUP_SEP.join([*path[:depth], "pk"])
+            for depth in range(len(path), -1, -1)
+        ),
+    ]
+
+
+class IndexedOrderingFilter(OrderingFilter):
+    """
+    Orders by one of the view's ``ordering_fields``, each of which must be
+    backed by indexes, and ignores any other field.  Views without
+    ``ordering_fields`` cannot be ordered.
+    """
+
+    def get_valid_fields(self, queryset, view, context={}):
+        if getattr(view, "ordering_fields", None) is None:
+            return []
+        return super().get_valid_fields(queryset, view, context)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or ordering == getattr(view, "ordering", None):
+            return ordering
+        # Combined orderings would sort beyond what one index serves
+        return get_tiebroken_ordering(ordering[0])
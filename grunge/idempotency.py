@@ -0,0 +1,119 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, serializers, status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+class IdempotencyKeyInUse(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("A request with this Idempotency-Key is still running.")
+    default_code = "idempotency_key_in_use"
+
+
+class IdempotencyKeyReused(exceptions.APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = _("This Idempotency-Key was used for a different request.")
+    default_code = "idempotency_key_reused"
+
+
+def get_scope(request):
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return "anonymous"
+
+
+def get_request_hash(request):
+    # Read before the body is parsed, which keeps it for the parsers
+    body = request._request.body
+    return hashlib.sha256(
+        b"\n".join((request.method.encode(), request.path.encode(), body))
+    ).digest()
+
+
+def replay(stored, request_hash):
+    if bytes(stored.request_hash) != request_hash:
+        raise IdempotencyKeyReused()
+    if stored.status_code is None:
+        raise IdempotencyKeyInUse()
+    return Response(
+        stored.response,
+        status=stored.status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def write_once(request, write, *args, **kwargs):
+    """
+    Runs ``write``, a view method, unless the request has the
+    ``Idempotency-Key`` of an earlier request.  Successful responses are
+    stored for ``IDEMPOTENCY_KEY_TIMEOUT`` seconds and replayed to later
+    requests with the same key, which change nothing.  A failed write can
+    be retried with the same key.
+
+    The key is taken before the write runs, so a concurrent retry gets
+    ``409 Conflict`` rather than writing again, and reusing it for another
+    request gets ``422 Unprocessable Entity``.  It is taken for
+    ``IDEMPOTENCY_KEY_LEASE`` seconds, after which a retry takes it over
+    from a write that never finished.
+    """
+    key = request.headers.get(HEADER)
+    if key is None:
+        return write(request, *args, **kwargs)
+    if not key or len(key) > IdempotencyKey._meta.get_field("key").max_length:
+        raise serializers.ValidationError(
+            {HEADER: [_("Expected between 1 and 255 characters.")]}
+        )
+
+    scope = get_scope(request)
+    request_hash = get_request_hash(request)
+    now = timezone.now()
+    IdempotencyKey.objects.filter(scope=scope, key=key, expires__lte=now).delete()
+    try:
+        with transaction.atomic():
+            stored = IdempotencyKey.objects.create(
+                scope=scope,
+                key=key,
+                request_hash=request_hash,
+                expires=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_LEASE),
+            )
+    except IntegrityError:
+        stored = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+        if stored is None:
+            # Expired and deleted by a concurrent request, which now runs
+            raise IdempotencyKeyInUse()
+        return replay(stored, request_hash)
+
+    # Updated by primary key and lease, as a retry may have taken the key
+    # over meanwhile
+    taken = IdempotencyKey.objects.filter(pk=stored.pk, expires=stored.expires)
+    try:
+        response = write(request, *args, **kwargs)
+    except BaseException:
+        taken.delete()
+        raise
+    if status.is_success(response.status_code):
+        taken.update(
+            status_code=response.status_code,
+            response=response.data,
+            expires=timezone.now()
+            + timedelta(seconds=settings.IDEMPOTENCY_KEY_TIMEOUT),
+        )
+    else:
+        taken.delete()
+    return response
+
+
+def purge_expired_keys():
+    """
+    Deletes the expired idempotency keys, and returns how many there were.
+    """
+    return IdempotencyKey.objects.filter(expires__lte=timezone.now()).delete()[0]
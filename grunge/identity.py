@@ -0,0 +1,126 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from uuid import UUID
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+_identity_map = ContextVar("identity_map", default=None)
+
+
+def to_uuid(value):
+    return value if isinstance(value, UUID) else UUID(str(value))
+
+
+class IdentityMap:
+    """
+    The instances a request has loaded by UUID, so each is fetched once
+    however many times the request resolves it.
+
+    ``hits`` and ``misses`` count the UUIDs resolved from the map and from
+    the database.
+    """
+
+    def __init__(self):
+        self.instances = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, model, uuid):
+        return model._meta.concrete_model, uuid
+
+    def get_many(self, manager, uuids):
+        """
+        Returns the instances of ``manager``'s model with the given UUIDs,
+        keyed by UUID, loading those not in the map with one query.
+        """
+        found = {}
+        missing = []
+        for uuid in set(uuids):
+            instance = self.instances.get(self.get_key(manager.model, uuid))
+            if instance is None:
+                missing.append(uuid)
+            else:
+                found[uuid] = instance
+
+        self.hits += len(found)
+        if missing:
+            self.misses += len(missing)
+            loaded = manager.in_bulk(missing, field_name="uuid")
+            for instance in loaded.values():
+                self.add(instance)
+            found.update(loaded)
+        return found
+
+    def add(self, instance):
+        self.instances[self.get_key(type(instance), instance.uuid)] = instance
+
+    def discard(self, instance):
+        self.instances.pop(self.get_key(type(instance), instance.uuid), None)
+
+
+def get_identity_map():
+    """
+    Returns the current request's identity map, or ``None`` outside of a
+    request.
+    """
+    return _identity_map.get()
+
+
+@contextmanager
+def identity_map():
+    """
+    Gives the code it wraps its own identity map, discarded on exit.
+    """
+    token = _identity_map.set(IdentityMap())
+    try:
+        yield _identity_map.get()
+    finally:
+        _identity_map.reset(token)
+
+
+def forget(instance):
+    current = get_identity_map()
+    if current is not None:
+        current.discard(instance)
+
+
+def log_usage(request, current):
+    if current.hits or current.misses:
+        logger.debug(
+            "%s %s resolved UUIDs with %d hits and %d misses",
+            request.method,
+            request.path,
+            current.hits,
+            current.misses,
+        )
+
+
+@sync_and_async_middleware
+def IdentityMapMiddleware(get_response):
+    """
+    Scopes an identity map to each request, available to views as
+    ``request.identity_map``.
+    """
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            with identity_map() as current:
+                request.identity_map = current
+                response = await get_response(request)
+            log_usage(request, current)
+            return response
+
+    else:
+
+        def middleware(request):
+            with identity_map() as current:
+                request.identity_map = current
+                response = get_response(request)
+            log_usage(request, current)
+            return response
+
+    return middleware
@@ -0,0 +1,125 @@
+from django.db import connection, transaction
+from django.db.models import F, Subquery
+
+from .models import Album, Artist, Track, TrackListing
+
+# The listing's columns, and the track lookups they are copied from
+LISTING_COLUMNS = {
+    "track_id": "id",
+    "uuid": "uuid",
+    "name": "name",
+    "number": "number",
+    "album_id": "album",
+    "album_uuid": "album__uuid",
+    "album_name": "album__name",
+    "album_year": "album__year",
+    "artist_id": "album__artist",
+    "artist_uuid": "album__artist__uuid",
+    "artist_name": "album__artist__name",
+}
+
+
+def insert_listings(tracks):
+    """
+    Writes the listings of the tracks in the queryset ``tracks`` with a
+    single ``INSERT ... SELECT``.
+    """
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(quote_name(column) for column in LISTING_COLUMNS)
+    select, params = (
+        tracks.order_by().values_list(*LISTING_COLUMNS.values()).query.sql_with_params()
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote_name(TrackListing._meta.db_table)} ({columns}) "
+            f"{select}",
+            params,
+        )
+
+
+def refresh_listings(tracks):
+    """
+    Rewrites the listings of the tracks in the queryset ``tracks``, from
+    the tracks, albums and artists as they are now stored.
+    """
+    with transaction.atomic():
+        TrackListing.objects.filter(track__in=tracks.values("pk")).delete()
+        insert_listings(tracks)
+
+
+def update_listings(instance, created=False, moved=False):
+    """
+    Brings the listings of a written artist, album or track up to date
+    with a single statement: an ``UPDATE`` keyed on it of the columns
+    copied from it, and from its album or artist only if it ``moved`` to
+    another.  New tracks are inserted; new artists and albums have no
+    tracks to list yet.
+    """
+    if isinstance(instance, Artist):
+        listings = TrackListing.objects.filter(artist=instance.pk)
+        columns = {"artist_uuid": instance.uuid, "artist_name": instance.name}
+    elif isinstance(instance, Album):
+        listings = TrackListing.objects.filter(album=instance.pk)
+        columns = {
+            "album_uuid": instance.uuid,
+            "album_name": instance.name,
+            "album_year": instance.year,
+        }
+        if moved:
+            artists = Artist.objects.filter(pk=instance.artist_id)
+            columns.update(
+                artist_id=instance.artist_id,
+                artist_uuid=Subquery(artists.values("uuid")),
+                artist_name=Subquery(artists.values("name")),
+            )
+    elif created:
+        insert_listings(Track.objects.filter(pk=instance.pk))
+        return
+    else:
+        listings = TrackListing.objects.filter(track=instance.pk)
+        columns = {
+            "uuid": instance.uuid,
+            "name": instance.name,
+            "number": instance.number,
+        }
+        if moved:
+            albums = Album.objects.filter(pk=instance.album_id)
+            columns.update(
+                album_id=instance.album_id,
+                album_uuid=Subquery(albums.values("uuid")),
+                album_name=Subquery(albums.values("name")),
+                album_year=Subquery(albums.values("year")),
+                artist_id=Subquery(albums.values("artist")),
+                artist_uuid=Subquery(albums.values("artist__uuid")),
+                artist_name=Subquery(albums.values("artist__name")),
+            )
+
+    if not created:
+        listings.update(**columns)
+
+
+def rebuild_listings():
+    """
+    Rewrites the listing of every track.
+    """
+    with transaction.atomic():
+        TrackListing.objects.all().delete()
+        insert_listings(Track.objects.all())
+
+
+def find_inconsistencies():
+    """
+    Returns the ids of the tracks without a listing, and of the tracks
+    whose listing differs from the catalogue.  Catalogue writes that skip
+    the model signals, such as ``QuerySet.update()`` and ``bulk_create()``,
+    leave them behind.
+    """
+    missing = Track.objects.filter(listing__isnull=True).values_list("pk", flat=True)
+    stale = TrackListing.objects.exclude(
+        **{
+            column: F(f"track__{lookup}")
+            for column, lookup in LISTING_COLUMNS.items()
+            if column != "track_id"
+        }
+    ).values_list("pk", flat=True)
+    return {"missing": list(missing), "stale": list(stale)}
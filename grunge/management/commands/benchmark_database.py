@@ -0,0 +1,141 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+
+from grunge.models import Album, Artist, Playlist, Track
+from grunge.serializers import PlaylistSerializer
+
+PLAYLIST_LENGTH = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares database profiles under concurrent playlist writes. Each "
+        "profile runs in its own process against a scratch SQLite database, "
+        "or against --database-url, with --threads writers each creating and "
+        "reading back --writes playlists."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--writes", type=int, default=50)
+        parser.add_argument(
+            "--profiles",
+            nargs="+",
+            default=["development", "production"],
+            help="The DATABASE_PROFILE values to compare.",
+        )
+        parser.add_argument(
+            "--database-url",
+            help="A database to run against instead of scratch SQLite files. "
+            "Its tables are created, and the benchmark's playlists left in it.",
+        )
+        # Runs the writers of one profile, in the process started for it
+        parser.add_argument("--worker", action="store_true", help="Internal.")
+
+    def handle(self, *args, threads, writes, profiles, database_url, worker, **options):
+        if worker:
+            self.stdout.write(json.dumps(self.run_writers(threads, writes)))
+            return
+
+        self.stdout.write(
+            f"{'profile':<12} {'writes/s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'failed':>7}"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                url = database_url or f"sqlite:///{Path(directory) / profile}.sqlite3"
+                results = self.run_profile(profile, url, threads, writes)
+                self.stdout.write(
+                    f"{profile:<12} {results['throughput']:>10.1f} "
+                    f"{results['p50'] * 1000:>8.1f} {results['p95'] * 1000:>8.1f} "
+                    f"{results['failed']:>7}"
+                )
+
+    def run_profile(self, profile, url, threads, writes):
+        # Settings are read once per process, so each profile gets its own
+        env = {**os.environ, "DATABASE_PROFILE": profile, "DATABASE_URL": url}
+        env.pop("REPLICA_DATABASE_URLS", None)
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "django",
+                "benchmark_database",
+                "--worker",
+                f"--threads={threads}",
+                f"--writes={writes}",
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(f"The {profile} profile failed:\n{process.stderr}")
+        return json.loads(process.stdout.splitlines()[-1])
+
+    def run_writers(self, threads, writes):
+        call_command("migrate", verbosity=0)
+        artist = Artist.objects.create(name="Benchmark")
+        album = Album.objects.create(name="Benchmark", year=1991, artist=artist)
+        tracks = [
+            str(
+                Track.objects.create(
+                    name=f"Track {number}", album=album, number=number
+                ).uuid
+            )
+            for number in range(1, PLAYLIST_LENGTH + 1)
+        ]
+
+        latencies = []
+        failed = []
+
+        def write(thread):
+            try:
+                for number in range(writes):
+                    data = {
+                        "name": f"Benchmark {thread}-{number}",
+                        "tracks": [
+                            {"track": track, "order": order}
+                            for order, track in enumerate(tracks, start=1)
+                        ],
+                    }
+                    start = time.perf_counter()
+                    try:
+                        serializer = PlaylistSerializer(data=data)
+                        serializer.is_valid(raise_exception=True)
+                        playlist = serializer.save()
+                        PlaylistSerializer(Playlist.objects.get(pk=playlist.pk)).data
+                    except OperationalError:
+                        failed.append(number)
+                    else:
+                        latencies.append(time.perf_counter() - start)
+            finally:
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=write, args=(thread,)) for thread in range(threads)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            "throughput": len(latencies) / elapsed,
+            "p50": latencies[len(latencies) // 2] if latencies else 0,
+            "p95": latencies[int(len(latencies) * 0.95)] if latencies else 0,
+            "failed": len(failed),
+        }
@@ -0,0 +1,115 @@
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+
+# How each storage format writes a UUID, and the column type it uses
+FORMATS = {
+    "text": ("char(32)", lambda value: value.hex),
+    "binary": ("blob", lambda value: value.bytes),
+}
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares UUIDs stored as 32 character strings, like UUIDField on "
+        "SQLite, with 16 raw bytes, like BinaryUUIDField, in a scratch SQLite "
+        "database: unique index size, point lookups, batched IN lookups and a "
+        "join on the UUID column."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=1_000_000, help="How many tracks to create."
+        )
+        parser.add_argument(
+            "--lookups",
+            type=int,
+            default=10_000,
+            help="How many UUIDs to look up in each test.",
+        )
+
+    def handle(self, *args, rows, lookups, **options):
+        uuids = [uuid4() for _ in range(rows)]
+        sample = random.Random(0).sample(uuids, min(lookups, rows))
+
+        self.stdout.write(
+            f"{'format':<8} {'index MiB':>10} {'lookups/s':>12} "
+            f"{'batched/s':>12} {'joined/s':>12}"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, (column_type, convert) in FORMATS.items():
+                connection = sqlite3.connect(Path(directory) / f"{name}.sqlite3")
+                try:
+                    results = self.run_benchmark(
+                        connection, column_type, convert, uuids, sample
+                    )
+                finally:
+                    connection.close()
+                self.stdout.write(
+                    f"{name:<8} {results['index_size'] / 2**20:>10.1f} "
+                    f"{results['lookups']:>12,.0f} {results['batched']:>12,.0f} "
+                    f"{results['joined']:>12,.0f}"
+                )
+
+    def run_benchmark(self, connection, column_type, convert, uuids, sample):
+        connection.execute(
+            f"CREATE TABLE track (id integer PRIMARY KEY, uuid {column_type} NOT NULL)"
+        )
+        connection.executemany(
+            "INSERT INTO track (uuid) VALUES (?)",
+            ((convert(value),) for value in uuids),
+        )
+        connection.execute("CREATE UNIQUE INDEX track_uuid ON track (uuid)")
+        # UUIDs to join against, as the change feeds' UUID columns are
+        connection.execute(f"CREATE TABLE lookup (uuid {column_type} NOT NULL)")
+        connection.executemany(
+            "INSERT INTO lookup (uuid) VALUES (?)",
+            ((convert(value),) for value in sample),
+        )
+        connection.commit()
+
+        values = [convert(value) for value in sample]
+        results = {"index_size": self.get_index_size(connection, "track_uuid")}
+
+        start = time.perf_counter()
+        for value in values:
+            connection.execute("SELECT id FROM track WHERE uuid = ?", (value,))
+        results["lookups"] = len(values) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for offset in range(0, len(values), BATCH_SIZE):
+            batch = values[offset : offset + BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            connection.execute(
+                f"SELECT id FROM track WHERE uuid IN ({placeholders})", batch
+            ).fetchall()
+        results["batched"] = len(values) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        joined = connection.execute(
+            "SELECT COUNT(*) FROM lookup INNER JOIN track ON track.uuid = lookup.uuid"
+        ).fetchone()[0]
+        results["joined"] = joined / (time.perf_counter() - start)
+
+        return results
+
+    def get_index_size(self, connection, name):
+        try:
+            return connection.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (name,)
+            ).fetchone()[0]
+        except sqlite3.OperationalError:
+            # Without the dbstat table, measure the pages the index adds
+            page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+            connection.execute(f"DROP INDEX {name}")
+            connection.execute("VACUUM")
+            without = connection.execute("PRAGMA page_count").fetchone()[0]
+            connection.execute(f"CREATE UNIQUE INDEX {name} ON track (uuid)")
+            with_index = connection.execute("PRAGMA page_count").fetchone()[0]
+            return (with_index - without) * page_size
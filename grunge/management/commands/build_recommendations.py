@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from grunge.recommendations import build_cooccurrences
+
+
+class Command(BaseCommand):
+    help = (
+        "Updates the track co-occurrence matrix used for recommendations. "
+        "Only tracks whose playlists changed since the last build are recounted, "
+        "unless --full is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recount every playlist instead of only the changed tracks.",
+        )
+
+    def handle(self, *args, full=False, **options):
+        processed = build_cooccurrences(full=full)
+
+        if processed is None:
+            self.stdout.write(self.style.SUCCESS("Rebuilt the co-occurrence matrix."))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Recounted co-occurrences of {processed} tracks.")
+            )
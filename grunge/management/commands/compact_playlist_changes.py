@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from grunge.changes import compact_playlist_changes
+from grunge.models import Playlist
+
+
+class Command(BaseCommand):
+    help = (
+        "Compacts the change log of every playlist with more than --keep "
+        "changes, replacing the older ones with a snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=settings.PLAYLIST_CHANGE_LOG_LENGTH,
+            help="How many of each playlist's latest changes to keep.",
+        )
+
+    def handle(self, *args, keep, **options):
+        playlists = Playlist.objects.annotate(change_count=Count("changes")).filter(
+            change_count__gt=keep + 1
+        )
+        removed = sum(
+            compact_playlist_changes(playlist, keep) for playlist in playlists
+        )
+        self.stdout.write(self.style.SUCCESS(f"Compacted {removed} playlist changes."))
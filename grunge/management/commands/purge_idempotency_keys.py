@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from grunge.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Deletes the expired idempotency keys of playlist writes."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} idempotency keys."))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from grunge.listings import find_inconsistencies, rebuild_listings
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrites the flat track listing the track API reads from, from the "
+        "catalogue. With --check, only reports the tracks whose listing is "
+        "missing or out of date, and fails if there are any."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Compare the listing with the catalogue instead of rebuilding it.",
+        )
+
+    def handle(self, *args, check=False, **options):
+        if not check:
+            rebuild_listings()
+            self.stdout.write(self.style.SUCCESS("Rebuilt the track listing."))
+            return
+
+        inconsistencies = find_inconsistencies()
+        for kind, track_ids in inconsistencies.items():
+            if track_ids:
+                self.stdout.write(
+                    f"{len(track_ids)} {kind} listings, of tracks "
+                    f"{', '.join(map(str, track_ids[:20]))}"
+                    f"{', ...' if len(track_ids) > 20 else ''}"
+                )
+        if any(inconsistencies.values()):
+            raise CommandError(
+                "The track listing is out of date, run rebuild_track_listing."
+            )
+        self.stdout.write(self.style.SUCCESS("The track listing is up to date."))
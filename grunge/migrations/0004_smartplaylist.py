@@ -0,0 +1,88 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:06
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0003_playlist_playlisttrack"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SmartPlaylist",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "uuid",
+                    models.UUIDField(
+                        default=uuid.uuid4, unique=True, verbose_name="UUID"
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                (
+                    "year_from",
+                    models.PositiveSmallIntegerField(
+                        blank=True,
+                        help_text="Only include albums released since",
+                        null=True,
+                    ),
+                ),
+                (
+                    "year_until",
+                    models.PositiveSmallIntegerField(
+                        blank=True,
+                        help_text="Only include albums released until",
+                        null=True,
+                    ),
+                ),
+                (
+                    "name_contains",
+                    models.CharField(
+                        blank=True,
+                        help_text="Only include tracks whose name contains this text",
+                        max_length=100,
+                    ),
+                ),
+                (
+                    "sample_size",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Pick this many tracks at random from the matching tracks",
+                        null=True,
+                    ),
+                ),
+                (
+                    "seed",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Seed for the random sample"
+                    ),
+                ),
+                (
+                    "artist",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Only include tracks by this artist",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="smart_playlists",
+                        to="grunge.artist",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("name",),
+            },
+        ),
+    ]
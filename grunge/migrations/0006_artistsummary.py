@@ -0,0 +1,92 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+DECADE_EPOCH = 1900
+
+
+def create_artist_summaries(apps, schema_editor):
+    Artist = apps.get_model("grunge", "Artist")
+    ArtistSummary = apps.get_model("grunge", "ArtistSummary")
+    Track = apps.get_model("grunge", "Track")
+
+    track_counts = dict(
+        Track.objects.values_list("album__artist").annotate(Count("id")).order_by()
+    )
+    summaries = {}
+    for artist in Artist.objects.annotate(
+        first_year=Min("albums__year"),
+        last_year=Max("albums__year"),
+        album_count=Count("albums"),
+    ):
+        summaries[artist.pk] = ArtistSummary(
+            artist_id=artist.pk,
+            first_year=artist.first_year,
+            last_year=artist.last_year,
+            album_count=artist.album_count,
+            track_count=track_counts.get(artist.pk, 0),
+        )
+
+    Album = apps.get_model("grunge", "Album")
+    for artist_id, year in Album.objects.values_list("artist", "year").distinct():
+        summaries[artist_id].decades |= 1 << max(0, (year - DECADE_EPOCH) // 10)
+
+    ArtistSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0005_trackcooccurrence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArtistSummary",
+            fields=[
+                (
+                    "artist",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="grunge.artist",
+                    ),
+                ),
+                (
+                    "first_year",
+                    models.PositiveSmallIntegerField(
+                        blank=True,
+                        help_text="The year of the artist's first album",
+                        null=True,
+                    ),
+                ),
+                (
+                    "last_year",
+                    models.PositiveSmallIntegerField(
+                        blank=True,
+                        help_text="The year of the artist's last album",
+                        null=True,
+                    ),
+                ),
+                (
+                    "decades",
+                    models.PositiveBigIntegerField(
+                        default=0,
+                        help_text="Bitmask of the decades the artist released albums in",
+                    ),
+                ),
+                ("album_count", models.PositiveIntegerField(default=0)),
+                ("track_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "artist summaries",
+            },
+        ),
+        migrations.RunPython(
+            create_artist_summaries, migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0006_artistsummary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playlist",
+            name="packed_tracks",
+            field=models.BinaryField(
+                default=b"",
+                help_text="The track ids of a packed playlist, as int64",
+            ),
+        ),
+        migrations.AddField(
+            model_name="playlist",
+            name="storage",
+            field=models.CharField(
+                choices=[("rows", "Rows"), ("packed", "Packed")],
+                default="rows",
+                help_text=(
+                    "Rows store one PlaylistTrack per entry; packed stores "
+                    "the track ids in a single binary column, for very large "
+                    "playlists"
+                ),
+                max_length=10,
+            ),
+        ),
+    ]
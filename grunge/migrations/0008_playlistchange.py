@@ -0,0 +1,114 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:26
+
+import django.db.models.deletion
+import struct
+
+from django.db import migrations, models
+
+
+def snapshot_playlists(apps, schema_editor):
+    """
+    Starts every existing playlist's log with a snapshot of its contents.
+    """
+    Playlist = apps.get_model("grunge", "Playlist")
+    PlaylistChange = apps.get_model("grunge", "PlaylistChange")
+    PlaylistTrack = apps.get_model("grunge", "PlaylistTrack")
+    Track = apps.get_model("grunge", "Track")
+
+    for playlist in Playlist.objects.iterator():
+        if playlist.storage == "packed":
+            data = bytes(playlist.packed_tracks)
+            track_ids = struct.unpack(f"<{len(data) // 8}q", data)
+            tracks = Track.objects.in_bulk(track_ids)
+            entries = [
+                [None, str(tracks[track_id].uuid), order]
+                for order, track_id in enumerate(track_ids, start=1)
+                if track_id in tracks
+            ]
+        else:
+            entries = [
+                [str(entry_uuid), str(track_uuid), order]
+                for entry_uuid, track_uuid, order in PlaylistTrack.objects.filter(
+                    playlist=playlist
+                )
+                .order_by("order")
+                .values_list("uuid", "track__uuid", "order")
+            ]
+        PlaylistChange.objects.create(
+            playlist=playlist,
+            operation="snapshot",
+            snapshot={"name": playlist.name, "entries": entries},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0007_playlist_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlaylistChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "operation",
+                    models.CharField(
+                        choices=[
+                            ("add", "Add"),
+                            ("remove", "Remove"),
+                            ("move", "Move"),
+                            ("rename", "Rename"),
+                            ("snapshot", "Snapshot"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "entry_uuid",
+                    models.UUIDField(
+                        blank=True, help_text="The UUID of the PlaylistTrack", null=True
+                    ),
+                ),
+                ("track_uuid", models.UUIDField(blank=True, null=True)),
+                ("order", models.PositiveIntegerField(blank=True, null=True)),
+                ("name", models.CharField(blank=True, max_length=255)),
+                (
+                    "snapshot",
+                    models.JSONField(
+                        blank=True,
+                        help_text="The playlist's name and entries as of this sequence number",
+                        null=True,
+                    ),
+                ),
+                (
+                    "playlist",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="changes",
+                        to="grunge.playlist",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["playlist", "id"], name="grunge_play_playlis_99b178_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            snapshot_playlists, migrations.RunPython.noop, elidable=True
+        ),
+    ]
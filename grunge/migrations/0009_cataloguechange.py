@@ -0,0 +1,70 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:30
+
+from django.db import migrations, models
+
+
+def record_catalogue(apps, schema_editor):
+    """
+    Starts the sequence with an upsert of every existing object.
+    """
+    CatalogueChange = apps.get_model("grunge", "CatalogueChange")
+
+    for kind in ("artist", "album", "track"):
+        Model = apps.get_model("grunge", kind)
+        CatalogueChange.objects.bulk_create(
+            (
+                CatalogueChange(kind=kind, object_uuid=uuid)
+                for uuid in Model.objects.order_by("pk")
+                .values_list("uuid", flat=True)
+                .iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0008_playlistchange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogueChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("artist", "Artist"),
+                            ("album", "Album"),
+                            ("track", "Track"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("object_uuid", models.UUIDField()),
+                ("deleted", models.BooleanField(default=False)),
+            ],
+            options={
+                "ordering": ["id"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "object_uuid"), name="unique_catalogue_change"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            record_catalogue, migrations.RunPython.noop, elidable=True
+        ),
+    ]
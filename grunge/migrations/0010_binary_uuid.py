@@ -0,0 +1,109 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:41
+
+import grunge.models
+import uuid
+from django.db import migrations
+
+MODELS = ("album", "artist", "playlist", "playlisttrack", "smartplaylist", "track")
+BATCH_SIZE = 10000
+
+
+def convert_uuids(schema_editor, convert):
+    """
+    Rewrites every stored UUID with ``convert``, which returns ``None`` for
+    values already in the target format.
+    """
+    connection = schema_editor.connection
+    if connection.features.has_native_uuid_field:
+        return
+
+    quote_name = connection.ops.quote_name
+    for model_name in MODELS:
+        table = quote_name(f"grunge_{model_name}")
+        last_id = 0
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute(
+                    f"SELECT id, uuid FROM {table} WHERE id > %s ORDER BY id "
+                    f"LIMIT {BATCH_SIZE}",
+                    [last_id],
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                updates = [
+                    (converted, pk)
+                    for pk, value in rows
+                    if (converted := convert(value)) is not None
+                ]
+                cursor.executemany(
+                    f"UPDATE {table} SET uuid = %s WHERE id = %s", updates
+                )
+
+
+def text_to_bytes(apps, schema_editor):
+    convert_uuids(
+        schema_editor,
+        lambda value: uuid.UUID(value).bytes if isinstance(value, str) else None,
+    )
+
+
+def bytes_to_text(apps, schema_editor):
+    convert_uuids(
+        schema_editor,
+        lambda value: None if isinstance(value, str) else uuid.UUID(bytes=value).hex,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0009_cataloguechange"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="album",
+            name="uuid",
+            field=grunge.models.BinaryUUIDField(
+                default=uuid.uuid4, unique=True, verbose_name="UUID"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="artist",
+            name="uuid",
+            field=grunge.models.BinaryUUIDField(
+                default=uuid.uuid4, unique=True, verbose_name="UUID"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="playlist",
+            name="uuid",
+            field=grunge.models.BinaryUUIDField(
+                default=uuid.uuid4, unique=True, verbose_name="UUID"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="playlisttrack",
+            name="uuid",
+            field=grunge.models.BinaryUUIDField(
+                default=uuid.uuid4, unique=True, verbose_name="UUID"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="smartplaylist",
+            name="uuid",
+            field=grunge.models.BinaryUUIDField(
+                default=uuid.uuid4, unique=True, verbose_name="UUID"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="track",
+            name="uuid",
+            field=grunge.models.BinaryUUIDField(
+                default=uuid.uuid4, unique=True, verbose_name="UUID"
+            ),
+        ),
+        migrations.RunPython(text_to_bytes, bytes_to_text),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:57
+
+import grunge.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0010_binary_uuid"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="album",
+            index=grunge.models.NameSearchIndex(field="name", name="album_name_search"),
+        ),
+        migrations.AddIndex(
+            model_name="artist",
+            index=grunge.models.NameSearchIndex(
+                field="name", name="artist_name_search"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="track",
+            index=grunge.models.NameSearchIndex(field="name", name="track_name_search"),
+        ),
+    ]
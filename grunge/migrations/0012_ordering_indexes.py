@@ -0,0 +1,53 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0011_name_search_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="artist",
+            name="grunge_arti_name_b98e4f_idx",
+        ),
+        migrations.AddIndex(
+            model_name="album",
+            index=models.Index(
+                fields=["name", "id"], name="grunge_albu_name_112f19_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="album",
+            index=models.Index(
+                fields=["year", "id"], name="grunge_albu_year_ef0d3e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="artist",
+            index=models.Index(
+                fields=["name", "id"], name="grunge_arti_name_0feb86_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playlist",
+            index=models.Index(
+                fields=["name", "id"], name="grunge_play_name_4a4057_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="smartplaylist",
+            index=models.Index(
+                fields=["name", "id"], name="grunge_smar_name_a72e21_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="track",
+            index=models.Index(
+                fields=["name", "id"], name="grunge_trac_name_afae91_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:10
+
+import django.db.models.deletion
+import grunge.models
+from django.db import migrations, models
+
+LISTING_COLUMNS = {
+    "track_id": "id",
+    "uuid": "uuid",
+    "name": "name",
+    "number": "number",
+    "album_id": "album",
+    "album_uuid": "album__uuid",
+    "album_name": "album__name",
+    "album_year": "album__year",
+    "artist_id": "album__artist",
+    "artist_uuid": "album__artist__uuid",
+    "artist_name": "album__artist__name",
+}
+
+
+def create_track_listings(apps, schema_editor):
+    Track = apps.get_model("grunge", "Track")
+    TrackListing = apps.get_model("grunge", "TrackListing")
+
+    rows = Track.objects.order_by().values_list(*LISTING_COLUMNS.values())
+    TrackListing.objects.bulk_create(
+        (
+            TrackListing(**dict(zip(LISTING_COLUMNS, row)))
+            for row in rows.iterator(chunk_size=1000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0012_ordering_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrackListing",
+            fields=[
+                (
+                    "track",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="listing",
+                        serialize=False,
+                        to="grunge.track",
+                    ),
+                ),
+                (
+                    "uuid",
+                    grunge.models.BinaryUUIDField(unique=True, verbose_name="UUID"),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("number", models.PositiveSmallIntegerField()),
+                (
+                    "album_uuid",
+                    grunge.models.BinaryUUIDField(verbose_name="album UUID"),
+                ),
+                ("album_name", models.CharField(max_length=100)),
+                ("album_year", models.PositiveSmallIntegerField()),
+                (
+                    "artist_uuid",
+                    grunge.models.BinaryUUIDField(verbose_name="artist UUID"),
+                ),
+                ("artist_name", models.CharField(max_length=100)),
+                (
+                    "album",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="grunge.album",
+                    ),
+                ),
+                (
+                    "artist",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="grunge.artist",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("number", "name", "track"),
+                "indexes": [
+                    models.Index(
+                        fields=["number", "name", "track"],
+                        name="grunge_trac_number_7a3754_idx",
+                    ),
+                    models.Index(
+                        fields=["album_uuid", "number", "name", "track"],
+                        name="grunge_trac_album_u_bf89ff_idx",
+                    ),
+                    models.Index(
+                        fields=["name", "track"], name="grunge_trac_name_633ed8_idx"
+                    ),
+                    models.Index(
+                        fields=["album_year", "track"],
+                        name="grunge_trac_album_y_411ce0_idx",
+                    ),
+                    models.Index(
+                        fields=["artist_name", "track"],
+                        name="grunge_trac_artist__7524d5_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(
+            create_track_listings, migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0014_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playlist",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=1,
+                help_text=(
+                    "Incremented by every write, for optimistic concurrency "
+                    "control"
+                ),
+            ),
+        ),
+    ]
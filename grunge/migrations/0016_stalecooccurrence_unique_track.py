@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-19 21:04
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Keeps the first mark of each track.
+    """
+    StaleCooccurrence = apps.get_model("grunge", "StaleCooccurrence")
+    first_ids = StaleCooccurrence.objects.values("track_id").annotate(
+        first_id=Min("id")
+    )
+    StaleCooccurrence.objects.exclude(id__in=first_ids.values("first_id")).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grunge", "0015_playlist_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="stalecooccurrence",
+            name="track_id",
+            field=models.BigIntegerField(unique=True),
+        ),
+    ]
@@ -1,17 +1,150 @@
-from uuid import uuid4
+from uuid import UUID, uuid4
 
-from django.db import models
+from django.contrib.postgres.indexes import OpClass
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, Min, TextField, lookups
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Cast, Collate, Upper
+from django.db.models.lookups import Exact
 from django.urls import reverse
 from django.utils.translation import gettext as _
 
+from .identity import get_identity_map, to_uuid
+
+
+class BinaryUUIDField(models.UUIDField):
+    """
+    A ``UUIDField`` stored as 16 raw bytes on backends without a native UUID
+    type, rather than as a 32 character hex string, for a smaller unique
+    index and cheaper comparisons.  Backends with a native type use it.
+    """
+
+    data_types = {"mysql": "binary(16)", "oracle": "RAW(16)"}
+
+    def get_internal_type(self):
+        # Keeps backends from converting the bytes as a hex string
+        return "BinaryUUIDField"
+
+    def db_type(self, connection):
+        if connection.features.has_native_uuid_field:
+            return connection.data_types["UUIDField"]
+        return self.data_types.get(connection.vendor, "blob")
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None:
+            return None
+        if not isinstance(value, UUID):
+            value = self.to_python(value)
+        if connection.features.has_native_uuid_field:
+            return value
+        return value.bytes
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, UUID):
+            return value
+        # Rows not converted yet keep their hex string
+        if isinstance(value, str):
+            return UUID(value)
+        return UUID(bytes=bytes(value))
+
+
+class BinaryUUIDTextMixin:
+    """
+    Matches text lookups, such as admin searches, against the hex form of
+    the stored bytes.
+    """
+
+    def process_lhs(self, compiler, connection, lhs=None):
+        sql, params = super().process_lhs(compiler, connection, lhs)
+        if not connection.features.has_native_uuid_field:
+            sql = f"LOWER(HEX({sql}))"
+        return sql, params
+
+
+for lookup in (
+    lookups.UUIDIExact,
+    lookups.UUIDContains,
+    lookups.UUIDIContains,
+    lookups.UUIDStartsWith,
+    lookups.UUIDIStartsWith,
+    lookups.UUIDEndsWith,
+    lookups.UUIDIEndsWith,
+):
+    BinaryUUIDField.register_lookup(
+        type(lookup.__name__, (BinaryUUIDTextMixin, lookup), {})
+    )
+
+
+class NameSearchIndex(models.Index):
+    """
+    An index serving case-insensitive prefix searches, ``istartswith``, of
+    one text field, in the form each backend's ``LIKE`` can use: a NOCASE
+    column on SQLite and ``UPPER(field)`` with ``text_pattern_ops`` on
+    PostgreSQL.  Other backends get a plain index.
+    """
+
+    def __init__(self, *, field, name):
+        self.field_name = field
+        super().__init__(fields=(field,), name=name)
+
+    def deconstruct(self):
+        path, _, _ = super().deconstruct()
+        return path, (), {"field": self.field_name, "name": self.name}
+
+    def get_backend_index(self, vendor):
+        if vendor == "sqlite":
+            return models.Index(Collate(self.field_name, "nocase"), name=self.name)
+        if vendor == "postgresql":
+            expression = Upper(Cast(self.field_name, TextField()))
+            return models.Index(
+                OpClass(expression, name="text_pattern_ops"), name=self.name
+            )
+        return None
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        index = self.get_backend_index(schema_editor.connection.vendor)
+        if index is None:
+            return super().create_sql(model, schema_editor, using, **kwargs)
+        return index.create_sql(model, schema_editor, using, **kwargs)
+
 
 class UUIDManager(models.Manager):
     def get_by_natural_key(self, uuid):
         return self.get(uuid=uuid)
 
+    def in_bulk_by_uuid(self, uuids):
+        """
+        Returns the instances with the given UUIDs, keyed by UUID, through
+        the request's identity map when there is one.
+        """
+        uuids = [to_uuid(uuid) for uuid in uuids]
+        current = get_identity_map()
+        if current is None:
+            return self.in_bulk(uuids, field_name="uuid")
+        return current.get_many(self, uuids)
+
+    def get_by_uuid(self, uuid):
+        instance = self.in_bulk_by_uuid([uuid]).get(to_uuid(uuid))
+        if instance is None:
+            raise self.model.DoesNotExist(
+                f"{self.model._meta.object_name} matching query does not exist."
+            )
+        return instance
+
+    def load_uuids(self, uuids):
+        """
+        Loads the instances with the given UUIDs into the request's identity
+        map with one query, for the lookups that follow.  Does nothing
+        outside of a request.
+        """
+        if get_identity_map() is not None:
+            self.in_bulk_by_uuid(uuids)
+
 
 class UUIDModel(models.Model):
-    uuid = models.UUIDField(verbose_name="UUID", default=uuid4, unique=True)
+    uuid = BinaryUUIDField(verbose_name="UUID", default=uuid4, unique=True)
     objects = UUIDManager()
 
     class Meta:
@@ -21,12 +154,35 @@ class UUIDModel(models.Model):
         return (self.uuid,)
 
 
-class Artist(UUIDModel):
+class CatalogueModel(UUIDModel):
+    """
+    An artist, album or track.  Writes take the catalogue change lock
+    first, and are atomic with the change log rows their receivers write.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            CatalogueChange.lock()
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            CatalogueChange.lock()
+            return super().delete(*args, **kwargs)
+
+
+class Artist(CatalogueModel):
     name = models.CharField(max_length=100, help_text=_("The artist name"))
 
     class Meta:
         ordering = ("name",)
-        indexes = (models.Index(fields=("name",)),)
+        indexes = (
+            models.Index(fields=("name", "id")),
+            NameSearchIndex(field="name", name="artist_name_search"),
+        )
 
     def __str__(self):
         return self.name
@@ -35,7 +191,7 @@ class Artist(UUIDModel):
         return reverse("admin:grunge_artist_change", kwargs={"object_id": self.pk})
 
 
-class Album(UUIDModel):
+class Album(CatalogueModel):
     name = models.CharField(max_length=100, help_text=_("The album name"))
     year = models.PositiveSmallIntegerField(
         help_text=_("The year the album was released")
@@ -49,7 +205,13 @@ class Album(UUIDModel):
 
     class Meta:
         ordering = ("artist", "year", "name")
-        indexes = (models.Index(fields=("artist", "year", "name")),)
+        indexes = (
+            models.Index(fields=("artist", "year", "name")),
+            # The API's orderings, with the primary key as their tiebreaker
+            models.Index(fields=("name", "id")),
+            models.Index(fields=("year", "id")),
+            NameSearchIndex(field="name", name="album_name_search"),
+        )
 
     def __str__(self):
         return self.name
@@ -58,7 +220,7 @@ class Album(UUIDModel):
         return reverse("admin:grunge_album_change", kwargs={"object_id": self.pk})
 
 
-class Track(UUIDModel):
+class Track(CatalogueModel):
     name = models.CharField(max_length=100, help_text=_("The track name"))
     album = models.ForeignKey(
         Album,
@@ -72,7 +234,11 @@ class Track(UUIDModel):
 
     class Meta:
         ordering = ("number", "name")
-        indexes = (models.Index(fields=("number", "name")),)
+        indexes = (
+            models.Index(fields=("number", "name")),
+            models.Index(fields=("name", "id")),
+            NameSearchIndex(field="name", name="track_name_search"),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=("album", "number"), name="unique_album_number"
@@ -86,12 +252,67 @@ class Track(UUIDModel):
         return reverse("admin:grunge_track_change", kwargs={"object_id": self.pk})
 
 
+class PlaylistManager(UUIDManager):
+    def get_queryset(self):
+        # Packed track ids are read in windows, never with the playlist row
+        return super().get_queryset().defer("packed_tracks")
+
+
 class Playlist(UUIDModel):
+    class Storage(models.TextChoices):
+        ROWS = "rows", _("Rows")
+        PACKED = "packed", _("Packed")
+
     name = models.CharField(max_length=255)
+    storage = models.CharField(
+        max_length=10,
+        choices=Storage.choices,
+        default=Storage.ROWS,
+        help_text=_(
+            "Rows store one PlaylistTrack per entry; packed stores the track "
+            "ids in a single binary column, for very large playlists"
+        ),
+    )
+    packed_tracks = models.BinaryField(
+        default=b"", help_text=_("The track ids of a packed playlist, as int64")
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        help_text=_("Incremented by every write, for optimistic concurrency control"),
+    )
+
+    objects = PlaylistManager()
+
+    class Meta:
+        indexes = (models.Index(fields=("name", "id")),)
 
     def __str__(self):
         return self.name
 
+    @property
+    def is_packed(self):
+        return self.storage == self.Storage.PACKED
+
+    def bump_version(self, expected=None):
+        """
+        Moves the playlist to its next version with one UPDATE, if it is
+        still at version ``expected``, or from any version if ``expected``
+        is ``None``.  Returns whether it moved.
+
+        No lock is taken before this write: writes of a playlist someone
+        else changed since it was read fail here, not wait for each other.
+        """
+        playlists = Playlist.objects.filter(pk=self.pk)
+        if expected is not None:
+            playlists = playlists.filter(version=expected)
+        if not playlists.update(version=F("version") + 1):
+            return False
+        if expected is None:
+            self.refresh_from_db(fields=["version"])
+        else:
+            self.version = expected + 1
+        return True
+
 
 class PlaylistTrack(UUIDModel):
     playlist = models.ForeignKey(
@@ -106,3 +327,428 @@ class PlaylistTrack(UUIDModel):
 
     def __str__(self):
         return f"{self.playlist.name} - {self.track.name} ({self.order})"
+
+
+class ArtistSummary(models.Model):
+    """
+    Discography aggregates of an artist, maintained on album and track
+    writes so artist lists can filter and sort on them without joining
+    albums.
+    """
+
+    # Bit ``n`` of ``decades`` stands for the decade starting in
+    # ``DECADE_EPOCH + 10 * n``.
+    DECADE_EPOCH = 1900
+
+    artist = models.OneToOneField(
+        Artist, primary_key=True, related_name="summary", on_delete=models.CASCADE
+    )
+    first_year = models.PositiveSmallIntegerField(
+        blank=True, null=True, help_text=_("The year of the artist's first album")
+    )
+    last_year = models.PositiveSmallIntegerField(
+        blank=True, null=True, help_text=_("The year of the artist's last album")
+    )
+    decades = models.PositiveBigIntegerField(
+        default=0, help_text=_("Bitmask of the decades the artist released albums in")
+    )
+    album_count = models.PositiveIntegerField(default=0)
+    track_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "artist summaries"
+
+    def __str__(self):
+        return str(self.artist_id)
+
+    @classmethod
+    def get_decade_mask(cls, year):
+        return 1 << max(0, (year - cls.DECADE_EPOCH) // 10)
+
+    @classmethod
+    def get_decades(cls, mask):
+        """
+        Returns the first year of every decade set in ``mask``.
+        """
+        return [
+            cls.DECADE_EPOCH + 10 * bit
+            for bit in range(mask.bit_length())
+            if mask & (1 << bit)
+        ]
+
+    @classmethod
+    def active_in(cls, decade, field="summary__decades"):
+        """
+        Returns a filter expression matching artists with albums from the
+        decade starting in ``decade``.
+        """
+        mask = cls.get_decade_mask(decade)
+        return Exact(F(field).bitand(mask), mask)
+
+    @classmethod
+    def refresh(cls, artist_id):
+        """
+        Recomputes the aggregates of one artist from its albums and tracks.
+        """
+        albums = Album.objects.filter(artist=artist_id)
+        aggregates = albums.aggregate(
+            first_year=Min("year"), last_year=Max("year"), album_count=Count("id")
+        )
+        decades = 0
+        for year in albums.values_list("year", flat=True).distinct():
+            decades |= cls.get_decade_mask(year)
+
+        cls.objects.filter(artist=artist_id).update(
+            decades=decades,
+            track_count=Track.objects.filter(album__artist=artist_id).count(),
+            **aggregates,
+        )
+
+
+class TrackListing(models.Model):
+    """
+    A track with its album and artist in one row, maintained on catalogue
+    writes so track lists filter, sort and render from a single table.
+    See ``grunge.listings``.
+    """
+
+    track = models.OneToOneField(
+        Track, primary_key=True, related_name="listing", on_delete=models.CASCADE
+    )
+    uuid = BinaryUUIDField(verbose_name="UUID", unique=True)
+    name = models.CharField(max_length=100)
+    number = models.PositiveSmallIntegerField()
+    album = models.ForeignKey(Album, related_name="+", on_delete=models.CASCADE)
+    album_uuid = BinaryUUIDField(verbose_name="album UUID")
+    album_name = models.CharField(max_length=100)
+    album_year = models.PositiveSmallIntegerField()
+    artist = models.ForeignKey(Artist, related_name="+", on_delete=models.CASCADE)
+    artist_uuid = BinaryUUIDField(verbose_name="artist UUID")
+    artist_name = models.CharField(max_length=100)
+
+    class Meta:
+        ordering = ("number", "name", "track")
+        indexes = (
+            models.Index(fields=("number", "name", "track")),
+            models.Index(fields=("album_uuid", "number", "name", "track")),
+            # The API's orderings, with the primary key as their tiebreaker
+            models.Index(fields=("name", "track")),
+            models.Index(fields=("album_year", "track")),
+            models.Index(fields=("artist_name", "track")),
+        )
+
+    def __str__(self):
+        return self.name
+
+
+class SmartPlaylist(UUIDModel):
+    """
+    A playlist derived from rules rather than stored ``PlaylistTrack`` rows.
+
+    Every rule that is set narrows the catalogue; together they compile to a
+    single ``Track`` query that is only evaluated when the tracks are read.
+    """
+
+    # Multiplicative hash used to give each track a stable pseudo-random
+    # sort key for a given seed, so sampling stays a single ORM query.
+    SAMPLE_MULTIPLIER = 1103515245
+    SAMPLE_MODULUS = 2**31
+
+    name = models.CharField(max_length=255)
+    artist = models.ForeignKey(
+        Artist,
+        blank=True,
+        null=True,
+        help_text=_("Only include tracks by this artist"),
+        related_name="smart_playlists",
+        on_delete=models.CASCADE,
+    )
+    year_from = models.PositiveSmallIntegerField(
+        blank=True, null=True, help_text=_("Only include albums released since")
+    )
+    year_until = models.PositiveSmallIntegerField(
+        blank=True, null=True, help_text=_("Only include albums released until")
+    )
+    name_contains = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text=_("Only include tracks whose name contains this text"),
+    )
+    sample_size = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text=_("Pick this many tracks at random from the matching tracks"),
+    )
+    seed = models.PositiveIntegerField(
+        default=0, help_text=_("Seed for the random sample")
+    )
+
+    class Meta:
+        ordering = ("name",)
+        indexes = (models.Index(fields=("name", "id")),)
+
+    def __str__(self):
+        return self.name
+
+    def get_rule_queryset(self):
+        """
+        Returns the unordered queryset of all tracks matching the rules.
+        """
+        queryset = Track.objects.all()
+
+        if self.artist_id is not None:
+            queryset = queryset.filter(album__artist=self.artist_id)
+        if self.year_from is not None:
+            queryset = queryset.filter(album__year__gte=self.year_from)
+        if self.year_until is not None:
+            queryset = queryset.filter(album__year__lte=self.year_until)
+        if self.name_contains:
+            queryset = queryset.filter(name__icontains=self.name_contains)
+
+        return queryset
+
+    def get_tracks(self):
+        """
+        Returns the lazy, ordered queryset of the playlist's tracks.
+        """
+        queryset = self.get_rule_queryset()
+
+        if self.sample_size is None:
+            return queryset.order_by(
+                "album__artist__name", "album__year", "album__name", "number"
+            )
+
+        salt = (self.seed * self.SAMPLE_MULTIPLIER) % self.SAMPLE_MODULUS
+        sample_key = (
+            F("id").bitxor(salt) * self.SAMPLE_MULTIPLIER
+        ) % self.SAMPLE_MODULUS
+        return queryset.alias(sample_key=sample_key).order_by("sample_key", "id")[
+            : self.sample_size
+        ]
+
+    # Bumped by every catalogue write, which can change any playlist's tracks
+    CATALOGUE_GENERATION_KEY = "smartplaylist:catalogue:generation"
+
+    @property
+    def cache_key(self):
+        """
+        Prefix for the cached results of the current rule and catalogue
+        generations.
+        """
+        generation_key = f"smartplaylist:{self.uuid}:generation"
+        generation = cache.get_or_set(generation_key, 0, timeout=None)
+        catalogue = cache.get_or_set(self.CATALOGUE_GENERATION_KEY, 0, timeout=None)
+        return f"smartplaylist:{self.uuid}:{generation}:{catalogue}"
+
+    @classmethod
+    def next_catalogue_generation(cls):
+        try:
+            cache.incr(cls.CATALOGUE_GENERATION_KEY)
+        except ValueError:
+            cache.set(cls.CATALOGUE_GENERATION_KEY, 1, timeout=None)
+
+    @classmethod
+    def invalidate_catalogue(cls):
+        """
+        Drops the cached results of every smart playlist, now and again once
+        the current transaction commits, as results read meanwhile do not
+        show the write.
+        """
+        cls.next_catalogue_generation()
+        transaction.on_commit(cls.next_catalogue_generation)
+
+    def invalidate_cache(self):
+        generation_key = f"smartplaylist:{self.uuid}:generation"
+        try:
+            cache.incr(generation_key)
+        except ValueError:
+            cache.set(generation_key, 1, timeout=None)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.invalidate_cache()
+
+
+class TrackCooccurrence(models.Model):
+    """
+    One non-zero cell of the sparse track-by-track co-occurrence matrix:
+    the number of playlists containing both tracks.
+    """
+
+    track = models.ForeignKey(
+        Track, related_name="cooccurrences", on_delete=models.CASCADE
+    )
+    other = models.ForeignKey(
+        Track, related_name="cooccurring", on_delete=models.CASCADE
+    )
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = (models.Index(fields=("track", "-count", "other")),)
+        constraints = (
+            models.UniqueConstraint(
+                fields=("track", "other"), name="unique_track_cooccurrence"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.track_id} - {self.other_id} ({self.count})"
+
+
+class StaleCooccurrence(models.Model):
+    """
+    A track whose playlist membership changed since the co-occurrence matrix
+    was last built.  Kept as a plain id, since a deleted track is marked as
+    its playlist entries cascade away.  Marking a track already marked is a
+    no-op.
+    """
+
+    track_id = models.BigIntegerField(unique=True)
+
+    @classmethod
+    def mark(cls, track_ids):
+        cls.objects.bulk_create(
+            (cls(track_id=track_id) for track_id in set(track_ids)),
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def mark_entries(cls, playlist_tracks):
+        """
+        Marks the tracks of the ``playlist_tracks`` queryset with a single
+        ``INSERT ... SELECT``, without reading them.
+        """
+        select, params = (
+            playlist_tracks.order_by()
+            .values("track")
+            .distinct()
+            .query.sql_with_params()
+        )
+        ops = connection.ops
+        insert = ops.insert_statement(on_conflict=OnConflict.IGNORE)
+        table = ops.quote_name(cls._meta.db_table)
+        suffix = ops.on_conflict_suffix_sql(
+            [cls._meta.get_field("track_id")], OnConflict.IGNORE, None, None
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"{insert} {table} (track_id) {select} {suffix}", params)
+
+
+class PlaylistChange(models.Model):
+    """
+    One operation of a playlist's append-only change log.  The primary key
+    is the sequence number clients sync from.
+
+    Entries and tracks are kept as plain UUIDs, so the log still describes
+    entries whose rows, or tracks, were deleted since.
+    """
+
+    class Operation(models.TextChoices):
+        ADD = "add", _("Add")
+        REMOVE = "remove", _("Remove")
+        MOVE = "move", _("Move")
+        RENAME = "rename", _("Rename")
+        SNAPSHOT = "snapshot", _("Snapshot")
+
+    playlist = models.ForeignKey(
+        Playlist, related_name="changes", on_delete=models.CASCADE
+    )
+    operation = models.CharField(max_length=10, choices=Operation.choices)
+    entry_uuid = models.UUIDField(
+        blank=True, null=True, help_text=_("The UUID of the PlaylistTrack")
+    )
+    track_uuid = models.UUIDField(blank=True, null=True)
+    order = models.PositiveIntegerField(blank=True, null=True)
+    name = models.CharField(max_length=255, blank=True)
+    snapshot = models.JSONField(
+        blank=True,
+        null=True,
+        help_text=_("The playlist's name and entries as of this sequence number"),
+    )
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=("playlist", "id"))]
+
+    def __str__(self):
+        return f"{self.playlist_id} #{self.pk} {self.operation}"
+
+
+class CatalogueChange(models.Model):
+    """
+    The latest write to an artist, album or track.  The primary key is a
+    catalogue-wide sequence number: every write replaces the object's row
+    with a new one, so the rows after a sequence number are exactly the
+    objects written since, each listed once.
+
+    Deleted objects keep a tombstone row, so syncing clients learn about
+    them.
+
+    Writers hold a lock from before they take sequence numbers until they
+    commit, so the numbers are visible in order: a client never reads a
+    sequence number before a smaller one commits.
+    """
+
+    # The key of the PostgreSQL advisory lock writers hold
+    LOCK_ID = 0x6772756E6765
+
+    class Kind(models.TextChoices):
+        ARTIST = "artist", _("Artist")
+        ALBUM = "album", _("Album")
+        TRACK = "track", _("Track")
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_uuid = models.UUIDField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=("kind", "object_uuid"), name="unique_catalogue_change"
+            )
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} {self.object_uuid}"
+
+    @classmethod
+    def lock(cls):
+        """
+        Takes the change log's write lock until the current transaction
+        ends.  SQLite needs none, as it lets one transaction write at a
+        time.
+        """
+        if connection.vendor == "postgresql" and connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [cls.LOCK_ID])
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a playlist write sent with an ``Idempotency-Key``
+    header, replayed to retries of the write with the same key until it
+    expires.  A row without a status is a write still running.
+    """
+
+    key = models.CharField(max_length=255)
+    scope = models.CharField(
+        max_length=64, help_text=_("The user, or anonymous clients, the key is for")
+    )
+    request_hash = models.BinaryField(
+        max_length=32, help_text=_("SHA-256 of the request's method, path and body")
+    )
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    expires = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("scope", "key"), name="unique_idempotency_key"
+            )
+        ]
+        indexes = [models.Index(fields=("expires",))]
+
+    def __str__(self):
+        return f"{self.scope} {self.key}"
@@ -0,0 +1,305 @@
+import json
+
+from django.db import NotSupportedError, connection, transaction
+from django.db.models import Case, F, Max, Min, Value, When, Window
+from django.db.models.functions import RowNumber
+
+from . import changes
+from .models import Playlist, PlaylistChange, PlaylistTrack, StaleCooccurrence, Track
+
+
+def get_sequence_sql(vendor):
+    """
+    Returns a subquery turning a JSON array parameter into ``(id, position)``
+    rows, with 1-based positions, or ``None`` if the backend has no JSON
+    table function.
+    """
+    if vendor == "sqlite":
+        return (
+            "SELECT CAST(value AS INTEGER) AS id, key + 1 AS position "
+            "FROM json_each(%s)"
+        )
+    if vendor == "postgresql":
+        return (
+            "SELECT value::bigint AS id, ordinality AS position "
+            "FROM jsonb_array_elements_text(%s::jsonb) WITH ORDINALITY"
+        )
+    return None
+
+
+def reorder_playlist_tracks(playlist, playlist_track_ids):
+    """
+    Gives the playlist's entries the positions 1..n in the given order.
+
+    The whole sequence is applied with a constant number of statements: all
+    entries are first moved above both the old and the new positions, so no
+    intermediate state can break the ``(playlist, order)`` unique constraint,
+    then every entry is set to its new position by joining the sequence.
+
+    Raises ``ValueError`` unless ``playlist_track_ids`` lists every entry of
+    the playlist exactly once.
+    """
+    playlist_track_ids = [int(pk) for pk in playlist_track_ids]
+    playlist_tracks = PlaylistTrack.objects.filter(playlist=playlist)
+
+    with transaction.atomic():
+        previous_orders = dict(playlist_tracks.values_list("pk", "order"))
+        existing_ids = set(previous_orders)
+        if len(playlist_track_ids) != len(existing_ids) or existing_ids != set(
+            playlist_track_ids
+        ):
+            raise ValueError("The sequence must list every playlist track once.")
+        if not playlist_track_ids:
+            return 0
+
+        max_order = playlist_tracks.aggregate(Max("order"))["order__max"]
+        playlist_tracks.update(
+            order=F("order") + max(max_order, len(playlist_track_ids)) + 1
+        )
+
+        sequence_sql = get_sequence_sql(connection.vendor)
+        if sequence_sql is None:
+            playlist_tracks.update(
+                order=Case(
+                    *(
+                        When(pk=pk, then=Value(position))
+                        for position, pk in enumerate(playlist_track_ids, start=1)
+                    )
+                )
+            )
+        else:
+            table = connection.ops.quote_name(PlaylistTrack._meta.db_table)
+            order = connection.ops.quote_name("order")
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} SET {order} = sequence.position "
+                    f"FROM ({sequence_sql}) AS sequence "
+                    f"WHERE {table}.id = sequence.id AND {table}.playlist_id = %s",
+                    [json.dumps(playlist_track_ids), playlist.pk],
+                )
+
+        record_moves(playlist, previous_orders)
+
+    return len(playlist_track_ids)
+
+
+def record_moves(playlist, previous_orders):
+    """
+    Logs a move for every entry of the playlist whose order differs from
+    ``previous_orders``, a mapping of primary keys to orders.
+    """
+    changes.record_entries(
+        playlist.pk,
+        PlaylistChange.Operation.MOVE,
+        (
+            (entry_uuid, track_uuid, order)
+            for pk, entry_uuid, track_uuid, order in PlaylistTrack.objects.filter(
+                playlist=playlist
+            ).values_list("pk", *changes.ENTRY_FIELDS)
+            if previous_orders.get(pk) != order
+        ),
+    )
+
+
+def get_uuid_sql(vendor):
+    """
+    Returns an SQL expression generating a random UUID in the format the
+    backend stores ``BinaryUUIDField`` values in.
+    """
+    if vendor == "sqlite":
+        return "randomblob(16)"
+    if vendor == "postgresql":
+        return "gen_random_uuid()"
+    raise NotSupportedError(
+        f"Playlist composition is not supported on {connection.vendor}."
+    )
+
+
+def get_summary(playlist, added=0, removed=0):
+    return {
+        "playlist": playlist,
+        "added": added,
+        "removed": removed,
+        "count": playlist.playlist_tracks.count(),
+    }
+
+
+def check_row_storage(*playlists):
+    for playlist in playlists:
+        if playlist.is_packed:
+            raise ValueError(
+                f"Playlist {playlist.uuid} uses packed storage, which does not "
+                "support composition."
+            )
+
+
+def append_tracks(playlist, source):
+    """
+    Appends the tracks of ``source`` that are not yet in the playlist, after
+    its last entry, with one ``INSERT ... SELECT``.
+
+    ``source`` is a queryset of ``source_track`` and ``source_position``
+    values giving the tracks in the order to append them.
+
+    Returns the number of entries added.
+    """
+    table = connection.ops.quote_name(PlaylistTrack._meta.db_table)
+    stale_table = connection.ops.quote_name(StaleCooccurrence._meta.db_table)
+    order = connection.ops.quote_name("order")
+    source_sql, source_params = source.order_by().query.sql_with_params()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        last_id = PlaylistTrack.objects.aggregate(Max("id"))["id__max"] or 0
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (uuid, playlist_id, track_id, {order})
+            SELECT
+                {get_uuid_sql(connection.vendor)},
+                %s,
+                source.source_track,
+                base.max_order + ROW_NUMBER() OVER (ORDER BY source.source_position)
+            FROM ({source_sql}) AS source, (
+                SELECT COALESCE(MAX({order}), 0) AS max_order
+                FROM {table} WHERE playlist_id = %s
+            ) AS base
+            WHERE source.source_track NOT IN (
+                SELECT track_id FROM {table} WHERE playlist_id = %s
+            )
+            """,
+            [playlist.pk, *source_params, playlist.pk, playlist.pk],
+        )
+        added = cursor.rowcount
+        cursor.execute(
+            f"""
+            INSERT INTO {stale_table} (track_id)
+            SELECT track_id FROM {table} WHERE playlist_id = %s AND id > %s
+            """,
+            [playlist.pk, last_id],
+        )
+        changes.record_playlist_tracks(
+            playlist,
+            PlaylistChange.Operation.ADD,
+            PlaylistTrack.objects.filter(playlist=playlist, id__gt=last_id),
+        )
+
+    return added
+
+
+def get_track_source(tracks, *ordering):
+    return tracks.values(
+        source_track=F("pk"),
+        source_position=Window(RowNumber(), order_by=ordering),
+    )
+
+
+def get_playlist_source(playlist):
+    # A track listed more than once is appended at its first position
+    return (
+        PlaylistTrack.objects.filter(playlist=playlist)
+        .values(source_track=F("track"))
+        .annotate(source_position=Min("order"))
+    )
+
+
+def append_album(playlist, album):
+    check_row_storage(playlist)
+    tracks = Track.objects.filter(album=album)
+    added = append_tracks(playlist, get_track_source(tracks, "number", "name"))
+    return get_summary(playlist, added=added)
+
+
+def append_artist(playlist, artist):
+    check_row_storage(playlist)
+    tracks = Track.objects.filter(album__artist=artist)
+    source = get_track_source(
+        tracks, "album__year", "album__name", "album_id", "number", "name"
+    )
+    return get_summary(playlist, added=append_tracks(playlist, source))
+
+
+def merge_playlists(playlist, other):
+    """
+    Appends the tracks of ``other`` missing from ``playlist``, in their
+    order in ``other``.
+    """
+    check_row_storage(playlist, other)
+    added = append_tracks(playlist, get_playlist_source(other))
+    return get_summary(playlist, added=added)
+
+
+def fork_playlist(playlist, name=None):
+    """
+    Creates a copy of the playlist with the same tracks in the same order.
+    """
+    check_row_storage(playlist)
+    with transaction.atomic():
+        fork = Playlist.objects.create(name=name or playlist.name)
+        added = append_tracks(fork, get_playlist_source(playlist))
+    return get_summary(fork, added=added)
+
+
+def renumber_playlist_tracks(playlist):
+    """
+    Closes the gaps in the playlist's order with a constant number of
+    statements, keeping the entries' relative order.
+    """
+    table = connection.ops.quote_name(PlaylistTrack._meta.db_table)
+    order = connection.ops.quote_name("order")
+    playlist_tracks = PlaylistTrack.objects.filter(playlist=playlist)
+    source_sql, source_params = (
+        playlist_tracks.values(
+            source_id=F("pk"),
+            source_position=Window(RowNumber(), order_by=F("order").asc()),
+        )
+        .order_by()
+        .query.sql_with_params()
+    )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        previous_orders = dict(playlist_tracks.values_list("pk", "order"))
+        max_order = max(previous_orders.values(), default=0)
+        playlist_tracks.update(order=F("order") + max_order + 1)
+        cursor.execute(
+            f"""
+            UPDATE {table} SET {order} = source.source_position
+            FROM ({source_sql}) AS source
+            WHERE {table}.id = source.source_id
+            """,
+            source_params,
+        )
+        record_moves(playlist, previous_orders)
+
+
+def dedupe_playlist(playlist):
+    """
+    Removes repeated tracks from the playlist, keeping each track's first
+    entry, then closes the gaps left in the order.
+    """
+    check_row_storage(playlist)
+    table = connection.ops.quote_name(PlaylistTrack._meta.db_table)
+    duplicates = (
+        PlaylistTrack.objects.filter(playlist=playlist)
+        .annotate(
+            occurrence=Window(
+                RowNumber(), partition_by="track", order_by=F("order").asc()
+            )
+        )
+        .filter(occurrence__gt=1)
+        .order_by()
+    )
+    duplicates_sql, duplicates_params = duplicates.values("pk").query.sql_with_params()
+
+    # The playlist keeps the same set of tracks, so unlike a model delete
+    # there is nothing for the co-occurrence bookkeeping to record
+    with transaction.atomic(), connection.cursor() as cursor:
+        changes.record_playlist_tracks(
+            playlist, PlaylistChange.Operation.REMOVE, duplicates
+        )
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id IN ({duplicates_sql})", duplicates_params
+        )
+        removed = cursor.rowcount
+        if removed:
+            renumber_playlist_tracks(playlist)
+
+    return get_summary(playlist, removed=removed)
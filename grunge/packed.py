@@ -0,0 +1,193 @@
+import struct
+
+from django.db import transaction
+from django.db.models import BinaryField
+from django.db.models.functions import Length, Substr
+
+from . import changes
+from .models import Playlist, PlaylistTrack, StaleCooccurrence, Track
+
+# Each entry is the track's primary key as a little-endian int64
+ENTRY_FORMAT = "<q"
+ENTRY_SIZE = struct.calcsize(ENTRY_FORMAT)
+
+
+def pack(track_ids):
+    track_ids = list(track_ids)
+    return struct.pack(f"<{len(track_ids)}q", *track_ids)
+
+
+def unpack(data):
+    data = bytes(data)
+    return list(struct.unpack(f"<{len(data) // ENTRY_SIZE}q", data))
+
+
+def get_entry_substr(position, length=1):
+    """
+    Returns an expression reading ``length`` entries from ``position`` on,
+    so only those bytes are decoded and sent by the database.
+    """
+    return Substr(
+        "packed_tracks",
+        position * ENTRY_SIZE + 1,
+        length * ENTRY_SIZE,
+        output_field=BinaryField(),
+    )
+
+
+def get_length(playlist):
+    size = (
+        Playlist.objects.filter(pk=playlist.pk)
+        .annotate(size=Length("packed_tracks"))
+        .values_list("size", flat=True)
+        .get()
+    )
+    return (size or 0) // ENTRY_SIZE
+
+
+def read_window(playlist, start, stop):
+    """
+    Returns the track ids at positions ``start`` to ``stop``.
+    """
+    if stop <= start:
+        return []
+
+    window = (
+        Playlist.objects.filter(pk=playlist.pk)
+        .annotate(window=get_entry_substr(start, stop - start))
+        .values_list("window", flat=True)
+        .get()
+    )
+    return unpack(window or b"")
+
+
+def read_positions(playlist, positions):
+    """
+    Returns the track ids at arbitrary positions with a single query that
+    reads one entry per position.
+    """
+    if not positions:
+        return []
+
+    entries = (
+        Playlist.objects.filter(pk=playlist.pk)
+        .values_list(*(get_entry_substr(position) for position in positions))
+        .get()
+    )
+    return [unpack(entry)[0] for entry in entries]
+
+
+def read_all(playlist):
+    return unpack(
+        Playlist.objects.filter(pk=playlist.pk)
+        .values_list("packed_tracks", flat=True)
+        .get()
+    )
+
+
+def write_all(playlist, track_ids):
+    track_ids = list(track_ids)
+    Playlist.objects.filter(pk=playlist.pk).update(packed_tracks=pack(track_ids))
+    StaleCooccurrence.mark(track_ids)
+    # Packed entries have no identity to log single edits against
+    changes.record_snapshot(playlist, track_ids)
+
+
+def remove_tracks(track_ids):
+    """
+    Strips the tracks from every packed playlist holding them, as their
+    entries have no rows to cascade away with a deleted track.  Reads each
+    packed playlist once, and writes, logs and bumps the version of only
+    those that change.
+    """
+    track_ids = set(track_ids)
+    if not track_ids:
+        return
+
+    playlists = Playlist.objects.filter(storage=Playlist.Storage.PACKED)
+    for playlist in playlists.defer(None).iterator():
+        entries = unpack(playlist.packed_tracks)
+        kept = [track_id for track_id in entries if track_id not in track_ids]
+        if len(kept) < len(entries):
+            write_all(playlist, kept)
+            playlist.bump_version()
+
+
+def get_entries(playlist, track_ids, positions):
+    """
+    Returns unsaved ``PlaylistTrack`` instances for the tracks at the given
+    positions, fetching the tracks with a single ``pk__in`` query.
+    """
+    tracks = Track.objects.in_bulk(track_ids)
+    return [
+        PlaylistTrack(playlist=playlist, track=tracks[track_id], order=position + 1)
+        for track_id, position in zip(track_ids, positions)
+        if track_id in tracks
+    ]
+
+
+class PackedPlaylistTracks:
+    """
+    Sliceable view over the entries of a packed playlist.  Each slice
+    decodes only its own bytes and joins them to ``Track`` in one query.
+    """
+
+    def __init__(self, playlist):
+        self.playlist = playlist
+
+    def count(self):
+        if not hasattr(self, "_count"):
+            self._count = get_length(self.playlist)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError("PackedPlaylistTracks only supports contiguous slices.")
+
+        start, stop, _ = index.indices(self.count())
+        track_ids = read_window(self.playlist, start, stop)
+        return get_entries(self.playlist, track_ids, range(start, stop))
+
+    def iterate(self, page_size=1000):
+        """
+        Yields every entry, reading the playlist one page at a time.
+        """
+        for start in range(0, self.count(), page_size):
+            yield from self[start : start + page_size]
+
+
+def pack_playlist(playlist):
+    """
+    Moves the playlist's ``PlaylistTrack`` rows into its packed column.
+    """
+    with transaction.atomic():
+        track_ids = list(playlist.playlist_tracks.values_list("track", flat=True))
+        playlist.packed_tracks = pack(track_ids)
+        playlist.storage = Playlist.Storage.PACKED
+        playlist.save(update_fields=("packed_tracks", "storage"))
+        playlist.playlist_tracks.all().delete()
+        # The matrix only counts rows, so the pairs of these tracks change
+        StaleCooccurrence.mark(track_ids)
+        playlist.bump_version()
+        changes.record_snapshot(playlist, track_ids)
+
+
+def unpack_playlist(playlist):
+    """
+    Moves the playlist's packed entries back into ``PlaylistTrack`` rows.
+    """
+    with transaction.atomic():
+        track_ids = unpack(playlist.packed_tracks)
+        PlaylistTrack.objects.bulk_create(
+            PlaylistTrack(playlist=playlist, track_id=track_id, order=order)
+            for order, track_id in enumerate(track_ids, start=1)
+        )
+        StaleCooccurrence.mark(track_ids)
+        playlist.packed_tracks = b""
+        playlist.storage = Playlist.Storage.ROWS
+        playlist.save(update_fields=("packed_tracks", "storage"))
+        playlist.bump_version()
+        changes.record_snapshot(playlist)
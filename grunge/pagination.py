@@ -1,7 +1,347 @@
+import hashlib
+import json
+
 from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import (
+    EmptyPage,
+    InvalidPage,
+    Page,
+    PageNotAnInteger,
+    Paginator,
+)
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
 from rest_framework.pagination import PageNumberPagination as DRFPageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def get_planner_estimate(queryset):
+    """
+    Returns the database's own estimate of the queryset's row count, or
+    ``None`` when the backend has none: PostgreSQL plans any query, and
+    SQLite estimates whole tables once they have been analyzed.
+    """
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return plan[0]["Plan"]["Plan Rows"]
+
+        # sqlite_stat1 is created when the database is first analyzed
+        if (
+            connection.vendor == "sqlite"
+            and not queryset.query.where
+            and "sqlite_stat1" in connection.introspection.table_names(cursor)
+        ):
+            cursor.execute(
+                "SELECT stat FROM sqlite_stat1 WHERE tbl = %s",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            return row and int(row[0].split()[0])
+
+    return None
+
+
+def count_queryset(queryset, threshold=None):
+    """
+    Counts the queryset exactly up to ``threshold`` rows, reading no more
+    than that, and estimates larger counts.
+
+    Estimates come from the query planner where it has one, and are
+    otherwise exact counts cached for ``COUNT_CACHE_TIMEOUT`` seconds.
+
+    Returns the count and whether it is an estimate.
+    """
+    threshold = settings.EXACT_COUNT_THRESHOLD if threshold is None else threshold
+    queryset = queryset.order_by()
+
+    count = queryset.values("pk")[: threshold + 1].count()
+    if count <= threshold:
+        return count, False
+
+    estimate = get_planner_estimate(queryset)
+    if estimate is None:
+        sql = str(queryset.query).encode()
+        estimate = cache.get_or_set(
+            f"count:{queryset.db}:{hashlib.sha256(sql).hexdigest()}",
+            queryset.count,
+            timeout=settings.COUNT_CACHE_TIMEOUT,
+        )
+    # Never below what the exact count has seen
+    return max(estimate, threshold + 1), True
+
+
+class EstimatedCountPage(Page):
+    def has_next(self):
+        if self.paginator.is_estimated:
+            return self.number in self.paginator.continued_pages
+        return super().has_next()
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that counts results with ``count_queryset``.
+
+    Pages of estimated results are read without checking the estimate: a
+    page reads one row past its end to know whether a next page exists, and
+    only pages past the last row are empty.
+
+    Lazy pages keep their rows as a queryset, which is only read when the
+    page is iterated.
+    """
+
+    threshold = None
+
+    def __init__(self, *args, lazy=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy = lazy
+        self.continued_pages = set()
+
+    @cached_property
+    def counted(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count, False
+        return count_queryset(self.object_list, self.threshold)
+
+    @property
+    def count(self):
+        return self.counted[0]
+
+    @property
+    def is_estimated(self):
+        return self.counted[1]
+
+    @property
+    def exact_count_threshold(self):
+        return (
+            settings.EXACT_COUNT_THRESHOLD if self.threshold is None else self.threshold
+        )
+
+    def validate_number(self, number):
+        if not self.is_estimated:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        if not self.is_estimated:
+            return super().page(number)
+
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        if self.lazy:
+            return self.lazy_page(number, bottom)
+        rows = list(self.object_list[bottom : bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        if len(rows) > self.per_page:
+            self.continued_pages.add(number)
+        return self._get_page(rows[: self.per_page], number, self)
+
+    def lazy_page(self, number, bottom):
+        top = bottom + self.per_page
+        if self.object_list[top : top + 1].exists():
+            self.continued_pages.add(number)
+        elif number > 1 and not self.object_list[bottom:top].exists():
+            raise EmptyPage(self.error_messages["no_results"])
+        return self._get_page(self.object_list[bottom:top], number, self)
+
+    def _get_page(self, *args, **kwargs):
+        return EstimatedCountPage(*args, **kwargs)
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        if not self.is_estimated:
+            yield from super().get_elided_page_range(
+                number, on_each_side=on_each_side, on_ends=on_ends
+            )
+            return
+
+        # The last page is unknown, so the range ends after the next page
+        number = self.validate_number(number)
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number in self.continued_pages or self.page(number).has_next():
+            yield number + 1
+            yield self.ELLIPSIS
 
 
 class PageNumberPagination(DRFPageNumberPagination):
 
+    django_paginator_class = EstimatedCountPaginator
     page_size_query_param = settings.PAGE_SIZE_QUERY_PARAM
+
+    def paginate_lazily(self, queryset, request, view=None):
+        """
+        Paginates ``queryset`` as ``paginate_queryset`` does, but returns
+        the page's rows as a queryset, to be read as the response is
+        streamed.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size, lazy=True)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        return self.page.object_list
+
+
+class ShufflePagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination over a seeded shuffle that keeps the seed in the
+    page links, so following them walks the same permutation.
+    """
+
+    seed_query_param = "seed"
+
+    def __init__(self, seed):
+        self.seed = seed
+
+    def get_next_link(self):
+        url = super().get_next_link()
+        return url and replace_query_param(url, self.seed_query_param, self.seed)
+
+    def get_previous_link(self):
+        url = super().get_previous_link()
+        return url and replace_query_param(url, self.seed_query_param, self.seed)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data = {"seed": self.seed, **response.data}
+        return response
+
+
+class CachedQuerySetWindow:
+    """
+    Sliceable stand-in for a queryset that caches its count and the primary
+    keys of every window read from it.
+
+    Only the requested window is ever queried, so a paginator can read a
+    large derived result page by page.  The rows themselves are fetched
+    with a single ``pk__in`` query per window from ``fetch_queryset``.
+    """
+
+    def __init__(self, queryset, cache_key, fetch_queryset=None, timeout=None):
+        self.queryset = queryset
+        self.cache_key = cache_key
+        if fetch_queryset is None:
+            fetch_queryset = queryset.model._default_manager.all()
+        self.fetch_queryset = fetch_queryset
+        self.timeout = (
+            settings.SMART_PLAYLIST_CACHE_TIMEOUT if timeout is None else timeout
+        )
+
+    def count(self):
+        return cache.get_or_set(
+            f"{self.cache_key}:count", self.queryset.count, timeout=self.timeout
+        )
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError("CachedQuerySetWindow only supports contiguous slices.")
+
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        pks = cache.get_or_set(
+            f"{self.cache_key}:{start}:{stop}",
+            lambda: list(self.queryset[start:stop].values_list("pk", flat=True)),
+            timeout=self.timeout,
+        )
+        objects = self.fetch_queryset.in_bulk(pks)
+        return [objects[pk] for pk in pks if pk in objects]
+
+
+class SequencePagination(BasePagination):
+    """
+    Keyset pagination over an increasing sequence field.
+
+    A page holds the rows after the ``since`` token and reports the token to
+    read the next page from, so reading a page costs O(page size) however
+    long the sequence is.
+    """
+
+    field = "id"
+    since_query_param = "since"
+    limit_query_param = "limit"
+    default_limit = 100
+    max_limit = 1000
+
+    def get_query_param(self, request, name, default, **kwargs):
+        try:
+            return serializers.IntegerField(**kwargs).run_validation(
+                request.query_params.get(name, default)
+            )
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({name: exc.detail})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.since = self.get_query_param(
+            request, self.since_query_param, 0, min_value=0
+        )
+        limit = self.get_query_param(
+            request,
+            self.limit_query_param,
+            self.default_limit,
+            min_value=1,
+            max_value=self.max_limit,
+        )
+
+        rows = list(
+            queryset.filter(**{f"{self.field}__gt": self.since}).order_by(self.field)[
+                : limit + 1
+            ]
+        )
+        self.has_next = len(rows) > limit
+        rows = rows[:limit]
+        self.sequence = getattr(rows[-1], self.field) if rows else self.since
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.since_query_param, self.sequence)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "since": self.since,
+                "sequence": self.sequence,
+                "next": self.get_next_link(),
+                "results": data,
+            }
+        )
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+
+from .models import PlaylistTrack, StaleCooccurrence, Track, TrackCooccurrence
+
+
+def build_cooccurrences(full=False):
+    """
+    Brings the co-occurrence matrix up to date with the playlists.
+
+    A full build recounts every pair.  Otherwise only the pairs involving a
+    track marked stale are recounted, which covers every cell a membership
+    change can affect.  Either way the counting is a single
+    ``INSERT ... SELECT`` self-join of ``PlaylistTrack``, skipping the
+    playlists longer than ``COOCCURRENCE_MAX_PLAYLIST_SIZE``, whose pairs
+    grow with the square of their length.  Packed playlists have no rows,
+    and are not counted either.
+
+    Returns the number of stale tracks processed, or ``None`` for a full
+    build.
+    """
+    quote_name = connection.ops.quote_name
+    cooccurrence_table = quote_name(TrackCooccurrence._meta.db_table)
+    playlist_track_table = quote_name(PlaylistTrack._meta.db_table)
+    stale_table = quote_name(StaleCooccurrence._meta.db_table)
+
+    sql = f"""
+        INSERT INTO {cooccurrence_table} (track_id, other_id, {quote_name("count")})
+        SELECT a.track_id, b.track_id, COUNT(DISTINCT a.playlist_id)
+        FROM {playlist_track_table} a
+        INNER JOIN {playlist_track_table} b
+            ON a.playlist_id = b.playlist_id AND a.track_id <> b.track_id
+        WHERE a.playlist_id IN (
+            SELECT playlist_id FROM {playlist_track_table}
+            GROUP BY playlist_id HAVING COUNT(*) <= %s
+        )
+    """
+    params = [settings.COOCCURRENCE_MAX_PLAYLIST_SIZE]
+
+    with transaction.atomic():
+        # Tracks marked stale while building are left for the next build
+        last_stale_id = StaleCooccurrence.objects.aggregate(Max("id"))["id__max"]
+        stale = StaleCooccurrence.objects.filter(id__lte=last_stale_id or 0)
+
+        if full:
+            TrackCooccurrence.objects.all().delete()
+        elif last_stale_id is None:
+            return 0
+        else:
+            stale_tracks = stale.values("track_id")
+            TrackCooccurrence.objects.filter(track__in=stale_tracks).delete()
+            TrackCooccurrence.objects.filter(other__in=stale_tracks).delete()
+
+            stale_subquery = f"SELECT track_id FROM {stale_table} WHERE id <= %s"
+            sql += f"""
+                AND (
+                    a.track_id IN ({stale_subquery})
+                    OR b.track_id IN ({stale_subquery})
+                )
+            """
+            params += [last_stale_id, last_stale_id]
+
+        sql += " GROUP BY a.track_id, b.track_id"
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+        processed = None if full else stale.count()
+        stale.delete()
+
+    return processed
+
+
+def get_similar_tracks(track, limit):
+    """
+    Returns the tracks that most often share a playlist with ``track``.
+    """
+    return (
+        Track.objects.filter(cooccurring__track=track)
+        .select_related("album", "album__artist")
+        .order_by("-cooccurring__count", "pk")[:limit]
+    )
+
+
+def get_playlist_continuation(playlist, limit):
+    """
+    Returns the tracks not yet in ``playlist`` that most often share a
+    playlist with its tracks.
+
+    Raises ``ValueError`` for packed playlists, which the matrix does not
+    count.
+    """
+    if playlist.is_packed:
+        raise ValueError(
+            f"Playlist {playlist.uuid} uses packed storage, which does not "
+            "support recommendations."
+        )
+
+    playlist_tracks = playlist.playlist_tracks.values("track")
+    return (
+        Track.objects.filter(cooccurring__track__in=playlist_tracks)
+        .exclude(pk__in=playlist_tracks)
+        .annotate(score=Sum("cooccurring__count"))
+        .select_related("album", "album__artist")
+        .order_by("-score", "pk")[:limit]
+    )
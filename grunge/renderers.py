@@ -0,0 +1,66 @@
+import json
+from collections.abc import Iterator, Mapping
+from functools import partial
+
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """
+    A JSONRenderer that can also write its output piece by piece, with
+    ``iter_render``, for ``StreamingHttpResponse``.  Iterators in the data,
+    such as the rows of a page serialized as they are read, are written one
+    item at a time and never held as a whole.
+    """
+
+    # Bytes gathered before they are sent
+    chunk_size = 16 * 1024
+
+    def iter_render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Renders ``data`` as ``render`` does, as an iterator of chunks of
+        bytes.  Streamed JSON is never indented.
+        """
+        separators = SHORT_SEPARATORS if self.compact else LONG_SEPARATORS
+        dumps = partial(
+            json.dumps,
+            cls=self.encoder_class,
+            ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict,
+            separators=separators,
+        )
+
+        chunk = []
+        size = 0
+        for piece in self.iter_json(data, dumps, separators):
+            # As in render, for JSON embedded in JavaScript
+            piece = piece.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+            chunk.append(piece.encode())
+            size += len(chunk[-1])
+            if size >= self.chunk_size:
+                yield b"".join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield b"".join(chunk)
+
+    def iter_json(self, data, dumps, separators):
+        item_separator, key_separator = separators
+        if isinstance(data, Mapping):
+            yield "{"
+            for index, (key, value) in enumerate(data.items()):
+                if index:
+                    yield item_separator
+                yield dumps(str(key)) + key_separator
+                yield from self.iter_json(value, dumps, separators)
+            yield "}"
+        elif isinstance(data, Iterator):
+            yield "["
+            for index, item in enumerate(data):
+                if index:
+                    yield item_separator
+                yield from self.iter_json(item, dumps, separators)
+            yield "]"
+        else:
+            yield dumps(data)
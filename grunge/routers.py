@@ -0,0 +1,163 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils.deprecation import MiddlewareMixin
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_replica = ContextVar("replica", default=None)
+
+
+class ReplicaPool:
+    """
+    Picks replicas by smooth weighted round-robin: over any run of picks
+    each healthy replica is chosen in proportion to its weight, without
+    bursts of one replica.
+
+    A replica's health is checked when it is picked, at most once per
+    ``REPLICA_HEALTH_CHECK_INTERVAL`` seconds, by one thread and outside of
+    the lock: other threads go on with the previous result meanwhile.
+    Failing replicas are skipped until a later check succeeds.
+    """
+
+    def __init__(self, weights):
+        self.weights = dict(weights)
+        self.current = dict.fromkeys(self.weights, 0)
+        self.health = {}
+        self.lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self.lock:
+            healthy, checked = self.health.get(alias, (None, None))
+            due = (
+                checked is None
+                or now - checked >= settings.REPLICA_HEALTH_CHECK_INTERVAL
+            )
+            if due:
+                self.health[alias] = (healthy, now)
+        if due:
+            healthy = self.check(alias)
+            with self.lock:
+                self.health[alias] = (healthy, now)
+        return bool(healthy)
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except DatabaseError:
+            return False
+        return True
+
+    def choose(self):
+        healthy = [alias for alias in self.weights if self.is_healthy(alias)]
+        with self.lock:
+            if not healthy:
+                return None
+            for alias in healthy:
+                self.current[alias] += self.weights[alias]
+            chosen = max(healthy, key=self.current.__getitem__)
+            self.current[chosen] -= sum(self.weights[alias] for alias in healthy)
+            return chosen
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_replica_pool():
+    """
+    Returns this process's pool of the ``REPLICA_DATABASES``, or ``None``
+    when there are none.
+    """
+    weights = settings.REPLICA_DATABASES
+    if not weights:
+        return None
+    key = tuple(sorted(weights.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ReplicaPool(weights)
+        return _pools[key]
+
+
+def is_pinned(request):
+    return settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+
+def pin_to_primary(response):
+    """
+    Sends the client's reads to the primary database for the next
+    ``REPLICA_PIN_SECONDS``, so it reads its own writes while the replicas
+    catch up.
+    """
+    response.set_cookie(
+        settings.REPLICA_PIN_COOKIE,
+        "1",
+        max_age=settings.REPLICA_PIN_SECONDS,
+        httponly=True,
+        samesite="Lax",
+    )
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """
+    Pins the client to the primary database after every successful unsafe
+    request, whichever view served it.
+    """
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(response)
+        return response
+
+
+@contextmanager
+def replica_reads(request):
+    """
+    Routes the reads of the code it wraps to a replica, for safe requests
+    of clients not pinned to the primary.
+    """
+    pool = get_replica_pool()
+    alias = None
+    if pool is not None and request.method in SAFE_METHODS and not is_pinned(request):
+        alias = pool.choose()
+
+    token = _replica.set(alias)
+    try:
+        yield alias
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Reads from the replica chosen for the current request, if any.  Writes,
+    reads outside of ``replica_reads``, and reads of the models that
+    authenticate requests use the default database.
+    """
+
+    # A password change or a revoked token takes effect at once
+    primary_app_labels = {"auth", "authtoken", "sessions"}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in self.primary_app_labels:
+            return None
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas copy the primary's schema, and are read-only
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
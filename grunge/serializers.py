@@ -1,11 +1,50 @@
 from furl import furl
-from rest_framework import serializers
+from rest_framework import exceptions, serializers, status
 from rest_framework.reverse import reverse as drf_reverse
 from django.db import transaction
-from django.db.models import F, Max
+from django.db.models import F, Max, QuerySet
+from django.db.models.manager import BaseManager
+
+from .fields import (
+    UUIDHyperlinkedIdentityField,
+    UUIDHyperlinkedRelatedField,
+    UUIDSlugRelatedField,
+)
+from . import changes, packed
+from .models import (
+    Album,
+    Artist,
+    CatalogueChange,
+    Track,
+    TrackListing,
+    Playlist,
+    PlaylistChange,
+    PlaylistTrack,
+    SmartPlaylist,
+    StaleCooccurrence,
+)
+
+
+class StreamingListSerializer(serializers.ListSerializer):
+    """
+    A ListSerializer that, when the context has ``streaming`` set, returns
+    a generator serializing the items as they are read from the database,
+    for ``StreamingJSONRenderer``.
+    """
+
+    # Rows read from the database at a time
+    chunk_size = 100
+
+    def to_representation(self, data):
+        if not self.context.get("streaming"):
+            return super().to_representation(data)
 
-from .fields import UUIDHyperlinkedIdentityField
-from .models import Album, Artist, Track, Playlist, PlaylistTrack
+        iterable = data.all() if isinstance(data, BaseManager) else data
+        if isinstance(iterable, QuerySet):
+            # Reads from the database chosen now, as the response is streamed
+            # after the view returns
+            iterable = iterable.using(iterable.db).iterator(self.chunk_size)
+        return (self.child.to_representation(item) for item in iterable)
 
 
 class TrackAlbumArtistSerializer(serializers.ModelSerializer):
@@ -53,6 +92,49 @@ class TrackSerializer(serializers.ModelSerializer):
         fields = ("uuid", "url", "name", "number", "album")
 
 
+class TrackListingArtistSerializer(serializers.Serializer):
+    """
+    Serializer for the artist columns of a TrackListing, in the form of
+    TrackAlbumArtistSerializer.
+    """
+
+    id = serializers.ReadOnlyField(source="artist_id")
+    uuid = serializers.ReadOnlyField(source="artist_uuid")
+    url = UUIDHyperlinkedIdentityField(
+        view_name="artist-detail", lookup_field="artist_uuid"
+    )
+    name = serializers.ReadOnlyField(source="artist_name")
+
+
+class TrackListingAlbumSerializer(serializers.Serializer):
+    """
+    Serializer for the album columns of a TrackListing, in the form of
+    TrackAlbumSerializer.
+    """
+
+    uuid = serializers.ReadOnlyField(source="album_uuid")
+    url = UUIDHyperlinkedIdentityField(
+        view_name="album-detail", lookup_field="album_uuid"
+    )
+    name = serializers.ReadOnlyField(source="album_name")
+    artist = TrackListingArtistSerializer(source="*")
+
+
+class TrackListingSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the TrackListing model, rendering a track as
+    TrackSerializer does from the listing's row alone.
+    """
+
+    uuid = serializers.ReadOnlyField()
+    url = UUIDHyperlinkedIdentityField(view_name="track-detail")
+    album = TrackListingAlbumSerializer(source="*")
+
+    class Meta:
+        model = TrackListing
+        fields = ("uuid", "url", "name", "number", "album")
+
+
 class AlbumTrackSerializer(TrackSerializer):
     """
     Simplified serializer for Track model used inside Album.
@@ -65,6 +147,7 @@ class AlbumTrackSerializer(TrackSerializer):
     class Meta:
         model = Track
         fields = ("uuid", "url", "name", "number")
+        list_serializer_class = StreamingListSerializer
 
 
 
@@ -140,22 +223,66 @@ class PlaylistTrackSerializer(serializers.ModelSerializer):
             "track_name",
         ]
 
+
+class StalePlaylistVersion(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The playlist was changed since this version was read."
+    default_code = "stale_version"
+
+    def __init__(self, version):
+        super().__init__()
+        # The current version, for the client to retry from
+        self.detail = {"detail": self.detail, "version": version}
+
+
+def bump_playlist_version(playlist, expected=None):
+    """
+    Moves the playlist to its next version, if it is still at version
+    ``expected``, by default the one it was read at.  Raises
+    ``StalePlaylistVersion``, with the current version, otherwise.
+    """
+    if expected is None:
+        expected = playlist.version
+    if not playlist.bump_version(expected):
+        current = (
+            Playlist.objects.filter(pk=playlist.pk)
+            .values_list("version", flat=True)
+            .first()
+        )
+        if current is None:
+            raise exceptions.NotFound()
+        raise StalePlaylistVersion(current)
+
+
 class PlaylistSerializer(serializers.ModelSerializer):
     """
     Serializer for Playlist model.
     Manages creation and update of playlist tracks and their order.
+
+    Updates may send the ``version`` they were made from, and are refused
+    with ``409 Conflict`` if the playlist was changed since.
     """
 
     tracks = PlaylistTrackSerializer(source="playlist_tracks", many=True)
+    version = serializers.IntegerField(min_value=1, required=False)
 
     class Meta:
         model = Playlist
-        fields = ["uuid", "name", "tracks"]
+        fields = ["uuid", "name", "version", "tracks"]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.is_packed:
+            entries = packed.PackedPlaylistTracks(instance).iterate()
+            data["tracks"] = PlaylistTrackSerializer(entries, many=True).data
+        return data
 
     def validate_tracks(self, value):
         track_ids = [item['track'] for item in value]
         if len(track_ids) != len(set(track_ids)):
             raise serializers.ValidationError("Duplicate tracks are not allowed in a playlist.")
+        # The writes resolve the tracks again, from the identity map
+        Track.objects.load_uuids(track_ids)
         return value
 
 
@@ -164,14 +291,36 @@ class PlaylistSerializer(serializers.ModelSerializer):
         Creates a new playlist and adds associated tracks in correct order.
         """
         tracks_data = validated_data.pop("playlist_tracks")
+        version = validated_data.pop("version", None)
         playlist_name = validated_data.get("name")
 
-        playlist, _ = Playlist.objects.get_or_create(
-            name=playlist_name, defaults=validated_data
-        )
+        with transaction.atomic():
+            # Names are not unique, as forks share theirs: the first
+            # playlist with the name takes the tracks
+            playlist = (
+                Playlist.objects.filter(name=playlist_name).order_by("pk").first()
+            )
+            if playlist is None:
+                playlist = Playlist.objects.create(**validated_data)
+            else:
+                bump_playlist_version(playlist, version)
+
+            if playlist.is_packed:
+                self._add_tracks_to_packed_playlist(playlist, tracks_data)
+                return playlist
 
-        for track_data in tracks_data:
-            self._add_track_to_playlist(playlist, track_data)
+            previous_orders = dict(
+                playlist.playlist_tracks.values_list("pk", "order")
+            )
+            added = [
+                self._add_track_to_playlist(playlist, track_data)
+                for track_data in tracks_data
+            ]
+            # Logged once, as the entries ended up
+            changes.record_edits(playlist, previous_orders)
+            StaleCooccurrence.mark(
+                playlist_track.track_id for playlist_track in added if playlist_track
+            )
 
         return playlist
 
@@ -180,12 +329,17 @@ class PlaylistSerializer(serializers.ModelSerializer):
         Updates playlist name and its tracks with ordering.
         """
         tracks_data = validated_data.pop("playlist_tracks", None)
+        version = validated_data.pop("version", None)
         instance.name = validated_data.get("name", instance.name)
 
         with transaction.atomic():
+            # First, so a concurrent write fails before any track is written
+            bump_playlist_version(instance, version)
             instance.save()
 
-            if tracks_data is not None:
+            if tracks_data is not None and instance.is_packed:
+                self._update_packed_playlist_tracks(instance, tracks_data)
+            elif tracks_data is not None:
                 self._update_playlist_tracks(instance, tracks_data)
 
         return instance
@@ -196,10 +350,10 @@ class PlaylistSerializer(serializers.ModelSerializer):
         """
         order = track_data["order"]
         track_uuid = track_data["track"]
-        track = Track.objects.get(uuid=track_uuid)
+        track = Track.objects.get_by_uuid(track_uuid)
 
         if PlaylistTrack.objects.filter(playlist=playlist, track=track).exists():
-            return
+            return None
 
         max_order = PlaylistTrack.objects.filter(playlist=playlist).aggregate(
             Max("order")
@@ -212,21 +366,196 @@ class PlaylistSerializer(serializers.ModelSerializer):
             PlaylistTrack.objects.filter(
                 playlist=playlist, order__gte=order
             ).order_by("-order").update(order=F("order") + 1)
-
-            PlaylistTrack.objects.create(
+            return PlaylistTrack.objects.create(
                 playlist=playlist, track=track, order=order
             )
 
     def _update_playlist_tracks(self, instance, tracks_data):
-    
+        # The removed tracks' pairs, with one INSERT ... SELECT
+        StaleCooccurrence.mark_entries(instance.playlist_tracks.all())
+        changes.record_playlist_tracks(
+            instance, PlaylistChange.Operation.REMOVE, instance.playlist_tracks.all()
+        )
         instance.playlist_tracks.all().delete()
         playlist_tracks = []
         for item in tracks_data:
-            track_instance = Track.objects.get(uuid=item["track"])
+            track_instance = Track.objects.get_by_uuid(item["track"])
             playlist_tracks.append(PlaylistTrack(
                 playlist=instance,
                 track=track_instance,
                 order=item["order"]
             ))
         PlaylistTrack.objects.bulk_create(playlist_tracks)
+        changes.record_playlist_tracks(
+            instance, PlaylistChange.Operation.ADD, instance.playlist_tracks.all()
+        )
+        StaleCooccurrence.mark(
+            playlist_track.track_id for playlist_track in playlist_tracks
+        )
+
+    def _get_tracks(self, tracks_data):
+        """
+        Resolves the track UUIDs of ``tracks_data`` with a single query.
+        """
+        tracks = Track.objects.in_bulk_by_uuid(item["track"] for item in tracks_data)
+        missing = {str(item["track"]) for item in tracks_data} - {
+            str(uuid) for uuid in tracks
+        }
+        if missing:
+            raise serializers.ValidationError(
+                {"tracks": f"Unknown tracks: {', '.join(sorted(missing))}."}
+            )
+        return tracks
+
+    def _add_tracks_to_packed_playlist(self, playlist, tracks_data):
+        """
+        Inserts tracks into a packed playlist the same way
+        ``_add_track_to_playlist`` does for rows.
+        """
+        tracks = self._get_tracks(tracks_data)
+        track_ids = packed.read_all(playlist)
 
+        for item in tracks_data:
+            track_id = tracks[item["track"]].pk
+            if track_id not in track_ids:
+                position = min(max(item["order"], 1), len(track_ids) + 1) - 1
+                track_ids.insert(position, track_id)
+
+        packed.write_all(playlist, track_ids)
+
+    def _update_packed_playlist_tracks(self, instance, tracks_data):
+        tracks = self._get_tracks(tracks_data)
+        ordered = sorted(tracks_data, key=lambda item: item["order"])
+        packed.write_all(instance, [tracks[item["track"]].pk for item in ordered])
+
+
+class PlaylistAppendAlbumSerializer(serializers.Serializer):
+    album = UUIDSlugRelatedField(queryset=Album.objects.all())
+
+
+class PlaylistAppendArtistSerializer(serializers.Serializer):
+    artist = UUIDSlugRelatedField(queryset=Artist.objects.all())
+
+
+class PlaylistMergeSerializer(serializers.Serializer):
+    playlist = UUIDSlugRelatedField(queryset=Playlist.objects.all(), source="other")
+
+
+class PlaylistForkSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255, required=False)
+
+
+class PlaylistSummarySerializer(serializers.Serializer):
+    """
+    Compact result of a server-side playlist composition operation.
+    """
+
+    uuid = serializers.UUIDField(source="playlist.uuid")
+    url = UUIDHyperlinkedRelatedField(
+        view_name="playlist-detail", source="playlist", read_only=True
+    )
+    name = serializers.CharField(source="playlist.name")
+    version = serializers.IntegerField(source="playlist.version")
+    added = serializers.IntegerField()
+    removed = serializers.IntegerField()
+    count = serializers.IntegerField()
+
+
+class PlaylistChangeSerializer(serializers.ModelSerializer):
+    """
+    Serializer for one operation of a playlist's change feed.
+    Fields an operation does not use are left out.
+    """
+
+    sequence = serializers.IntegerField(source="id")
+    entry = serializers.UUIDField(source="entry_uuid")
+    track = serializers.UUIDField(source="track_uuid")
+
+    class Meta:
+        model = PlaylistChange
+        fields = (
+            "sequence",
+            "operation",
+            "entry",
+            "track",
+            "order",
+            "name",
+            "snapshot",
+        )
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        return {key: value for key, value in data.items() if value not in (None, "")}
+
+
+class SmartPlaylistSerializer(serializers.ModelSerializer):
+    """
+    Serializer for SmartPlaylist model.
+    Exposes the playlist rules and a link to its lazily evaluated tracks.
+    """
+
+    uuid = serializers.ReadOnlyField()
+    url = UUIDHyperlinkedIdentityField(view_name="smartplaylist-detail")
+    artist = UUIDSlugRelatedField(
+        queryset=Artist.objects.all(), required=False, allow_null=True
+    )
+    tracks_url = UUIDHyperlinkedIdentityField(view_name="smartplaylist-tracks")
+
+    class Meta:
+        model = SmartPlaylist
+        fields = (
+            "uuid",
+            "url",
+            "name",
+            "artist",
+            "year_from",
+            "year_until",
+            "name_contains",
+            "sample_size",
+            "seed",
+            "tracks_url",
+        )
+
+    def validate(self, attrs):
+        year_from = attrs.get("year_from", getattr(self.instance, "year_from", None))
+        year_until = attrs.get(
+            "year_until", getattr(self.instance, "year_until", None)
+        )
+        if year_from is not None and year_until is not None and year_from > year_until:
+            raise serializers.ValidationError(
+                {"year_until": "Must not be earlier than year_from."}
+            )
+        return attrs
+
+
+class CatalogueChangeSerializer(serializers.ModelSerializer):
+    """
+    Serializer for one entry of the catalogue change feed.
+    Upserts include the object as its own endpoint renders it.
+    """
+
+    sequence = serializers.IntegerField(source="id")
+    type = serializers.CharField(source="kind")
+    uuid = serializers.UUIDField(source="object_uuid")
+    data = serializers.SerializerMethodField()
+
+    serializer_classes = {
+        CatalogueChange.Kind.ARTIST: ArtistSerializer,
+        CatalogueChange.Kind.ALBUM: AlbumSerializer,
+        CatalogueChange.Kind.TRACK: TrackSerializer,
+    }
+
+    class Meta:
+        model = CatalogueChange
+        fields = ("sequence", "type", "uuid", "deleted", "data")
+
+    def get_data(self, change):
+        """
+        Renders the object from ``objects`` in the context, which maps
+        ``(kind, uuid)`` to the page's objects.
+        """
+        instance = self.context["objects"].get((change.kind, change.object_uuid))
+        if change.deleted or instance is None:
+            return None
+        serializer_class = self.serializer_classes[change.kind]
+        return serializer_class(instance, context=self.context).data
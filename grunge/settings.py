@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
 from environ import Env
 import os
 
@@ -60,7 +61,7 @@ INSTALLED_APPS = [
     "django_filters",
     "rest_framework",
     "rest_framework.authtoken",
-    "grunge",
+    "grunge.GrungeAppConfig",
     "django.contrib.admin",
     "corsheaders",
 ]
@@ -68,18 +69,22 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "grunge.routers.ReplicaPinMiddleware",
+    "grunge.compression.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "grunge.identity.IdentityMapMiddleware",
 ]
 
 CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:8000",
     "http://localhost:8000",
 ]
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 
 ROOT_URLCONF = "grunge.urls"
 
@@ -123,6 +128,95 @@ DATABASES = {
     "default": ENV.db_url(default="sqlite:///{}".format(BASE_DIR / "db.sqlite3"))
 }
 
+# Read replicas, as database URLs with optional weights, such as
+# REPLICA_DATABASE_URLS=postgres://replica-1/grunge,postgres://replica-2/grunge
+# and REPLICA_WEIGHTS=2,1.  Safe requests of the read-only catalogue endpoints
+# read from them.  To try it locally, copy db.sqlite3 and give its copy as
+# a sqlite:/// URL.
+REPLICA_DATABASES = {}
+_replica_weights = ENV.list("REPLICA_WEIGHTS", cast=int, default=[])
+for _index, _url in enumerate(ENV.list("REPLICA_DATABASE_URLS", default=[])):
+    _alias = f"replica{_index + 1}"
+    DATABASES[_alias] = {**Env.db_url_config(_url), "TEST": {"MIRROR": "default"}}
+    REPLICA_DATABASES[_alias] = (
+        _replica_weights[_index] if _index < len(_replica_weights) else 1
+    )
+DATABASE_ROUTERS = ["grunge.routers.ReplicaRouter"]
+# Seconds between health checks of each replica
+REPLICA_HEALTH_CHECK_INTERVAL = ENV.int("REPLICA_HEALTH_CHECK_INTERVAL", 30)
+# After a write, a client reads from the primary database for this many
+# seconds, longer than the replicas take to catch up
+REPLICA_PIN_SECONDS = ENV.int("REPLICA_PIN_SECONDS", 10)
+REPLICA_PIN_COOKIE = "pin_primary"
+
+# DATABASE_PROFILE=production keeps connections open between requests, pooled
+# on PostgreSQL (which needs psycopg[pool]), and tunes SQLite for concurrent
+# writers: WAL lets reads continue during a write, and IMMEDIATE transactions
+# take the write lock when they begin, so concurrent writers queue on
+# busy_timeout instead of failing with "database is locked".  It applies
+# to the replicas too
+DATABASE_PROFILE = ENV.str("DATABASE_PROFILE", "development")
+DATABASE_POOL_SIZE = ENV.int("DATABASE_POOL_SIZE", 10)
+SQLITE_BUSY_TIMEOUT = ENV.int("SQLITE_BUSY_TIMEOUT", 20)
+SQLITE_MMAP_SIZE = ENV.int("SQLITE_MMAP_SIZE", 256 * 2**20)
+if DATABASE_PROFILE == "production":
+    for _database in DATABASES.values():
+        _options = _database.setdefault("OPTIONS", {})
+        if _database["ENGINE"] == "django.db.backends.postgresql":
+            _options["pool"] = {"min_size": 2, "max_size": DATABASE_POOL_SIZE}
+            # Pooled connections are returned to the pool after each request
+            _database["CONN_MAX_AGE"] = 0
+            continue
+
+        _database["CONN_MAX_AGE"] = ENV.int("CONN_MAX_AGE", 600)
+        _database["CONN_HEALTH_CHECKS"] = True
+        if _database["ENGINE"] == "django.db.backends.sqlite3":
+            _options.update(
+                transaction_mode="IMMEDIATE",
+                timeout=SQLITE_BUSY_TIMEOUT,
+                init_command=(
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT * 1000};"
+                    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE};"
+                ),
+            )
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+CACHES = {"default": ENV.cache_url("CACHE_URL", default="locmemcache://")}
+
+# How long catalogue API responses, and their compressed variants, are kept
+# at most, in seconds.  Catalogue writes drop them sooner
+RESPONSE_CACHE_TIMEOUT = ENV.int("RESPONSE_CACHE_TIMEOUT", 10 * 60)
+
+# API tokens are cached with their users, in process up to this many tokens
+# for this many seconds.  With TOKEN_CACHE_ALIAS naming a cache shared
+# between workers, they are also kept there
+TOKEN_CACHE_SIZE = ENV.int("TOKEN_CACHE_SIZE", 1024)
+TOKEN_CACHE_TIMEOUT = ENV.int("TOKEN_CACHE_TIMEOUT", 5 * 60)
+TOKEN_CACHE_ALIAS = ENV.str("TOKEN_CACHE_ALIAS", None)
+
+# How long materialized smart playlist results are kept, in seconds
+SMART_PLAYLIST_CACHE_TIMEOUT = ENV.int("SMART_PLAYLIST_CACHE_TIMEOUT", 60 * 60)
+
+# How many of a playlist's latest changes are kept when its log is compacted
+PLAYLIST_CHANGE_LOG_LENGTH = ENV.int("PLAYLIST_CHANGE_LOG_LENGTH", 1000)
+
+# Playlists with more entries than this are left out of the co-occurrence
+# matrix, since counting their pairs takes the square of their length
+COOCCURRENCE_MAX_PLAYLIST_SIZE = ENV.int("COOCCURRENCE_MAX_PLAYLIST_SIZE", 500)
+
+# Server-Sent Events for playlist changes.  Events reach the subscribers of
+# the worker they are published in by default; with several workers, use
+# grunge.events.CacheBroker with a CACHE_URL they share
+PLAYLIST_EVENTS_BROKER = ENV.str("PLAYLIST_EVENTS_BROKER", "grunge.events.LocalBroker")
+PLAYLIST_EVENTS_POLL_INTERVAL = ENV.float("PLAYLIST_EVENTS_POLL_INTERVAL", 0.5)
+PLAYLIST_EVENTS_TIMEOUT = ENV.int("PLAYLIST_EVENTS_TIMEOUT", 60)
+PLAYLIST_EVENTS_KEEPALIVE = ENV.int("PLAYLIST_EVENTS_KEEPALIVE", 15)
+# Milliseconds clients wait before reconnecting
+PLAYLIST_EVENTS_RETRY = ENV.int("PLAYLIST_EVENTS_RETRY", 3000)
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -172,14 +266,14 @@ REST_FRAMEWORK = {
     "DEFAULT_VERSION": ENV.str("DEFAULT_API_VERSION", "v1"),
     "ALLOWED_VERSIONS": ENV.list("ALLOWED_API_VERSIONS", default=["v1"]),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "grunge.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
-        "rest_framework.filters.OrderingFilter",
+        "grunge.filters.IndexedOrderingFilter",
     ),
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "grunge.renderers.StreamingJSONRenderer",
     ],
     "DEFAULT_PARSER_CLASSES": (
         "rest_framework.parsers.FormParser",
@@ -191,6 +285,39 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": ENV.int("API_PAGE_SIZE", 10),
 }
 PAGE_SIZE_QUERY_PARAM = ENV.str("PAGE_SIZE_QUERY_PARAM", "page_size")
+# Token bucket limits of the playlist API, for each user, or IP address of
+# anonymous clients, and each scope of actions.  Buckets are kept in process
+# by default, or with grunge.throttling.CacheBuckets in the cache, shared
+# between workers with a shared CACHE_URL
+PLAYLIST_THROTTLE_BUCKETS = ENV.str(
+    "PLAYLIST_THROTTLE_BUCKETS", "grunge.throttling.LocalBuckets"
+)
+PLAYLIST_THROTTLE_RATES = {
+    "list": ENV.str("PLAYLIST_LIST_RATE", "600/min"),
+    "retrieve": ENV.str("PLAYLIST_RETRIEVE_RATE", "600/min"),
+    "create": ENV.str("PLAYLIST_CREATE_RATE", "60/min"),
+    "update": ENV.str("PLAYLIST_UPDATE_RATE", "120/min"),
+    "reorder": ENV.str("PLAYLIST_REORDER_RATE", "60/min"),
+}
+# How long the responses of playlist writes sent with an Idempotency-Key are
+# replayed to retries, in seconds
+IDEMPOTENCY_KEY_TIMEOUT = ENV.int("IDEMPOTENCY_KEY_TIMEOUT", 24 * 60 * 60)
+# How long a write holds its Idempotency-Key before a retry may take it
+# over, in seconds, as a worker that crashed never releases it.  Longer
+# than the slowest write
+IDEMPOTENCY_KEY_LEASE = ENV.int("IDEMPOTENCY_KEY_LEASE", 60)
+# Paginated API lists and the larger admin changelists count results exactly
+# up to this many rows, and estimate larger counts
+EXACT_COUNT_THRESHOLD = ENV.int("EXACT_COUNT_THRESHOLD", 10000)
+# How long estimated counts are cached where the database cannot estimate
+COUNT_CACHE_TIMEOUT = ENV.int("COUNT_CACHE_TIMEOUT", 10 * 60)
+# API responses listing more rows than this, in a page or in the nested list
+# of a detail, are streamed
+STREAMING_THRESHOLD = ENV.int("STREAMING_THRESHOLD", 100)
+# The admin's drag and drop reorder page lists, and saves, a playlist's
+# whole order at once, so it is offered for playlists of up to this many
+# entries.  Longer ones are reordered through the paginated inline
+ADMIN_REORDER_MAX_ENTRIES = ENV.int("ADMIN_REORDER_MAX_ENTRIES", 500)
 
 if DEBUG:
     REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].append(
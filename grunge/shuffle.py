@@ -0,0 +1,103 @@
+import operator
+from functools import reduce
+from hashlib import blake2b
+
+from django.db.models import Q
+
+from . import packed
+
+
+class SeededPermutation:
+    """
+    Deterministic pseudo-random permutation of ``range(size)``.
+
+    Positions are mapped one at a time through a small Feistel network over
+    the smallest power-of-four domain covering ``size``, cycle-walking any
+    result that falls outside the range.  Looking up a position is O(1), so
+    a window of a shuffle never requires generating the whole permutation.
+    """
+
+    rounds = 4
+
+    def __init__(self, seed, size):
+        self.seed = seed
+        self.size = size
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.size:
+            raise IndexError("SeededPermutation index out of range.")
+
+        value = self._encrypt(position)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def _round(self, round_number, value):
+        digest = blake2b(
+            f"{self.seed}:{round_number}:{value}".encode(), digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "big") & self.half_mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for round_number in range(self.rounds):
+            left, right = right, left ^ self._round(round_number, right)
+        return (left << self.half_bits) | right
+
+
+class ShuffledPlaylistTracks:
+    """
+    Sliceable, shuffled view over a playlist's tracks.
+
+    Slicing maps each requested shuffle position to a rank in the playlist's
+    ``order``, and fetches the entries at those ranks in one query, with an
+    offset subquery per rank.  The database walks the playlist's ``order``
+    index to each offset, but only the page's rows are read into Python.
+    """
+
+    def __init__(self, playlist, seed):
+        self.playlist = playlist
+        self.queryset = playlist.playlist_tracks.all()
+        self.seed = seed
+
+    def count(self):
+        if not hasattr(self, "_count"):
+            if self.playlist.is_packed:
+                self._count = packed.get_length(self.playlist)
+            else:
+                self._count = self.queryset.count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError("ShuffledPlaylistTracks only supports contiguous slices.")
+
+        permutation = SeededPermutation(self.seed, self.count())
+        ranks = [
+            permutation[position]
+            for position in range(*index.indices(len(permutation)))
+        ]
+        if not ranks:
+            return []
+
+        if self.playlist.is_packed:
+            track_ids = packed.read_positions(self.playlist, ranks)
+            return packed.get_entries(self.playlist, track_ids, ranks)
+
+        ordered = self.queryset.order_by("order", "pk")
+        at_ranks = reduce(
+            operator.or_,
+            (Q(pk__in=ordered[rank : rank + 1].values("pk")) for rank in ranks),
+        )
+        entries = ordered.filter(at_ranks).select_related("track")
+        # The entries come back in ``order``, that is by rank
+        by_rank = dict(zip(sorted(ranks), entries))
+        return [by_rank[rank] for rank in ranks if rank in by_rank]
@@ -0,0 +1,220 @@
+from django.conf import settings
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from . import authentication, changes, compression, events, identity, listings, packed
+from .models import (
+    Album,
+    Artist,
+    ArtistSummary,
+    Playlist,
+    PlaylistTrack,
+    SmartPlaylist,
+    StaleCooccurrence,
+    Track,
+)
+
+
+def get_affected_tracks(instance):
+    """
+    Returns the tracks an artist, album or track write can change.
+    """
+    if isinstance(instance, Track):
+        return Track.objects.filter(pk=instance.pk)
+    if isinstance(instance, Album):
+        return Track.objects.filter(album=instance.pk)
+    return Track.objects.filter(album__artist=instance.pk)
+
+
+def is_cascaded(instance, origin):
+    """
+    Returns whether ``instance`` is deleted by the cascade of another
+    object's delete, rather than by its own or by a queryset of its model.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is not instance._meta.concrete_model
+    return not (type(origin) is type(instance) and origin.pk == instance.pk)
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=Track)
+@receiver(post_delete, sender=Artist)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Track)
+def smart_playlists_changed(sender, instance, origin=None, **kwargs):
+    # Saves have no origin; a delete invalidates once, not per cascaded row
+    if origin is None or not is_cascaded(instance, origin):
+        SmartPlaylist.invalidate_catalogue()
+
+
+@receiver(pre_delete, sender=Artist)
+@receiver(pre_delete, sender=Album)
+@receiver(pre_delete, sender=Track)
+def catalogue_pre_delete(sender, instance, origin=None, **kwargs):
+    # Logged once, for the object the delete started at, while the rows it
+    # cascades to still exist.  The playlist entries of the deleted tracks
+    # cascade away without signals, and packed entries are stripped here
+    if is_cascaded(instance, origin):
+        return
+    tracks = get_affected_tracks(instance)
+    entries = PlaylistTrack.objects.filter(track__in=tracks)
+    changes.record_removals(entries)
+    Playlist.objects.filter(playlist_tracks__in=entries).update(
+        version=F("version") + 1
+    )
+    packed.remove_tracks(tracks.values_list("pk", flat=True))
+    album_ids = (instance.album_id,) if sender is Track else ()
+    changes.record_catalogue_write(instance, deleted=True, album_ids=album_ids)
+
+
+@receiver(pre_delete, sender=Playlist)
+def playlist_pre_delete(sender, instance, **kwargs):
+    # The entries cascade away without signals, and their pairs with them
+    StaleCooccurrence.mark_entries(PlaylistTrack.objects.filter(playlist=instance))
+
+
+@receiver(post_delete, sender=Playlist)
+def playlist_post_delete(sender, instance, **kwargs):
+    events.publish_playlist_delete(instance)
+
+
+@receiver(pre_save, sender=Playlist)
+def playlist_pre_save(sender, instance, raw, update_fields=None, **kwargs):
+    instance._previous_name = None
+    if instance.pk is not None and not raw:
+        if update_fields is None or "name" in update_fields:
+            instance._previous_name = (
+                Playlist.objects.filter(pk=instance.pk)
+                .values_list("name", flat=True)
+                .first()
+            )
+        else:
+            instance._previous_name = instance.name
+
+
+@receiver(post_save, sender=Playlist)
+def playlist_post_save(sender, instance, created, **kwargs):
+    # The first rename of a playlist gives its initial name
+    previous_name = getattr(instance, "_previous_name", None)
+    if created or previous_name not in (None, instance.name):
+        changes.record_rename(instance)
+
+
+@receiver(post_save, sender=Artist)
+def artist_post_save(sender, instance, created, **kwargs):
+    if created:
+        ArtistSummary.objects.get_or_create(artist=instance)
+
+
+@receiver(pre_save, sender=Album)
+@receiver(pre_save, sender=Track)
+def summary_pre_save(sender, instance, raw, **kwargs):
+    # Remember where an existing album or track belonged before the write
+    if instance.pk is None or raw:
+        instance._previous_parent_id = None
+    elif sender is Album:
+        instance._previous_parent_id = (
+            Album.objects.filter(pk=instance.pk)
+            .values_list("artist", flat=True)
+            .first()
+        )
+    else:
+        instance._previous_parent_id = (
+            Track.objects.filter(pk=instance.pk).values_list("album", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Album)
+@receiver(post_delete, sender=Album)
+def album_changed(sender, instance, **kwargs):
+    ArtistSummary.refresh(instance.artist_id)
+
+    previous_artist_id = getattr(instance, "_previous_parent_id", None)
+    if previous_artist_id not in (None, instance.artist_id):
+        ArtistSummary.refresh(previous_artist_id)
+
+
+def update_track_count(album_id, delta):
+    ArtistSummary.objects.filter(artist__albums=album_id).update(
+        track_count=F("track_count") + delta
+    )
+
+
+@receiver(post_save, sender=Track)
+def track_post_save(sender, instance, created, **kwargs):
+    previous_album_id = getattr(instance, "_previous_parent_id", None)
+
+    if created:
+        update_track_count(instance.album_id, 1)
+    elif previous_album_id not in (None, instance.album_id):
+        update_track_count(previous_album_id, -1)
+        update_track_count(instance.album_id, 1)
+
+
+@receiver(post_delete, sender=Track)
+def track_post_delete(sender, instance, **kwargs):
+    update_track_count(instance.album_id, -1)
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=Track)
+def track_listing_post_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        # Fixtures may load rows in any order
+        listings.refresh_listings(get_affected_tracks(instance))
+        return
+    moved = False
+    if sender is not Artist:
+        previous_parent_id = getattr(instance, "_previous_parent_id", None)
+        parent_id = instance.album_id if sender is Track else instance.artist_id
+        moved = previous_parent_id not in (None, parent_id)
+    listings.update_listings(instance, created=created, moved=moved)
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=Track)
+def catalogue_change_post_save(sender, instance, created, raw, **kwargs):
+    album_ids = ()
+    if sender is Track:
+        album_ids = (instance.album_id, getattr(instance, "_previous_parent_id", None))
+    changes.record_catalogue_write(
+        instance, created=created, album_ids=album_ids, raw=raw
+    )
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=Track)
+@receiver(post_delete, sender=Artist)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Track)
+def catalogue_responses_changed(sender, instance, **kwargs):
+    compression.invalidate_catalogue_responses()
+
+
+@receiver(post_delete, sender=Artist)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Track)
+@receiver(post_delete, sender=Playlist)
+def identity_map_post_delete(sender, instance, **kwargs):
+    identity.forget(instance)
+
+
+@receiver(post_delete, sender=Token)
+def token_post_delete(sender, instance, **kwargs):
+    authentication.forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_post_save(sender, instance, created, **kwargs):
+    # Cached tokens hold the user as it was, active or not
+    if not created:
+        keys = list(Token.objects.filter(user=instance).values_list("key", flat=True))
+        if keys:
+            authentication.forget_tokens(keys)
@@ -38,6 +38,25 @@ $(document).ready(function () {
  
     fetchPlaylists();
 
+    // Also refresh the list when other tabs or users change a playlist,
+    // where the server streams playlist events
+    function subscribeToPlaylistEvents() {
+        const url = document.body.dataset.playlistEvents;
+        if (!url || !window.EventSource) {
+            return;
+        }
+
+        let refreshTimer = null;
+        const events = new EventSource(url);
+        events.addEventListener('playlist', () => {
+            // Several changes in a row refresh the list once
+            clearTimeout(refreshTimer);
+            refreshTimer = setTimeout(fetchPlaylists, 250);
+        });
+    }
+
+    subscribeToPlaylistEvents();
+
 
     // Edit functionality for opening popup
     $(document).on('click', '.edit-btn', function () {
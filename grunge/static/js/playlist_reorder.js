@@ -0,0 +1,33 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const list = document.getElementById('playlist-tracks');
+    const form = document.getElementById('playlist-reorder-form');
+    const sequence = document.getElementById('playlist-sequence');
+    let dragged = null;
+
+    list.addEventListener('dragstart', function (event) {
+        dragged = event.target.closest('li');
+        dragged.classList.add('dragging');
+        event.dataTransfer.effectAllowed = 'move';
+    });
+
+    list.addEventListener('dragend', function () {
+        dragged.classList.remove('dragging');
+        dragged = null;
+    });
+
+    list.addEventListener('dragover', function (event) {
+        event.preventDefault();
+        const target = event.target.closest('li');
+        if (!dragged || !target || target === dragged) {
+            return;
+        }
+        const rect = target.getBoundingClientRect();
+        const after = event.clientY > rect.top + rect.height / 2;
+        list.insertBefore(dragged, after ? target.nextSibling : target);
+    });
+
+    // Post the whole sequence so the server can apply it in one update
+    form.addEventListener('submit', function () {
+        sequence.value = Array.from(list.children, item => item.dataset.id).join(',');
+    });
+});
@@ -0,0 +1,280 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from grunge.models import (
+    Album,
+    Artist,
+    Playlist,
+    PlaylistTrack,
+    StaleCooccurrence,
+    Track,
+)
+from grunge.operations import reorder_playlist_tracks
+from grunge.packed import pack_playlist
+
+
+class PlaylistAdminTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.user)
+
+        artist = Artist.objects.create(name="Artist")
+        album = Album.objects.create(name="Album", year=1992, artist=artist)
+        self.playlist = Playlist.objects.create(name="Long")
+        PlaylistTrack.objects.bulk_create(
+            PlaylistTrack(
+                playlist=self.playlist,
+                track=Track.objects.create(
+                    name=f"Track {number}", album=album, number=number
+                ),
+                order=number,
+            )
+            for number in range(1, 121)
+        )
+        self.url = reverse("admin:grunge_playlist_change", args=(self.playlist.pk,))
+
+    def test_inline_is_paginated(self):
+        response = self.client.get(self.url, {"playlist_tracks-page": 3})
+        self.assertEqual(response.status_code, 200)
+
+        formset = response.context["inline_admin_formsets"][0].formset
+        self.assertEqual(formset.paginator.count, 120)
+        self.assertEqual(formset.initial_form_count(), 20)
+        self.assertEqual(formset.forms[0].instance.order, 101)
+        self.assertContains(response, "?playlist_tracks-page=2")
+
+    def get_form_data(self, page):
+        response = self.client.get(self.url, {"playlist_tracks-page": page})
+        formset = response.context["inline_admin_formsets"][0].formset
+
+        data = {
+            "name": self.playlist.name,
+            "uuid": self.playlist.uuid,
+            "initial-uuid": self.playlist.uuid,
+            "playlist_tracks-TOTAL_FORMS": formset.initial_form_count(),
+            "playlist_tracks-INITIAL_FORMS": formset.initial_form_count(),
+            "playlist_tracks-MIN_NUM_FORMS": 0,
+            "playlist_tracks-MAX_NUM_FORMS": 1000,
+        }
+        for index, form in enumerate(formset.forms[: formset.initial_form_count()]):
+            prefix = f"playlist_tracks-{index}"
+            data[f"{prefix}-id"] = form.instance.pk
+            data[f"{prefix}-playlist"] = self.playlist.pk
+            data[f"{prefix}-track"] = form.instance.track_id
+            data[f"{prefix}-order"] = form.instance.order
+        return formset, data
+
+    def test_save_page(self):
+        formset, data = self.get_form_data(page=2)
+        data["name"] = "Renamed"
+        data["playlist_tracks-0-DELETE"] = "on"
+
+        response = self.client.post(f"{self.url}?playlist_tracks-page=2", data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.playlist.playlist_tracks.count(), 119)
+        self.assertFalse(self.playlist.playlist_tracks.filter(order=51).exists())
+        # Only the removed track's co-occurrences change
+        self.assertEqual(
+            list(StaleCooccurrence.objects.values_list("track_id", flat=True)),
+            [formset.forms[0].instance.track_id],
+        )
+        self.playlist.refresh_from_db()
+        self.assertEqual(self.playlist.version, 2)
+
+    def test_inline_edits_are_logged(self):
+        formset, data = self.get_form_data(page=1)
+        first, second, third = (form.instance for form in formset.forms[:3])
+        other_track = self.playlist.playlist_tracks.get(order=120).track
+        data["playlist_tracks-0-DELETE"] = "on"
+        data["playlist_tracks-1-track"] = other_track.pk
+        data["playlist_tracks-2-order"] = 200
+        since = self.playlist.changes.latest("pk").pk
+
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(
+                self.playlist.changes.filter(pk__gt=since).values_list(
+                    "operation", "entry_uuid", "track_uuid", "order"
+                )
+            ),
+            [
+                ("remove", first.uuid, first.track.uuid, 1),
+                ("remove", second.uuid, second.track.uuid, 2),
+                ("move", third.uuid, third.track.uuid, 200),
+                ("add", second.uuid, other_track.uuid, 2),
+            ],
+        )
+        self.assertCountEqual(
+            StaleCooccurrence.objects.values_list("track_id", flat=True),
+            [first.track_id, second.track_id, other_track.pk],
+        )
+
+    def test_unchanged_save_keeps_version(self):
+        _, data = self.get_form_data(page=1)
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+
+        self.playlist.refresh_from_db()
+        self.assertEqual(self.playlist.version, 1)
+        self.assertFalse(StaleCooccurrence.objects.exists())
+
+    def test_reorder_view(self):
+        url = reverse("admin:grunge_playlist_reorder", args=(self.playlist.pk,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Track 120", count=1)
+
+        reversed_ids = list(
+            self.playlist.playlist_tracks.order_by("-order").values_list(
+                "pk", flat=True
+            )
+        )
+        sequence = ",".join(map(str, reversed_ids))
+        response = self.client.post(url, {"sequence": sequence})
+        self.assertRedirects(response, self.url)
+        self.assertEqual(
+            list(self.playlist.playlist_tracks.values_list("pk", flat=True)),
+            reversed_ids,
+        )
+
+    def test_reorder_rejects_partial_sequence(self):
+        url = reverse("admin:grunge_playlist_reorder", args=(self.playlist.pk,))
+        response = self.client.post(url, {"sequence": "1,2,3"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.playlist.playlist_tracks.filter(order__lte=120).count(), 120
+        )
+
+    @override_settings(ADMIN_REORDER_MAX_ENTRIES=100)
+    def test_reorder_rejects_long_playlists(self):
+        url = reverse("admin:grunge_playlist_reorder", args=(self.playlist.pk,))
+        response = self.client.get(url)
+        self.assertRedirects(response, self.url)
+
+        sequence = ",".join(
+            map(str, self.playlist.playlist_tracks.values_list("pk", flat=True))
+        )
+        self.client.post(url, {"sequence": sequence})
+        self.playlist.refresh_from_db()
+        self.assertEqual(self.playlist.version, 1)
+
+    def test_reorder_rejects_packed_playlists(self):
+        pack_playlist(self.playlist)
+        url = reverse("admin:grunge_playlist_reorder", args=(self.playlist.pk,))
+        self.assertRedirects(self.client.get(url), self.url)
+        self.assertNotContains(self.client.get(self.url), url)
+
+    def test_reorder_statement_count_is_constant(self):
+        short = Playlist.objects.create(name="Short")
+        PlaylistTrack.objects.bulk_create(
+            PlaylistTrack(playlist=short, track=playlist_track.track, order=index)
+            for index, playlist_track in enumerate(
+                self.playlist.playlist_tracks.all()[:3]
+            )
+        )
+
+        counts = []
+        for playlist in (short, self.playlist):
+            ids = list(
+                playlist.playlist_tracks.order_by("?").values_list("pk", flat=True)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                reorder_playlist_tracks(playlist, ids)
+            counts.append(len(queries))
+            self.assertEqual(
+                list(playlist.playlist_tracks.values_list("pk", flat=True)), ids
+            )
+        self.assertEqual(counts[0], counts[1])
+
+
+@override_settings(EXACT_COUNT_THRESHOLD=5)
+class TrackAdminTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.user)
+
+        artist = Artist.objects.create(name="Artist")
+        self.album = Album.objects.create(name="Album", year=1992, artist=artist)
+        Track.objects.bulk_create(
+            Track(name=f"Track {number:02}", album=self.album, number=number)
+            for number in range(1, 151)
+        )
+        self.url = reverse("admin:grunge_track_changelist")
+
+    def test_large_changelist_is_estimated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        changelist = response.context["cl"]
+        self.assertTrue(changelist.paginator.is_estimated)
+        self.assertIsNone(changelist.full_result_count)
+        self.assertEqual(len(changelist.result_list), 100)
+        self.assertContains(response, "More than 5 tracks")
+        self.assertContains(response, "?p=2")
+
+        # The last page is found by reading it, not from the count
+        response = self.client.get(self.url, {"p": 2})
+        self.assertEqual(len(response.context["cl"].result_list), 50)
+        self.assertNotContains(response, "?p=3")
+        response = self.client.get(self.url, {"p": 3})
+        self.assertRedirects(response, f"{self.url}?e=1")
+
+    def test_small_changelist_is_exact(self):
+        response = self.client.get(self.url, {"album__year": 1991})
+        self.assertFalse(response.context["cl"].paginator.is_estimated)
+        self.assertContains(response, "0 tracks")
+
+
+class CatalogueSearchTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.user)
+
+        self.artist = Artist.objects.create(name="Nirvana")
+        self.album = Album.objects.create(
+            name="Nevermind", year=1991, artist=self.artist
+        )
+        self.track = Track.objects.create(
+            name="Smells Like Teen Spirit", album=self.album, number=1
+        )
+        other = Album.objects.create(
+            name="Ten", year=1991, artist=Artist.objects.create(name="Pearl Jam")
+        )
+        self.other_track = Track.objects.create(name="Alive", album=other, number=1)
+        self.url = reverse("admin:grunge_track_changelist")
+
+    def search(self, term, url=None):
+        response = self.client.get(url or self.url, {"q": term})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context["cl"].result_list)
+
+    def test_uuid_search_is_exact(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.search(str(self.track.uuid).upper()), [self.track])
+        self.assertFalse(any("LIKE" in query["sql"] for query in queries))
+        self.assertEqual(self.search(self.album.uuid.hex), [])
+
+    def test_name_search_matches_prefixes(self):
+        self.assertEqual(self.search("smells"), [self.track])
+        self.assertEqual(self.search("teen"), [])
+        # Through the album and the artist
+        self.assertEqual(self.search("Never"), [self.track])
+        self.assertEqual(self.search("pearl"), [self.other_track])
+        self.assertEqual(
+            self.search("nirv", reverse("admin:grunge_album_changelist")),
+            [self.album],
+        )
+
+    def test_name_search_does_not_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search("nirvana")
+        searches = [query["sql"] for query in queries if "LIKE" in query["sql"]]
+        self.assertTrue(searches)
+        for sql in searches:
+            # Names are only matched within subqueries of their own table
+            self.assertNotIn('"grunge_artist"."name" LIKE', sql)
+            self.assertNotIn('"grunge_album"."name" LIKE', sql)
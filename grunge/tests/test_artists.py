@@ -4,6 +4,8 @@ from furl import furl
 from rest_framework import status
 from rest_framework.reverse import reverse as drf_reverse
 
+from grunge.models import Album, Artist, ArtistSummary, Track
+
 from . import BaseAPITestCase
 
 
@@ -33,3 +35,38 @@ class ArtistTests(BaseAPITestCase):
         r = self.client.get(url)
         self.assertEqual(r.status_code, status.HTTP_200_OK)
         self.assertEqual(r.data["name"], self.artist_name)
+
+    def test_filter_artists_by_decade(self):
+        url = drf_reverse("artist-list", kwargs={"version": self.version})
+        url = furl(url).set({"decade": 1990}).url
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            r.data["count"],
+            Artist.objects.filter(albums__year__range=(1990, 1999)).distinct().count(),
+        )
+
+    def test_summary_follows_catalogue_writes(self):
+        artist = Artist.objects.get(uuid=self.artist_uuid)
+        summary = artist.summary
+        self.assertEqual(summary.album_count, artist.albums.count())
+        self.assertEqual(
+            summary.track_count, Track.objects.filter(album__artist=artist).count()
+        )
+
+        album = Album.objects.create(name="Future", year=2031, artist=artist)
+        Track.objects.create(name="Opener", album=album, number=1)
+        summary.refresh_from_db()
+        self.assertEqual(summary.last_year, 2031)
+        self.assertIn(2030, ArtistSummary.get_decades(summary.decades))
+        self.assertEqual(summary.album_count, artist.albums.count())
+        self.assertEqual(
+            summary.track_count, Track.objects.filter(album__artist=artist).count()
+        )
+
+        album.delete()
+        summary.refresh_from_db()
+        self.assertNotIn(2030, ArtistSummary.get_decades(summary.decades))
+        self.assertEqual(
+            summary.track_count, Track.objects.filter(album__artist=artist).count()
+        )
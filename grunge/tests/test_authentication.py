@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from grunge import authentication
+from grunge.authentication import TokenCache, get_token_cache
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication._token_caches.clear()
+        self.user = User.objects.create_user("kurt", password="pw")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("playlist-list", kwargs={"version": "v1"})
+
+    def get_token_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.user)
+        return [query for query in queries if "authtoken_token" in query["sql"]]
+
+    def test_tokens_are_cached(self):
+        self.assertEqual(len(self.get_token_queries()), 1)
+        self.assertEqual(self.get_token_queries(), [])
+        self.assertIn(self.token.key, get_token_cache().entries)
+
+    def test_deactivated_users_are_forgotten(self):
+        self.get_token_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deleted_tokens_are_forgotten(self):
+        self.get_token_queries()
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    @override_settings(TOKEN_CACHE_ALIAS="default")
+    def test_shared_tokens(self):
+        self.get_token_queries()
+        # Another worker
+        other = TokenCache(10, 60, cache)
+        generation = other.get_generation()
+        self.assertEqual(other.get(self.token.key, generation), self.token)
+        # Kept in process once read from the shared cache
+        self.assertIn(self.token.key, other.entries)
+        self.assertEqual(other.get(self.token.key, generation), self.token)
+
+        self.token.delete()
+        self.assertIsNone(other.get(self.token.key, other.get_generation()))
+
+
+class TokenCacheTestCase(TestCase):
+    def test_least_recently_used_are_dropped(self):
+        token_cache = TokenCache(2, 60)
+        generation = token_cache.get_generation()
+        token_cache.set("a", "A", generation)
+        token_cache.set("b", "B", generation)
+        self.assertEqual(token_cache.get("a", generation), "A")
+        token_cache.set("c", "C", generation)
+        self.assertIsNone(token_cache.get("b", generation))
+        self.assertEqual(token_cache.get("a", generation), "A")
+        self.assertEqual(token_cache.get("c", generation), "C")
+
+    def test_expired_tokens_are_dropped(self):
+        token_cache = TokenCache(2, 0)
+        generation = token_cache.get_generation()
+        token_cache.set("a", "A", generation)
+        self.assertIsNone(token_cache.get("a", generation))
+        self.assertEqual(len(token_cache.entries), 0)
+
+    def test_tokens_read_before_a_forget_are_not_cached(self):
+        token_cache = TokenCache(2, 60)
+        generation = token_cache.get_generation()
+        token_cache.forget(["b"])
+        token_cache.set("a", "A", generation)
+        self.assertIsNone(token_cache.get("a", token_cache.get_generation()))
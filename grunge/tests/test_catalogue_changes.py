@@ -0,0 +1,126 @@
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from grunge.models import Album, Artist, CatalogueChange, Track
+
+
+class CatalogueChangeTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("cataloguechange-list", kwargs={"version": "v1"})
+
+        self.artist = Artist.objects.create(name="Artist")
+        self.album = Album.objects.create(name="Album", year=1991, artist=self.artist)
+        self.tracks = [
+            Track.objects.create(
+                name=f"Track {number}", album=self.album, number=number
+            )
+            for number in range(1, 4)
+        ]
+
+    def get_changes(self, since=0, **params):
+        response = self.client.get(self.url, {"since": since, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def get_entries(self, data):
+        return [
+            (change["type"], change["uuid"], change["deleted"])
+            for change in data["results"]
+        ]
+
+    def test_every_object_is_listed_once(self):
+        data = self.get_changes()
+        self.assertCountEqual(
+            self.get_entries(data),
+            [
+                ("artist", str(self.artist.uuid), False),
+                ("album", str(self.album.uuid), False),
+                *((("track", str(track.uuid), False)) for track in self.tracks),
+            ],
+        )
+        # Upserts include the object as its endpoint renders it
+        track = next(
+            change
+            for change in data["results"]
+            if change["uuid"] == str(self.tracks[2].uuid)
+        )
+        self.assertEqual(track["data"]["name"], "Track 3")
+        self.assertEqual(track["data"]["album"]["name"], "Album")
+
+    def test_changes_since_sequence(self):
+        since = self.get_changes()["sequence"]
+        self.tracks[0].name = "Renamed"
+        self.tracks[0].save()
+
+        data = self.get_changes(since)
+        # The album nests its tracks, so it changed too
+        self.assertCountEqual(
+            self.get_entries(data),
+            [
+                ("track", str(self.tracks[0].uuid), False),
+                ("album", str(self.album.uuid), False),
+            ],
+        )
+        self.assertEqual(self.get_changes(data["sequence"])["results"], [])
+
+    def test_nested_objects_follow_their_parent(self):
+        since = self.get_changes()["sequence"]
+        self.artist.name = "Renamed"
+        self.artist.save()
+
+        data = self.get_changes(since)
+        self.assertEqual(len(data["results"]), 5)
+        album = next(change for change in data["results"] if change["type"] == "album")
+        self.assertEqual(album["data"]["artist"]["name"], "Renamed")
+
+    def test_cascaded_deletes_leave_tombstones(self):
+        since = self.get_changes()["sequence"]
+        self.artist.delete()
+
+        data = self.get_changes(since)
+        self.assertCountEqual(
+            self.get_entries(data),
+            [
+                ("artist", str(self.artist.uuid), True),
+                ("album", str(self.album.uuid), True),
+                *((("track", str(track.uuid), True)) for track in self.tracks),
+            ],
+        )
+        self.assertTrue(all(change["data"] is None for change in data["results"]))
+        self.assertEqual(CatalogueChange.objects.count(), 5)
+
+    def test_writes_are_atomic_with_their_changes(self):
+        self.tracks[0].name = "Renamed"
+        with mock.patch.object(
+            CatalogueChange.objects, "bulk_create", side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                self.tracks[0].save()
+            with self.assertRaises(DatabaseError):
+                self.album.delete()
+
+        self.tracks[0].refresh_from_db()
+        self.assertEqual(self.tracks[0].name, "Track 1")
+        self.assertTrue(Album.objects.filter(pk=self.album.pk).exists())
+
+    def test_changes_are_paginated(self):
+        # The page, then one query per kind of object upserted in it
+        with self.assertNumQueries(3):
+            data = self.get_changes(limit=3)
+        self.assertEqual(len(data["results"]), 3)
+        self.assertIn(f"since={data['sequence']}", data["next"])
+
+        rest = self.client.get(data["next"]).json()
+        self.assertEqual(len(rest["results"]), 2)
+        self.assertIsNone(rest["next"])
+
+    def test_invalid_since(self):
+        response = self.client.get(self.url, {"since": -1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("since", response.json())
@@ -0,0 +1,100 @@
+import gzip
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from grunge.compression import get_accepted_coding
+from grunge.models import Artist
+
+
+class AcceptedCodingTestCase(TestCase):
+    def get_coding(self, accept_encoding, codings=("br", "zstd", "gzip")):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        return get_accepted_coding(request, codings)
+
+    def test_negotiation(self):
+        self.assertEqual(self.get_coding("gzip, deflate, br, zstd"), "br")
+        self.assertEqual(self.get_coding("gzip;q=1.0, br;q=0.5"), "gzip")
+        self.assertEqual(self.get_coding("br;q=0, *"), "zstd")
+        self.assertEqual(self.get_coding("gzip", codings=("br",)), None)
+        self.assertEqual(self.get_coding("identity"), None)
+        self.assertEqual(self.get_coding(""), None)
+
+
+class CompressionMiddlewareTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("artist-list", kwargs={"version": "v1"})
+        for number in range(10):
+            Artist.objects.create(name=f"Artist {number}")
+
+    def test_catalogue_responses_are_cached_compressed(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        etag = response["ETag"]
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(data["count"], 10)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached["ETag"], etag)
+
+        with self.assertNumQueries(0):
+            identity = self.client.get(self.url)
+        self.assertNotIn("Content-Encoding", identity)
+        self.assertEqual(json.loads(identity.content), data)
+
+        not_modified = self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_catalogue_writes_drop_cached_responses(self):
+        self.client.get(self.url)
+        Artist.objects.create(name="Artist 10")
+        self.assertEqual(self.client.get(self.url).data["count"], 11)
+
+    def test_other_responses_are_not_compressed(self):
+        response = self.client.post(
+            reverse("playlist-list", kwargs={"version": "v1"}),
+            {"name": "Compressed" * 20, "tracks": []},
+            format="json",
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Content-Encoding", response)
+
+        # Pages carry CSRF tokens
+        response = self.client.get(
+            self.url, HTTP_ACCEPT="text/html", HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_requests_with_credentials_are_not_cached(self):
+        self.client.get(self.url)
+        Artist.objects.filter(name="Artist 0").update(name="Renamed")
+
+        self.client.force_authenticate(User.objects.create_user("layne"))
+        self.client.credentials(HTTP_AUTHORIZATION="Token unused")
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertIn(
+            "Renamed", [artist["name"] for artist in response.data["results"]]
+        )
+
+    @override_settings(STREAMING_THRESHOLD=5)
+    def test_streamed_responses_are_compressed(self):
+        response = self.client.get(
+            self.url, {"page_size": 10}, HTTP_ACCEPT_ENCODING="gzip, br"
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(len(json.loads(content)["results"]), 10)
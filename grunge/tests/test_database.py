@@ -0,0 +1,21 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+
+class BenchmarkDatabaseTestCase(SimpleTestCase):
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            "benchmark_database",
+            threads=2,
+            writes=2,
+            profiles=["production"],
+            stdout=out,
+        )
+        header, production = out.getvalue().splitlines()
+        self.assertEqual(header.split()[0], "profile")
+        # Every write succeeds
+        self.assertEqual(production.split()[0], "production")
+        self.assertEqual(production.split()[-1], "0")
@@ -0,0 +1,136 @@
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from grunge.checks import check_events_cache
+from grunge.events import CacheBroker, LocalBroker, get_broker, stream_events
+from grunge.models import Playlist
+
+
+async def read_events(publish, count, **kwargs):
+    """
+    Opens an event stream, calls ``publish`` and returns the next ``count``
+    events of the stream.
+    """
+    stream = stream_events(**kwargs)
+    try:
+        await anext(stream)
+        reading = asyncio.ensure_future(anext(stream))
+        # Lets the stream subscribe before publishing
+        await asyncio.sleep(0.01)
+        publish()
+        events = [await asyncio.wait_for(reading, 1)]
+        while len(events) < count:
+            events.append(await asyncio.wait_for(anext(stream), 1))
+        return [json.loads(event.split("data: ")[1]) for event in events]
+    finally:
+        await stream.aclose()
+
+
+@override_settings(PLAYLIST_EVENTS_BROKER="grunge.events.LocalBroker")
+class PlaylistEventsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        # Publishes now, rather than along with the tests' writes
+        with self.captureOnCommitCallbacks(execute=True):
+            self.playlist = Playlist.objects.create(name="Live")
+
+    def test_stream_delivers_published_events(self):
+        def publish():
+            get_broker().publish({"playlist": "other", "sequence": 1})
+            get_broker().publish({"playlist": "mine", "sequence": 2})
+
+        events = async_to_sync(read_events)(publish, 1, playlist_uuid="mine")
+        self.assertEqual(events, [{"playlist": "mine", "sequence": 2}])
+
+    def test_writes_publish_after_commit(self):
+        url = reverse(
+            "playlist-detail", kwargs={"version": "v1", "uuid": str(self.playlist.uuid)}
+        )
+        with mock.patch.object(LocalBroker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(url, {"name": "Renamed"}, format="json")
+            publish.assert_called_once_with(
+                {
+                    "playlist": str(self.playlist.uuid),
+                    "sequence": self.playlist.changes.latest("id").pk,
+                }
+            )
+
+            publish.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(url)
+            publish.assert_called_once_with(
+                {"playlist": str(self.playlist.uuid), "deleted": True}
+            )
+
+    def test_publishing_waits_for_commit(self):
+        with mock.patch.object(LocalBroker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                self.playlist.name = "Renamed"
+                self.playlist.save()
+            self.assertEqual(len(callbacks), 1)
+            publish.assert_not_called()
+
+    def test_endpoint_streams_events(self):
+        url = reverse("playlist-events", kwargs={"version": "v1"})
+        response = async_to_sync(self.async_client.get)(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertTrue(response.streaming)
+        self.assertTrue(response.is_async)
+
+    def test_endpoint_needs_asgi(self):
+        # WSGI would read the endless stream before responding
+        response = self.client.get(reverse("playlist-events", kwargs={"version": "v1"}))
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    def test_mainpage_subscribes_under_asgi(self):
+        response = self.client.get(reverse("mainpage"))
+        self.assertNotContains(response, "data-playlist-events")
+        response = async_to_sync(self.async_client.get)(reverse("mainpage"))
+        self.assertContains(response, 'data-playlist-events="/api/v1/playlist-events"')
+
+
+class CacheBrokerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_events_reach_other_workers(self):
+        # Two brokers sharing the cache, as two worker processes would
+        publisher = CacheBroker(poll_interval=0.01)
+        subscriber = CacheBroker(poll_interval=0.01)
+
+        async def read():
+            async with subscriber.subscribe() as subscription:
+                await asyncio.sleep(0.05)
+                publisher.publish({"playlist": "shared", "sequence": 1})
+                publisher.publish({"playlist": "shared", "sequence": 2})
+                return [await subscription.get(1), await subscription.get(1)]
+
+        events = async_to_sync(read)()
+        self.assertEqual([event["sequence"] for event in events], [1, 2])
+
+    def test_check_requires_a_shared_cache(self):
+        self.assertEqual(check_events_cache(), [])
+        with override_settings(PLAYLIST_EVENTS_BROKER="grunge.events.CacheBroker"):
+            errors = check_events_cache()
+        self.assertEqual([error.id for error in errors], ["grunge.E001"])
+
+        with override_settings(
+            PLAYLIST_EVENTS_BROKER="grunge.events.CacheBroker",
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                    "LOCATION": "redis://cache:6379",
+                }
+            },
+        ):
+            self.assertEqual(check_events_cache(), [])
@@ -0,0 +1,68 @@
+from io import StringIO
+from uuid import UUID
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from grunge.models import Album, Artist, Playlist, Track
+from grunge.operations import append_album
+
+
+class BinaryUUIDFieldTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.artist = Artist.objects.create(name="Artist")
+        self.album = Album.objects.create(name="Album", year=1991, artist=self.artist)
+        self.track = Track.objects.create(name="Track", album=self.album, number=1)
+
+    def test_stored_as_bytes(self):
+        if connection.features.has_native_uuid_field:
+            self.skipTest("The backend stores UUIDs natively")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT uuid FROM grunge_track WHERE id = %s", [self.track.pk]
+            )
+            (value,) = cursor.fetchone()
+        self.assertEqual(bytes(value), self.track.uuid.bytes)
+
+    def test_lookups(self):
+        uuid = self.track.uuid
+        self.assertEqual(Track.objects.get(uuid=str(uuid)), self.track)
+        self.assertEqual(Track.objects.get(uuid=uuid.hex), self.track)
+        self.assertEqual(Track.objects.get(uuid__in=[uuid]), self.track)
+        self.assertEqual(Track.objects.get(uuid__iexact=str(uuid).upper()), self.track)
+        self.assertEqual(Track.objects.get(uuid__icontains=uuid.hex[4:12]), self.track)
+        self.assertEqual(Track.objects.get(uuid__startswith=str(uuid)[:13]), self.track)
+        self.assertEqual(
+            Track.objects.get(album__uuid=self.album.uuid).uuid, self.track.uuid
+        )
+
+    def test_endpoint_by_uuid(self):
+        url = reverse(
+            "track-detail", kwargs={"version": "v1", "uuid": str(self.track.uuid)}
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["uuid"], str(self.track.uuid))
+
+    def test_generated_in_sql(self):
+        # Entries appended with ``INSERT ... SELECT`` get their UUIDs from SQL
+        playlist = Playlist.objects.create(name="Appended")
+        append_album(playlist, self.album)
+        entry = playlist.playlist_tracks.get()
+        self.assertIsInstance(entry.uuid, UUID)
+        self.assertEqual(playlist.playlist_tracks.get(uuid=str(entry.uuid)), entry)
+
+
+class BenchmarkUUIDStorageTestCase(TestCase):
+    def test_command(self):
+        out = StringIO()
+        call_command("benchmark_uuid_storage", rows=200, lookups=50, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            [line.split()[0] for line in lines], ["format", "text", "binary"]
+        )
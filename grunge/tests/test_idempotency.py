@@ -0,0 +1,115 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from grunge.models import Album, Artist, IdempotencyKey, Playlist, Track
+
+
+class IdempotencyKeyTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("playlist-list", kwargs={"version": "v1"})
+        artist = Artist.objects.create(name="Soundgarden")
+        album = Album.objects.create(name="Superunknown", year=1994, artist=artist)
+        self.track = Track.objects.create(
+            name="Fell on Black Days", album=album, number=1
+        )
+        self.data = {
+            "name": "Superunknown",
+            "tracks": [{"track": str(self.track.uuid), "order": 1}],
+        }
+
+    def post(self, data=None, key="a5f1"):
+        return self.client.post(
+            self.url, data or self.data, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_replays(self):
+        response = self.post()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+        with CaptureQueriesContext(connection) as queries:
+            replayed = self.post()
+        self.assertEqual(replayed.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replayed["Idempotent-Replayed"], "true")
+        self.assertEqual(replayed.json(), response.json())
+        self.assertFalse(any("grunge_playlist" in query["sql"] for query in queries))
+        self.assertEqual(Playlist.objects.count(), 1)
+
+        # Other keys write again
+        self.assertNotIn("Idempotent-Replayed", self.post(key="b7c2"))
+
+    def test_updates(self):
+        playlist = Playlist.objects.create(name="Badmotorfinger")
+        url = reverse(
+            "playlist-detail", kwargs={"version": "v1", "uuid": playlist.uuid}
+        )
+        response = self.client.patch(
+            url, {"name": "Louder Than Love"}, format="json", HTTP_IDEMPOTENCY_KEY="c"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        Playlist.objects.filter(pk=playlist.pk).update(name="Ultramega OK")
+
+        replayed = self.client.patch(
+            url, {"name": "Louder Than Love"}, format="json", HTTP_IDEMPOTENCY_KEY="c"
+        )
+        self.assertEqual(replayed.json()["name"], "Louder Than Love")
+        playlist.refresh_from_db()
+        self.assertEqual(playlist.name, "Ultramega OK")
+
+    def test_key_reused_for_another_request(self):
+        self.post()
+        response = self.post({**self.data, "name": "Down on the Upside"})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Playlist.objects.count(), 1)
+
+    def test_key_in_use(self):
+        self.post()
+        IdempotencyKey.objects.update(status_code=None, response=None)
+        self.assertEqual(self.post().status_code, status.HTTP_409_CONFLICT)
+
+    def test_abandoned_keys_are_taken_over(self):
+        self.post()
+        # As left by a worker that crashed during the write
+        IdempotencyKey.objects.update(
+            status_code=None,
+            response=None,
+            expires=timezone.now() - timedelta(seconds=1),
+        )
+        response = self.post()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(self.post()["Idempotent-Replayed"], "true")
+
+    def test_failed_writes_are_not_stored(self):
+        response = self.post({"name": "Superunknown", "tracks": [{"order": 1}]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post().status_code, status.HTTP_201_CREATED)
+
+    def test_expired_keys(self):
+        self.post()
+        IdempotencyKey.objects.update(expires=timezone.now() - timedelta(seconds=1))
+        Playlist.objects.all().delete()
+        self.assertNotIn("Idempotent-Replayed", self.post())
+        self.assertEqual(Playlist.objects.count(), 1)
+
+        IdempotencyKey.objects.update(expires=timezone.now() - timedelta(seconds=1))
+        call_command("purge_idempotency_keys", stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_duplicate_names(self):
+        Playlist.objects.create(name="Superunknown")
+        Playlist.objects.create(name="Superunknown")
+        response = self.client.post(self.url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Playlist.objects.count(), 2)
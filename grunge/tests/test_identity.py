@@ -0,0 +1,83 @@
+from uuid import uuid4
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from grunge.identity import get_identity_map, identity_map
+from grunge.models import Album, Artist, Playlist, Track
+
+
+class IdentityMapTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.artist = Artist.objects.create(name="Artist")
+        self.album = Album.objects.create(name="Album", year=1991, artist=self.artist)
+        self.tracks = [
+            Track.objects.create(
+                name=f"Track {number}", album=self.album, number=number
+            )
+            for number in range(1, 4)
+        ]
+
+    def test_repeat_lookups_hit_the_map(self):
+        with identity_map() as current:
+            with self.assertNumQueries(1):
+                tracks = Track.objects.in_bulk_by_uuid(
+                    track.uuid for track in self.tracks
+                )
+                track = Track.objects.get_by_uuid(str(self.tracks[0].uuid))
+            self.assertIs(track, tracks[self.tracks[0].uuid])
+            self.assertEqual((current.hits, current.misses), (1, 3))
+
+            # Models have separate entries
+            with self.assertNumQueries(1):
+                self.assertEqual(Album.objects.get_by_uuid(self.album.uuid), self.album)
+        self.assertIsNone(get_identity_map())
+
+    def test_missing_and_deleted(self):
+        with identity_map():
+            with self.assertRaises(Track.DoesNotExist):
+                Track.objects.get_by_uuid(uuid4())
+
+            track = Track.objects.get_by_uuid(self.tracks[0].uuid)
+            track.delete()
+            with self.assertRaises(Track.DoesNotExist):
+                Track.objects.get_by_uuid(track.uuid)
+
+    def test_without_a_request(self):
+        self.assertEqual(Track.objects.get_by_uuid(self.tracks[0].uuid), self.tracks[0])
+        with self.assertNumQueries(0):
+            Track.objects.load_uuids([self.tracks[0].uuid])
+
+    def test_playlist_writes_resolve_each_track_once(self):
+        response = self.client.post(
+            reverse("playlist-list", kwargs={"version": "v1"}),
+            {
+                "name": "Resolved",
+                "tracks": [
+                    {"track": str(track.uuid), "order": order}
+                    for order, track in enumerate(self.tracks, start=1)
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        current = response.wsgi_request.identity_map
+        self.assertEqual((current.hits, current.misses), (3, 3))
+
+    def test_related_field(self):
+        playlist = Playlist.objects.create(name="Composed")
+        url = reverse(
+            "playlist-append-album",
+            kwargs={"version": "v1", "uuid": str(playlist.uuid)},
+        )
+        response = self.client.post(url, {"album": str(self.album.uuid)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["count"], 3)
+
+        response = self.client.post(url, {"album": str(uuid4())})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {"album": "not a uuid"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,123 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from grunge.listings import find_inconsistencies
+from grunge.models import Album, Artist, Track, TrackListing
+
+
+class TrackListingTestCase(TestCase):
+    def setUp(self):
+        self.artist = Artist.objects.create(name="Mudhoney")
+        self.album = Album.objects.create(
+            name="Superfuzz Bigmuff", year=1988, artist=self.artist
+        )
+        self.track = Track.objects.create(name="Need", album=self.album, number=1)
+
+    def assertListed(self, track):
+        track.refresh_from_db()
+        listing = TrackListing.objects.get(track=track)
+        self.assertEqual(
+            (
+                listing.uuid,
+                listing.name,
+                listing.number,
+                listing.album_id,
+                listing.album_uuid,
+                listing.album_name,
+                listing.album_year,
+                listing.artist_id,
+                listing.artist_uuid,
+                listing.artist_name,
+            ),
+            (
+                track.uuid,
+                track.name,
+                track.number,
+                track.album_id,
+                track.album.uuid,
+                track.album.name,
+                track.album.year,
+                track.album.artist_id,
+                track.album.artist.uuid,
+                track.album.artist.name,
+            ),
+        )
+
+    def test_track_writes(self):
+        self.assertListed(self.track)
+
+        other_album = Album.objects.create(
+            name="Every Good Boy Deserves Fudge", year=1991, artist=self.artist
+        )
+        self.track.name = "Chain That Door"
+        self.track.album = other_album
+        self.track.save()
+        self.assertListed(self.track)
+
+        self.track.delete()
+        self.assertFalse(TrackListing.objects.exists())
+
+    def test_album_and_artist_writes(self):
+        other_artist = Artist.objects.create(name="Green River")
+        self.album.name = "Dry As A Bone"
+        self.album.year = 1987
+        self.album.artist = other_artist
+        self.album.save()
+        self.assertListed(self.track)
+
+        other_artist.name = "Green River (1984)"
+        other_artist.save()
+        self.assertListed(self.track)
+
+        other_artist.delete()
+        self.assertFalse(TrackListing.objects.exists())
+
+    def test_writes_are_set_based(self):
+        def get_listing_queries(write):
+            with CaptureQueriesContext(connection) as queries:
+                write()
+            return [query for query in queries if "tracklisting" in query["sql"]]
+
+        # One UPDATE keyed on the object written
+        for instance in (self.track, self.album, self.artist):
+            self.assertEqual(len(get_listing_queries(instance.save)), 1)
+
+        Track.objects.create(name="Sweet", album=self.album, number=2)
+        # One DELETE per foreign key, however many tracks cascade
+        self.assertEqual(len(get_listing_queries(self.artist.delete)), 3)
+
+    def test_inconsistencies_are_found_and_repaired(self):
+        Track.objects.filter(pk=self.track.pk).update(name="Touch Me I'm Sick")
+        Track.objects.bulk_create([Track(name="Sweet", album=self.album, number=2)])
+        missing = Track.objects.get(number=2)
+        self.assertEqual(
+            find_inconsistencies(), {"missing": [missing.pk], "stale": [self.track.pk]}
+        )
+        with self.assertRaises(CommandError):
+            call_command("rebuild_track_listing", check=True, stdout=StringIO())
+
+        call_command("rebuild_track_listing", stdout=StringIO())
+        self.assertEqual(find_inconsistencies(), {"missing": [], "stale": []})
+        self.assertListed(self.track)
+        self.assertListed(missing)
+
+    def test_tracks_are_read_without_joins(self):
+        client = APIClient()
+        url = reverse("track-list", kwargs={"version": "v1"})
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                url, {"album_uuid": self.album.uuid, "ordering": "-album_year"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any("JOIN" in query["sql"] for query in queries))
+
+        album = response.json()["results"][0]["album"]
+        self.assertEqual(album["uuid"], str(self.album.uuid))
+        self.assertEqual(album["artist"]["id"], self.artist.pk)
+        self.assertEqual(album["artist"]["name"], "Mudhoney")
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.db import connection
+from rest_framework import status
+from rest_framework.reverse import reverse as drf_reverse
+
+from grunge.checks import check_ordering_indexes
+from grunge.filters import get_tiebroken_ordering
+from grunge.models import Album, Artist
+from grunge.viewsets import TrackViewSet
+
+from . import BaseAPITestCase
+
+
+class OrderingTests(BaseAPITestCase):
+    def test_order_by_allowed_field(self):
+        url = drf_reverse("album-list", kwargs={"version": self.version})
+        r = self.client.get(url, {"ordering": "-year"})
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        expected = Album.objects.order_by("-year", "-id").values_list("name")[:10]
+        self.assertEqual(
+            [album["name"] for album in r.data["results"]],
+            [name for (name,) in expected],
+        )
+
+    def test_other_fields_are_ignored(self):
+        url = drf_reverse("artist-list", kwargs={"version": self.version})
+        default = self.client.get(url).data["results"]
+        for ordering in ("uuid", "-id", "albums__year", "name,uuid"):
+            r = self.client.get(url, {"ordering": ordering})
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+            if ordering.startswith("name"):
+                expected = Artist.objects.order_by("name", "id")[:10]
+                self.assertEqual(
+                    [artist["uuid"] for artist in r.data["results"]],
+                    [artist.uuid for artist in expected],
+                )
+            else:
+                self.assertEqual(r.data["results"], default)
+
+    def test_tiebroken_ordering(self):
+        self.assertEqual(get_tiebroken_ordering("name"), ["name", "pk"])
+        self.assertEqual(
+            get_tiebroken_ordering("-album__artist__name"),
+            ["-album__artist__name", "-album__artist__pk", "-album__pk", "-pk"],
+        )
+
+    def test_orderings_are_indexed(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(check_ordering_indexes(databases=["default"]), [])
+
+    def test_unindexed_orderings_are_reported(self):
+        with mock.patch.object(TrackViewSet, "ordering_fields", ("number",)):
+            warnings = check_ordering_indexes(databases=["default"])
+        self.assertEqual([warning.id for warning in warnings], ["grunge.W001"] * 2)
+        self.assertEqual(warnings[0].obj, TrackViewSet)
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from grunge.listings import rebuild_listings
+from grunge.models import Album, Artist, Track
+from grunge.pagination import count_queryset
+
+
+class CountQuerySetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        artist = Artist.objects.create(name="Artist")
+        album = Album.objects.create(name="Album", year=1992, artist=artist)
+        for number in range(1, 21):
+            Track.objects.create(name=f"Track {number}", album=album, number=number)
+
+    def test_small_counts_are_exact(self):
+        self.assertEqual(count_queryset(Track.objects.all(), threshold=20), (20, False))
+        self.assertEqual(
+            count_queryset(Track.objects.filter(number__lte=5), threshold=10),
+            (5, False),
+        )
+
+    def test_large_counts_are_cached(self):
+        tracks = Track.objects.filter(number__gt=2)
+        self.assertEqual(count_queryset(tracks, threshold=10), (18, True))
+
+        Track.objects.filter(number=20).delete()
+        # Only the bounded count runs, and the cached estimate is returned
+        with self.assertNumQueries(1):
+            self.assertEqual(count_queryset(tracks, threshold=10), (18, True))
+
+    def test_planner_estimates(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Table statistics are specific to SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        Track.objects.filter(number__gt=15).delete()
+        self.assertEqual(count_queryset(Track.objects.all(), threshold=10), (20, True))
+
+
+@override_settings(EXACT_COUNT_THRESHOLD=5)
+class EstimatedPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("track-list", kwargs={"version": "v1"})
+        artist = Artist.objects.create(name="Artist")
+        album = Album.objects.create(name="Album", year=1992, artist=artist)
+        Track.objects.bulk_create(
+            Track(name=f"Track {number}", album=album, number=number)
+            for number in range(1, 16)
+        )
+        # Bulk creation skips the signals that list the tracks
+        rebuild_listings()
+
+    def test_pages_follow_the_rows(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data["count"], 15)
+        self.assertEqual(len(data["results"]), 10)
+        self.assertIsNotNone(data["next"])
+
+        data = self.client.get(data["next"]).json()
+        self.assertEqual(len(data["results"]), 5)
+        self.assertIsNone(data["next"])
+        self.assertIsNotNone(data["previous"])
+
+        response = self.client.get(self.url, {"page": 3})
+        self.assertEqual(response.status_code, 404)
@@ -5,7 +5,8 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from grunge.models import Album, Artist, Playlist, PlaylistTrack, Track
+from grunge import changes, operations, packed
+from grunge.models import Album, Artist, Playlist, PlaylistChange, PlaylistTrack, Track
 from grunge.serializers import PlaylistSerializer
 
 from rest_framework import status
@@ -322,3 +323,487 @@ class PlaylistTrackSerializerTestCase(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+
+class PlaylistShuffleTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        artist = Artist.objects.create(name="Artist")
+        album = Album.objects.create(name="Album", year=1991, artist=artist)
+        self.playlist = Playlist.objects.create(name="Shuffled")
+        PlaylistTrack.objects.bulk_create(
+            PlaylistTrack(
+                playlist=self.playlist,
+                track=Track.objects.create(
+                    name=f"Track {number}", album=album, number=number
+                ),
+                order=number * 10,
+            )
+            for number in range(1, 31)
+        )
+        self.url = reverse(
+            "playlist-shuffle",
+            kwargs={"version": "v1", "uuid": str(self.playlist.uuid)},
+        )
+
+    def test_shuffle_is_a_repeatable_permutation(self):
+        response = self.client.get(self.url, {"seed": 42, "limit": 30})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["seed"], 42)
+        self.assertEqual(response.json()["count"], 30)
+
+        orders = [item["order"] for item in response.json()["results"]]
+        self.assertCountEqual(orders, range(10, 310, 10))
+        self.assertNotEqual(orders, sorted(orders))
+
+        repeated = self.client.get(self.url, {"seed": 42, "limit": 30})
+        self.assertEqual(orders, [item["order"] for item in repeated.json()["results"]])
+
+    def test_shuffle_windows_cover_the_playlist(self):
+        orders = []
+        url, params = self.url, {"seed": 7, "limit": 8}
+        while url:
+            response = self.client.get(url, params)
+            orders += [item["order"] for item in response.json()["results"]]
+            url, params = response.json()["next"], None
+        self.assertCountEqual(orders, range(10, 310, 10))
+
+    def test_shuffle_fetches_only_the_window(self):
+        # Playlist lookup, the count and the window's rows, however long the
+        # window is
+        for limit in (5, 25):
+            with self.assertNumQueries(3):
+                response = self.client.get(
+                    self.url, {"seed": 1, "limit": limit, "offset": 5}
+                )
+            self.assertEqual(len(response.json()["results"]), limit)
+
+    def test_shuffle_follows_writes(self):
+        self.client.get(self.url, {"seed": 3})
+        Track.objects.get(name="Track 1").delete()
+
+        orders = [
+            item["order"]
+            for item in self.client.get(self.url, {"seed": 3, "limit": 30}).json()[
+                "results"
+            ]
+        ]
+        self.assertCountEqual(orders, range(20, 310, 10))
+
+    def test_shuffle_without_seed_returns_seed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("seed=", response.json()["next"])
+
+    def test_shuffle_invalid_seed(self):
+        response = self.client.get(self.url, {"seed": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PackedPlaylistTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        artist = Artist.objects.create(name="Artist")
+        album = Album.objects.create(name="Album", year=1993, artist=artist)
+        self.tracks = [
+            Track.objects.create(name=f"Track {number}", album=album, number=number)
+            for number in range(1, 6)
+        ]
+        self.playlist = Playlist.objects.create(name="Packed")
+        for order, track in enumerate(self.tracks, start=1):
+            PlaylistTrack.objects.create(
+                playlist=self.playlist, track=track, order=order
+            )
+        self.url = reverse(
+            "playlist-detail", kwargs={"version": "v1", "uuid": str(self.playlist.uuid)}
+        )
+
+    def test_packed_playlist_reads_like_rows(self):
+        rows = self.client.get(self.url).json()
+
+        packed.pack_playlist(self.playlist)
+        self.assertFalse(self.playlist.playlist_tracks.exists())
+        # Changing the storage moves the playlist to its next version
+        rows["version"] += 1
+        self.assertEqual(self.client.get(self.url).json(), rows)
+
+    def test_read_window(self):
+        packed.pack_playlist(self.playlist)
+        entries = packed.PackedPlaylistTracks(self.playlist)
+        self.assertEqual(entries.count(), 5)
+        # The window's bytes and its tracks
+        with self.assertNumQueries(2):
+            window = entries[1:3]
+        self.assertEqual([entry.track for entry in window], self.tracks[1:3])
+        self.assertEqual([entry.order for entry in window], [2, 3])
+
+    def test_update_packed_playlist(self):
+        packed.pack_playlist(self.playlist)
+        response = self.client.put(
+            self.url,
+            {
+                "name": "Repacked",
+                "tracks": [
+                    {"track": str(self.tracks[4].uuid), "order": 1},
+                    {"track": str(self.tracks[0].uuid), "order": 2},
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            packed.read_all(self.playlist), [self.tracks[4].pk, self.tracks[0].pk]
+        )
+        self.assertFalse(self.playlist.playlist_tracks.exists())
+
+    def test_shuffle_packed_playlist(self):
+        packed.pack_playlist(self.playlist)
+        url = reverse(
+            "playlist-shuffle",
+            kwargs={"version": "v1", "uuid": str(self.playlist.uuid)},
+        )
+        response = self.client.get(url, {"seed": 3})
+        orders = [item["order"] for item in response.json()["results"]]
+        self.assertCountEqual(orders, range(1, 6))
+
+    def test_deleted_tracks_leave_packed_playlists(self):
+        packed.pack_playlist(self.playlist)
+        other = Playlist.objects.create(name="Other")
+        packed.pack_playlist(other)
+        self.tracks[1].delete()
+
+        self.assertEqual(
+            packed.read_all(self.playlist),
+            [track.pk for track in self.tracks if track != self.tracks[1]],
+        )
+        response = self.client.get(self.url).json()
+        self.assertEqual(len(response["tracks"]), 4)
+        self.assertEqual(response["version"], 3)
+        self.assertEqual(self.playlist.changes.last().operation, "snapshot")
+        other.refresh_from_db()
+        self.assertEqual(other.version, 2)
+
+    def test_unpack_playlist(self):
+        packed.pack_playlist(self.playlist)
+        packed.unpack_playlist(self.playlist)
+        playlist_tracks = self.playlist.playlist_tracks.select_related("track")
+        self.assertEqual(
+            [playlist_track.track for playlist_track in playlist_tracks], self.tracks
+        )
+
+
+class PlaylistCompositionTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        self.artist = Artist.objects.create(name="Artist")
+        self.first_album = Album.objects.create(
+            name="First", year=1991, artist=self.artist
+        )
+        self.second_album = Album.objects.create(
+            name="Second", year=1994, artist=self.artist
+        )
+        # Created out of number order, to check the album's order is kept
+        self.first_tracks = [
+            Track.objects.create(
+                name=f"First {number}", album=self.first_album, number=number
+            )
+            for number in (2, 1, 3)
+        ]
+        self.first_tracks.sort(key=lambda track: track.number)
+        self.second_tracks = [
+            Track.objects.create(
+                name=f"Second {number}", album=self.second_album, number=number
+            )
+            for number in (1, 2)
+        ]
+        self.playlist = Playlist.objects.create(name="Mix")
+        PlaylistTrack.objects.create(
+            playlist=self.playlist, track=self.second_tracks[1], order=5
+        )
+
+    def get_url(self, name, playlist=None):
+        playlist = playlist or self.playlist
+        return reverse(
+            f"playlist-{name}", kwargs={"version": "v1", "uuid": str(playlist.uuid)}
+        )
+
+    def get_tracks(self, playlist=None):
+        playlist_tracks = (playlist or self.playlist).playlist_tracks.select_related(
+            "track"
+        )
+        return [
+            (playlist_track.order, playlist_track.track)
+            for playlist_track in playlist_tracks
+        ]
+
+    def test_append_album(self):
+        response = self.client.post(
+            self.get_url("append-album"),
+            {"album": str(self.first_album.uuid)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["added"], 3)
+        self.assertEqual(response.json()["count"], 4)
+        self.assertEqual(
+            self.get_tracks(),
+            [(5, self.second_tracks[1])]
+            + [(order, track) for order, track in zip((6, 7, 8), self.first_tracks)],
+        )
+
+    def test_append_artist_skips_tracks_in_playlist(self):
+        response = self.client.post(
+            self.get_url("append-artist"),
+            {"artist": str(self.artist.uuid)},
+            format="json",
+        )
+        self.assertEqual(response.json()["added"], 4)
+        self.assertEqual(
+            [track for _, track in self.get_tracks()],
+            [self.second_tracks[1], *self.first_tracks, self.second_tracks[0]],
+        )
+
+    def test_append_unknown_album(self):
+        response = self.client.post(
+            self.get_url("append-album"), {"album": str(uuid.uuid4())}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_merge_playlists(self):
+        other = Playlist.objects.create(name="Other")
+        for order, track in enumerate(
+            [self.first_tracks[2], self.second_tracks[1], self.first_tracks[0]],
+            start=1,
+        ):
+            PlaylistTrack.objects.create(playlist=other, track=track, order=order)
+
+        response = self.client.post(
+            self.get_url("merge"), {"playlist": str(other.uuid)}, format="json"
+        )
+        self.assertEqual(response.json()["added"], 2)
+        self.assertEqual(
+            self.get_tracks(),
+            [
+                (5, self.second_tracks[1]),
+                (6, self.first_tracks[2]),
+                (7, self.first_tracks[0]),
+            ],
+        )
+
+    def test_fork_playlist(self):
+        response = self.client.post(
+            self.get_url("fork"), {"name": "Forked"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        fork = Playlist.objects.get(uuid=response.json()["uuid"])
+        self.assertEqual(fork.name, "Forked")
+        self.assertEqual(self.get_tracks(fork), [(1, self.second_tracks[1])])
+
+    def test_dedupe_playlist(self):
+        for order, track in [
+            (7, self.first_tracks[0]),
+            (9, self.second_tracks[1]),
+            (12, self.first_tracks[0]),
+            (15, self.first_tracks[1]),
+        ]:
+            PlaylistTrack.objects.create(
+                playlist=self.playlist, track=track, order=order
+            )
+
+        response = self.client.post(self.get_url("dedupe"))
+        self.assertEqual(response.json()["removed"], 2)
+        self.assertEqual(
+            self.get_tracks(),
+            [
+                (1, self.second_tracks[1]),
+                (2, self.first_tracks[0]),
+                (3, self.first_tracks[1]),
+            ],
+        )
+
+    def test_query_count_does_not_grow_with_tracks(self):
+        url = self.get_url("append-artist")
+        data = {"artist": str(self.artist.uuid)}
+        with self.assertNumQueries(13):
+            self.client.post(url, data, format="json")
+
+        more_tracks = Album.objects.create(name="Third", year=1996, artist=self.artist)
+        for number in range(1, 21):
+            Track.objects.create(
+                name=f"Third {number}", album=more_tracks, number=number
+            )
+        with self.assertNumQueries(13):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.json()["added"], 20)
+
+    def test_packed_playlist_is_rejected(self):
+        packed.pack_playlist(self.playlist)
+        response = self.client.post(self.get_url("dedupe"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PlaylistChangeFeedTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        artist = Artist.objects.create(name="Artist")
+        album = Album.objects.create(name="Album", year=1992, artist=artist)
+        self.tracks = [
+            Track.objects.create(name=f"Track {number}", album=album, number=number)
+            for number in range(1, 5)
+        ]
+        response = self.client.post(
+            reverse("playlist-list", kwargs={"version": "v1"}),
+            {
+                "name": "Synced",
+                "tracks": [
+                    {"track": str(track.uuid), "order": order}
+                    for order, track in enumerate(self.tracks[:3], start=1)
+                ],
+            },
+            format="json",
+        )
+        self.playlist = Playlist.objects.get(uuid=response.json()["uuid"])
+        self.url = reverse(
+            "playlist-changes",
+            kwargs={"version": "v1", "uuid": str(self.playlist.uuid)},
+        )
+
+    def get_changes(self, since=0, **params):
+        response = self.client.get(self.url, {"since": since, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def replay(self, snapshot=None, since=0):
+        # Applies the feed the way a client does
+        changes_ = PlaylistChange.objects.filter(playlist=self.playlist, id__gt=since)
+        return changes.apply_changes(changes_, snapshot)
+
+    def assertReplaysToPlaylist(self, snapshot):
+        self.assertEqual(snapshot, changes.get_snapshot(self.playlist))
+
+    def test_changes_describe_the_playlist(self):
+        data = self.get_changes()
+        self.assertEqual(
+            [change["operation"] for change in data["results"]],
+            ["rename", "add", "add", "add"],
+        )
+        self.assertEqual(
+            data["results"][0],
+            {
+                "sequence": data["results"][0]["sequence"],
+                "operation": "rename",
+                "name": "Synced",
+            },
+        )
+        self.assertEqual(data["sequence"], data["results"][-1]["sequence"])
+        self.assertIsNone(data["next"])
+        self.assertReplaysToPlaylist(self.replay())
+
+    def test_changes_since_sequence(self):
+        since = self.get_changes()["sequence"]
+        self.client.patch(
+            reverse(
+                "playlist-detail",
+                kwargs={"version": "v1", "uuid": str(self.playlist.uuid)},
+            ),
+            {"name": "Renamed"},
+            format="json",
+        )
+        playlist_track = self.playlist.playlist_tracks.get(track=self.tracks[0])
+        self.tracks[0].delete()
+
+        data = self.get_changes(since)
+        self.assertEqual(
+            [change["operation"] for change in data["results"]], ["rename", "remove"]
+        )
+        self.assertEqual(data["results"][1]["entry"], str(playlist_track.uuid))
+        self.assertEqual(self.get_changes(data["sequence"])["results"], [])
+
+    def test_deleted_artists_remove_their_entries(self):
+        since = self.get_changes()["sequence"]
+        self.tracks[0].album.artist.delete()
+
+        self.assertEqual(
+            [change["operation"] for change in self.get_changes(since)["results"]],
+            ["remove", "remove", "remove"],
+        )
+        self.assertReplaysToPlaylist(self.replay())
+
+    def test_changes_are_paginated(self):
+        data = self.get_changes(limit=3)
+        self.assertEqual(len(data["results"]), 3)
+        self.assertIn(f"since={data['sequence']}", data["next"])
+        rest = self.client.get(data["next"]).json()
+        self.assertEqual(len(rest["results"]), 1)
+        self.assertIsNone(rest["next"])
+
+    def test_bulk_operations_are_logged(self):
+        entries = list(self.playlist.playlist_tracks.values_list("pk", flat=True))
+        operations.reorder_playlist_tracks(self.playlist, entries[::-1])
+        operations.append_tracks(
+            self.playlist,
+            operations.get_track_source(
+                Track.objects.filter(pk=self.tracks[3].pk), "pk"
+            ),
+        )
+        self.client.put(
+            reverse(
+                "playlist-detail",
+                kwargs={"version": "v1", "uuid": str(self.playlist.uuid)},
+            ),
+            {
+                "name": "Synced",
+                "tracks": [
+                    {"track": str(self.tracks[3].uuid), "order": 1},
+                    {"track": str(self.tracks[0].uuid), "order": 2},
+                ],
+            },
+            format="json",
+        )
+        self.assertReplaysToPlaylist(self.replay())
+
+    def test_packed_writes_are_snapshots(self):
+        packed.pack_playlist(self.playlist)
+        packed.write_all(self.playlist, [self.tracks[2].pk, self.tracks[1].pk])
+
+        snapshot = self.get_changes()["results"][-1]
+        self.assertEqual(snapshot["operation"], "snapshot")
+        self.assertEqual(
+            snapshot["snapshot"]["entries"],
+            [
+                [None, str(self.tracks[2].uuid), 1],
+                [None, str(self.tracks[1].uuid), 2],
+            ],
+        )
+
+    def test_compaction(self):
+        since = self.get_changes()["sequence"]
+        entries = list(self.playlist.playlist_tracks.values_list("pk", flat=True))
+        operations.reorder_playlist_tracks(self.playlist, entries[::-1])
+
+        self.assertEqual(changes.compact_playlist_changes(self.playlist, keep=2), 3)
+        data = self.get_changes()
+        self.assertEqual(
+            [change["operation"] for change in data["results"]],
+            ["snapshot", "move", "move"],
+        )
+        # The snapshot keeps the sequence number of the changes it replaced
+        self.assertEqual(data["results"][0]["sequence"], since)
+        self.assertEqual(
+            [change["operation"] for change in self.get_changes(since)["results"]],
+            ["move", "move"],
+        )
+        self.assertReplaysToPlaylist(self.replay())
+        self.assertEqual(changes.compact_playlist_changes(self.playlist, keep=2), 0)
+
+    def test_deleting_the_playlist_deletes_its_log(self):
+        self.playlist.delete()
+        self.assertFalse(PlaylistChange.objects.exists())
+
+    def test_invalid_since(self):
+        response = self.client.get(self.url, {"since": "latest"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("since", response.json())
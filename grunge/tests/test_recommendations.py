@@ -0,0 +1,157 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from grunge.models import (
+    Album,
+    Artist,
+    Playlist,
+    PlaylistTrack,
+    StaleCooccurrence,
+    Track,
+    TrackCooccurrence,
+)
+from grunge.packed import pack_playlist
+
+
+class RecommendationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        artist = Artist.objects.create(name="Artist")
+        album = Album.objects.create(name="Album", year=1994, artist=artist)
+        self.tracks = [
+            Track.objects.create(name=f"Track {number}", album=album, number=number)
+            for number in range(1, 6)
+        ]
+        self.create_playlist("One", self.tracks[0], self.tracks[1], self.tracks[2])
+        self.create_playlist("Two", self.tracks[0], self.tracks[1])
+        self.create_playlist("Three", self.tracks[0], self.tracks[3])
+        call_command("build_recommendations", "--full", stdout=StringIO())
+
+    def create_playlist(self, name, *tracks):
+        playlist = Playlist.objects.create(name=name)
+        for order, track in enumerate(tracks, start=1):
+            PlaylistTrack.objects.create(playlist=playlist, track=track, order=order)
+        return playlist
+
+    def get_count(self, track, other):
+        return TrackCooccurrence.objects.get(track=track, other=other).count
+
+    def test_full_build(self):
+        self.assertEqual(self.get_count(self.tracks[0], self.tracks[1]), 2)
+        self.assertEqual(self.get_count(self.tracks[1], self.tracks[0]), 2)
+        self.assertEqual(self.get_count(self.tracks[0], self.tracks[3]), 1)
+        self.assertFalse(
+            TrackCooccurrence.objects.filter(track=self.tracks[4]).exists()
+        )
+        self.assertFalse(StaleCooccurrence.objects.exists())
+
+    def test_incremental_build(self):
+        url = reverse("playlist-list", kwargs={"version": "v1"})
+        tracks = [
+            {"track": str(self.tracks[1].uuid), "order": 1},
+            {"track": str(self.tracks[4].uuid), "order": 2},
+        ]
+        self.client.post(url, {"name": "Four", "tracks": tracks}, format="json")
+        two = Playlist.objects.get(name="Two")
+        url = reverse("playlist-detail", kwargs={"version": "v1", "uuid": two.uuid})
+        self.client.patch(url, {"tracks": []}, format="json")
+
+        call_command("build_recommendations", stdout=StringIO())
+
+        self.assertEqual(self.get_count(self.tracks[0], self.tracks[1]), 1)
+        self.assertEqual(self.get_count(self.tracks[4], self.tracks[1]), 1)
+        self.assertEqual(self.get_count(self.tracks[0], self.tracks[3]), 1)
+        self.assertFalse(StaleCooccurrence.objects.exists())
+
+    def test_deleted_playlists(self):
+        one = Playlist.objects.get(name="One")
+        url = reverse("playlist-detail", kwargs={"version": "v1", "uuid": one.uuid})
+        self.client.delete(url)
+
+        call_command("build_recommendations", stdout=StringIO())
+
+        self.assertEqual(self.get_count(self.tracks[0], self.tracks[1]), 1)
+        self.assertFalse(
+            TrackCooccurrence.objects.filter(track=self.tracks[2]).exists()
+        )
+
+    @override_settings(COOCCURRENCE_MAX_PLAYLIST_SIZE=2)
+    def test_long_playlists_are_skipped(self):
+        call_command("build_recommendations", "--full", stdout=StringIO())
+
+        self.assertEqual(self.get_count(self.tracks[0], self.tracks[1]), 1)
+        self.assertFalse(
+            TrackCooccurrence.objects.filter(track=self.tracks[2]).exists()
+        )
+
+    def test_packing_marks_tracks(self):
+        one = Playlist.objects.get(name="One")
+        pack_playlist(one)
+        self.assertEqual(
+            set(StaleCooccurrence.objects.values_list("track_id", flat=True)),
+            {self.tracks[0].pk, self.tracks[1].pk, self.tracks[2].pk},
+        )
+
+        call_command("build_recommendations", stdout=StringIO())
+
+        self.assertEqual(self.get_count(self.tracks[0], self.tracks[1]), 1)
+        self.assertFalse(
+            TrackCooccurrence.objects.filter(track=self.tracks[2]).exists()
+        )
+
+    def test_tracks_are_marked_once(self):
+        two = Playlist.objects.get(name="Two")
+        StaleCooccurrence.mark([self.tracks[0].pk])
+        StaleCooccurrence.mark_entries(two.playlist_tracks.all())
+        StaleCooccurrence.mark_entries(PlaylistTrack.objects.all())
+
+        self.assertEqual(
+            sorted(StaleCooccurrence.objects.values_list("track_id", flat=True)),
+            [track.pk for track in self.tracks[:4]],
+        )
+
+    def test_similar_tracks(self):
+        url = reverse(
+            "track-similar", kwargs={"version": "v1", "uuid": self.tracks[0].uuid}
+        )
+        response = self.client.get(url, {"limit": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [track["uuid"] for track in response.json()],
+            [str(self.tracks[1].uuid), str(self.tracks[2].uuid)],
+        )
+
+    def test_continue_playlist(self):
+        playlist = self.create_playlist("Five", self.tracks[1])
+        url = reverse(
+            "playlist-continue", kwargs={"version": "v1", "uuid": playlist.uuid}
+        )
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [track["uuid"] for track in response.json()],
+            [str(self.tracks[0].uuid), str(self.tracks[2].uuid)],
+        )
+
+    def test_continue_packed_playlist(self):
+        playlist = self.create_playlist("Five", self.tracks[1])
+        pack_playlist(playlist)
+        url = reverse(
+            "playlist-continue", kwargs={"version": "v1", "uuid": playlist.uuid}
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_limit(self):
+        url = reverse(
+            "track-similar", kwargs={"version": "v1", "uuid": self.tracks[0].uuid}
+        )
+        response = self.client.get(url, {"limit": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
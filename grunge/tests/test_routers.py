@@ -0,0 +1,116 @@
+from unittest import mock
+
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from grunge.models import Artist, Track
+from grunge.routers import ReplicaPool, ReplicaRouter, replica_reads
+
+
+class ReplicaPoolTestCase(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(ReplicaPool, "check", return_value=True)
+        self.check = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_weighted_round_robin(self):
+        pool = ReplicaPool({"replica1": 2, "replica2": 1})
+        self.assertEqual(
+            [pool.choose() for _ in range(6)],
+            ["replica1", "replica2", "replica1"] * 2,
+        )
+
+    @override_settings(REPLICA_HEALTH_CHECK_INTERVAL=0)
+    def test_unhealthy_replicas_are_skipped(self):
+        pool = ReplicaPool({"replica1": 1, "replica2": 1})
+        self.check.side_effect = lambda alias: alias != "replica1"
+        self.assertEqual({pool.choose() for _ in range(4)}, {"replica2"})
+
+        self.check.side_effect = lambda alias: False
+        self.assertIsNone(pool.choose())
+
+    def test_health_is_checked_once_per_interval(self):
+        pool = ReplicaPool({"replica1": 1})
+        for _ in range(3):
+            pool.choose()
+        self.check.assert_called_once_with("replica1")
+
+    def test_checks_run_outside_the_lock(self):
+        pool = ReplicaPool({"replica1": 1})
+        self.check.side_effect = lambda alias: not pool.lock.locked()
+        self.assertEqual(pool.choose(), "replica1")
+
+
+class ReplicaRouterTestCase(TestCase):
+    @override_settings(REPLICA_DATABASES={"replica1": 1})
+    def test_replicas_are_not_migrated(self):
+        router = ReplicaRouter()
+        self.assertIs(router.allow_migrate("replica1", "grunge"), False)
+        self.assertIsNone(router.allow_migrate("default", "grunge"))
+
+
+# The test database stands in for a replica, to run the routed queries
+@override_settings(REPLICA_DATABASES={"default": 1})
+class ReplicaRoutingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        Artist.objects.create(name="Artist")
+
+    def get_read_databases(self, method, url, **kwargs):
+        databases = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            databases.append(db_for_read(router, model, **hints))
+            return databases[-1]
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", record):
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, set(databases)
+
+    def test_catalogue_reads_use_replicas(self):
+        url = reverse("artist-list", kwargs={"version": "v1"})
+        response, databases = self.get_read_databases("get", url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(databases, {"default"})
+
+        # Reads outside of the catalogue endpoints use the primary
+        self.assertIsNone(ReplicaRouter().db_for_read(Track))
+
+    def test_authentication_reads_use_the_primary(self):
+        with replica_reads(RequestFactory().get("/")):
+            self.assertEqual(ReplicaRouter().db_for_read(Artist), "default")
+            self.assertIsNone(ReplicaRouter().db_for_read(Token))
+
+    def test_playlist_writes_pin_the_client(self):
+        response = self.client.post(
+            reverse("playlist-list", kwargs={"version": "v1"}),
+            {"name": "Pinned", "tracks": []},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("pin_primary", response.cookies)
+
+        url = reverse("artist-list", kwargs={"version": "v1"})
+        _, databases = self.get_read_databases("get", url)
+        self.assertEqual(databases, {None})
+
+    def test_unsafe_requests_pin_the_client(self):
+        response = self.client.post(
+            reverse("smartplaylist-list", kwargs={"version": "v1"}),
+            {"name": "Pinned"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("pin_primary", response.cookies)
+
+        response = self.client.post(
+            reverse("smartplaylist-list", kwargs={"version": "v1"}),
+            {},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn("pin_primary", response.cookies)
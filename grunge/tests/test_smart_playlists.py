@@ -0,0 +1,108 @@
+from uuid import UUID
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse as drf_reverse
+
+from grunge.models import Artist, SmartPlaylist, Track
+
+from . import BaseAPITestCase
+
+
+class SmartPlaylistTests(BaseAPITestCase):
+    def setUp(self):
+        self.artist = Artist.objects.get(
+            uuid=UUID("9e52205f-9927-4eff-b132-ce10c6f3e0b1")
+        )
+        self.smart_playlist = SmartPlaylist.objects.create(
+            name="Nineties Pearl Jam",
+            artist=self.artist,
+            year_from=1990,
+            year_until=1999,
+        )
+
+    def get_tracks_url(self, smart_playlist):
+        return drf_reverse(
+            "smartplaylist-tracks",
+            kwargs={"version": self.version, "uuid": smart_playlist.uuid},
+        )
+
+    def test_create_smart_playlist(self):
+        url = drf_reverse("smartplaylist-list", kwargs={"version": self.version})
+        r = self.client.post(
+            url,
+            {"name": "Jam", "artist": str(self.artist.uuid), "name_contains": "jam"},
+            format="json",
+        )
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(r.data["artist"], self.artist.uuid)
+
+    def test_invalid_year_range(self):
+        url = drf_reverse("smartplaylist-list", kwargs={"version": self.version})
+        r = self.client.post(
+            url, {"name": "Backwards", "year_from": 2000, "year_until": 1990}
+        )
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_tracks(self):
+        expected = Track.objects.filter(
+            album__artist=self.artist, album__year__range=(1990, 1999)
+        )
+        r = self.client.get(self.get_tracks_url(self.smart_playlist))
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(r.data["count"], expected.count())
+        self.assertEqual(len(r.data["results"]), 10)
+        self.assertTrue(expected.filter(uuid=r.data["results"][0]["uuid"]).exists())
+
+    def test_list_tracks_reads_one_page(self):
+        url = self.get_tracks_url(self.smart_playlist)
+        params = {"page": 2}
+        # Smart playlist lookup, count, the page's keys and the page's rows
+        with self.assertNumQueries(4):
+            self.client.get(url, params)
+        # Served from the cache, apart from the smart playlist lookup
+        with self.assertNumQueries(2):
+            self.client.get(url, params)
+
+    def test_random_sample_is_deterministic(self):
+        smart_playlist = SmartPlaylist.objects.create(
+            name="Sample", sample_size=25, seed=7
+        )
+        first = list(smart_playlist.get_tracks().values_list("pk", flat=True))
+        second = list(smart_playlist.get_tracks().values_list("pk", flat=True))
+        self.assertEqual(len(first), 25)
+        self.assertEqual(first, second)
+
+        smart_playlist.seed = 8
+        reseeded = list(smart_playlist.get_tracks().values_list("pk", flat=True))
+        self.assertNotEqual(first, reseeded)
+
+    def test_catalogue_write_invalidates_cache(self):
+        url = self.get_tracks_url(self.smart_playlist)
+        count = self.client.get(url).data["count"]
+
+        track = Track.objects.filter(
+            album__artist=self.artist, album__year__range=(1990, 1999)
+        ).first()
+        track.album.year = 2005
+        track.album.save()
+
+        r = self.client.get(url)
+        self.assertLess(r.data["count"], count)
+
+    def test_catalogue_delete_invalidates_cache(self):
+        url = self.get_tracks_url(self.smart_playlist)
+        self.assertGreater(self.client.get(url).data["count"], 0)
+
+        # Cascades invalidate once, without reading the smart playlists
+        with CaptureQueriesContext(connection) as queries:
+            self.artist.albums.filter(year__range=(1990, 1999)).first().delete()
+        self.assertFalse(
+            any("grunge_smartplaylist" in query["sql"] for query in queries)
+        )
+
+        self.assertEqual(
+            self.client.get(url).data["count"],
+            self.smart_playlist.get_tracks().count(),
+        )
@@ -0,0 +1,90 @@
+import json
+from uuid import UUID
+
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse as drf_reverse
+
+from grunge.models import Album
+from grunge.renderers import StreamingJSONRenderer
+
+from . import BaseAPITestCase
+
+
+class StreamingTests(BaseAPITestCase):
+    def setUp(self):
+        self.album_uuid = UUID("b4fee0db-0c93-4470-96b3-cebd158033a0")
+
+    def get(self, url, **params):
+        with override_settings(STREAMING_THRESHOLD=1000):
+            whole = self.client.get(url, params)
+        # Whole responses are cached
+        cache.clear()
+        with override_settings(STREAMING_THRESHOLD=5):
+            streamed = self.client.get(url, params)
+
+        self.assertEqual(whole.status_code, status.HTTP_200_OK)
+        self.assertEqual(streamed.status_code, status.HTTP_200_OK)
+        self.assertFalse(whole.streaming)
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed["Content-Type"], whole["Content-Type"])
+        content = b"".join(streamed.streaming_content)
+        self.assertEqual(content, whole.content)
+        return json.loads(content)
+
+    def test_stream_large_pages(self):
+        url = drf_reverse("track-list", kwargs={"version": self.version})
+        data = self.get(url, page_size=50, page=2, ordering="-album_year")
+        self.assertEqual(len(data["results"]), 50)
+        self.assertIsNotNone(data["next"])
+
+        url = drf_reverse("album-list", kwargs={"version": self.version})
+        data = self.get(url, page_size=100)
+        self.assertEqual(len(data["results"]), 100)
+
+    @override_settings(EXACT_COUNT_THRESHOLD=5)
+    def test_stream_estimated_pages(self):
+        url = drf_reverse("artist-list", kwargs={"version": self.version})
+        data = self.get(url, page_size=10)
+        self.assertEqual(len(data["results"]), 10)
+        self.assertIsNotNone(data["next"])
+
+        data = self.get(url, page_size=10, page=3)
+        self.assertEqual(len(data["results"]), 1)
+        self.assertIsNone(data["next"])
+
+        with override_settings(STREAMING_THRESHOLD=5):
+            r = self.client.get(url, {"page_size": 10, "page": 4})
+        self.assertEqual(r.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stream_album_tracks(self):
+        url = drf_reverse(
+            "album-detail", kwargs={"version": self.version, "uuid": self.album_uuid}
+        )
+        data = self.get(url)
+        album = Album.objects.get(uuid=self.album_uuid)
+        self.assertEqual(
+            [track["uuid"] for track in data["tracks"]],
+            [str(track.uuid) for track in album.tracks.all()],
+        )
+
+    def test_rows_are_read_as_streamed(self):
+        url = drf_reverse("track-list", kwargs={"version": self.version})
+        with override_settings(STREAMING_THRESHOLD=5):
+            r = self.client.get(url, {"page_size": 300})
+        # The page's rows are read by one query, as the stream is written
+        with self.assertNumQueries(1):
+            content = b"".join(r.streaming_content)
+        self.assertEqual(len(json.loads(content)["results"]), 300)
+
+    def test_render_iterators(self):
+        renderer = StreamingJSONRenderer()
+        renderer.chunk_size = 1
+        data = {"count": 2, "results": iter([{"name": "Ten "}, {"uuid": None}])}
+        chunks = list(renderer.iter_render(data))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(
+            b"".join(chunks),
+            renderer.render({**data, "results": [{"name": "Ten "}, {"uuid": None}]}),
+        )
@@ -0,0 +1,64 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from grunge import throttling
+from grunge.throttling import take_token
+
+RATES = {"list": None, "create": "2/min"}
+
+
+@override_settings(PLAYLIST_THROTTLE_RATES=RATES)
+class PlaylistThrottleTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        throttling._buckets.clear()
+        self.client = APIClient()
+        self.url = reverse("playlist-list", kwargs={"version": "v1"})
+
+    def create(self, client=None, address="127.0.0.1"):
+        return (client or self.client).post(
+            self.url, {"name": "Ten", "tracks": []}, format="json", REMOTE_ADDR=address
+        )
+
+    def assertThrottled(self):
+        self.assertEqual(self.create().status_code, 201)
+        self.assertEqual(self.create().status_code, 201)
+        with self.assertNumQueries(0):
+            response = self.create()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_anonymous_requests_by_address(self):
+        self.assertThrottled()
+        self.assertEqual(self.create(address="10.0.0.1").status_code, 201)
+        # Other scopes have their own buckets
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_users(self):
+        self.client.force_authenticate(User.objects.create_user("eddie"))
+        self.assertThrottled()
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user("chris"))
+        self.assertEqual(self.create(other).status_code, 201)
+
+    @override_settings(PLAYLIST_THROTTLE_BUCKETS="grunge.throttling.CacheBuckets")
+    def test_shared_buckets(self):
+        self.assertThrottled()
+        cache.clear()
+        self.assertEqual(self.create().status_code, 201)
+
+
+class TakeTokenTestCase(TestCase):
+    def test_refill(self):
+        bucket, wait = take_token(None, 2, 0.5, 100)
+        self.assertEqual((bucket, wait), ((1, 100), 0))
+        bucket, wait = take_token(bucket, 2, 0.5, 100)
+        self.assertEqual((bucket, wait), ((0, 100), 0))
+        bucket, wait = take_token(bucket, 2, 0.5, 101)
+        self.assertEqual((bucket, wait), ((0.5, 101), 1))
+        bucket, wait = take_token(bucket, 2, 0.5, 110)
+        self.assertEqual((bucket, wait), ((1, 110), 0))
@@ -0,0 +1,80 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from grunge.models import Album, Artist, Playlist, Track
+from grunge.packed import pack_playlist, unpack_playlist
+
+
+class PlaylistVersionTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        artist = Artist.objects.create(name="Alice in Chains")
+        album = Album.objects.create(name="Dirt", year=1992, artist=artist)
+        self.tracks = [
+            Track.objects.create(name=name, album=album, number=number)
+            for number, name in enumerate(("Them Bones", "Dam That River"), 1)
+        ]
+        self.playlist = Playlist.objects.create(name="Dirt")
+        self.url = reverse(
+            "playlist-detail", kwargs={"version": "v1", "uuid": self.playlist.uuid}
+        )
+
+    def patch(self, **data):
+        return self.client.patch(self.url, data, format="json")
+
+    def test_writes_bump_the_version(self):
+        self.assertEqual(self.client.get(self.url).json()["version"], 1)
+
+        response = self.patch(name="Sap", version=1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["version"], 2)
+
+        # Writes without a version are made from the one they read
+        response = self.patch(tracks=[{"track": str(self.tracks[0].uuid), "order": 1}])
+        self.assertEqual(response.json()["version"], 3)
+        self.playlist.refresh_from_db()
+        self.assertEqual((self.playlist.name, self.playlist.version), ("Sap", 3))
+
+    def test_stale_writes_conflict(self):
+        self.patch(name="Sap", version=1)
+        response = self.patch(
+            name="Jar of Flies",
+            version=1,
+            tracks=[{"track": str(self.tracks[1].uuid), "order": 1}],
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()["version"], 2)
+
+        self.playlist.refresh_from_db()
+        self.assertEqual(self.playlist.name, "Sap")
+        self.assertFalse(self.playlist.playlist_tracks.exists())
+
+    def test_operations(self):
+        url = reverse(
+            "playlist-append-album",
+            kwargs={"version": "v1", "uuid": self.playlist.uuid},
+        )
+        album = str(self.tracks[0].album.uuid)
+        response = self.client.post(url, {"album": album, "version": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["version"], 2)
+
+        response = self.client.post(url, {"album": album, "version": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.playlist.playlist_tracks.count(), 2)
+
+    def test_storage_changes_bump_the_version(self):
+        pack_playlist(self.playlist)
+        self.assertEqual(self.playlist.version, 2)
+        unpack_playlist(Playlist.objects.get(pk=self.playlist.pk))
+        self.playlist.refresh_from_db()
+        self.assertEqual(self.playlist.version, 3)
+
+    def test_bump_version(self):
+        other = Playlist.objects.get(pk=self.playlist.pk)
+        self.assertTrue(self.playlist.bump_version(1))
+        self.assertFalse(other.bump_version(1))
+        self.assertTrue(other.bump_version())
+        self.assertEqual(other.version, 3)
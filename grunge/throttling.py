@@ -0,0 +1,136 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+
+def take_token(bucket, capacity, rate, now):
+    """
+    Takes a token from ``bucket``, a ``(tokens, updated)`` pair or ``None``
+    for a full one, refilled at ``rate`` tokens a second up to
+    ``capacity``.  Returns the bucket left, and ``0`` or the seconds until
+    it has a token if it has none.
+    """
+    if bucket is None:
+        tokens = capacity
+    else:
+        tokens, updated = bucket
+        tokens = min(capacity, tokens + max(0, now - updated) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / rate
+
+
+class LocalBuckets:
+    """
+    Token buckets in process memory: each worker limits the requests it
+    serves by itself.  At most ``max_size`` buckets are kept, the least
+    recently used dropped first, as full.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self.lock:
+            bucket, wait = take_token(self.buckets.get(key), capacity, rate, now)
+            self.buckets[key] = bucket
+            self.buckets.move_to_end(key)
+            if len(self.buckets) > self.max_size:
+                self.buckets.popitem(last=False)
+        return wait
+
+
+class CacheBuckets:
+    """
+    Token buckets in the default cache, so every worker sharing it, such as
+    one configured with a Redis or Memcached ``CACHE_URL``, takes from the
+    same buckets.
+
+    A bucket is read and written back without a lock, so concurrent
+    requests of one client can take the same token: limits are kept
+    approximately.  Buckets expire once they would be full again.
+    """
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        key = f"throttle:{key}"
+        bucket, wait = take_token(cache.get(key), capacity, rate, now)
+        cache.set(key, bucket, math.ceil(capacity / rate))
+        return wait
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_buckets():
+    """
+    Returns this process's instance of the ``PLAYLIST_THROTTLE_BUCKETS``
+    class.
+    """
+    path = settings.PLAYLIST_THROTTLE_BUCKETS
+    with _buckets_lock:
+        if path not in _buckets:
+            _buckets[path] = import_string(path)()
+        return _buckets[path]
+
+
+class PlaylistThrottle(BaseThrottle):
+    """
+    Limits the rate of playlist API requests with a token bucket for each
+    user, or for each IP address of anonymous requests, and each scope of
+    actions.  The ``PLAYLIST_THROTTLE_RATES`` setting gives each scope's
+    rate, such as ``"60/min"``, which also allows a burst of as many
+    requests, or ``None`` for no limit.
+    """
+
+    scopes = {
+        "list": "list",
+        "retrieve": "retrieve",
+        "shuffle": "retrieve",
+        "changes": "retrieve",
+        "continue_playlist": "retrieve",
+        "create": "create",
+        "fork": "create",
+        "update": "update",
+        "partial_update": "update",
+        "destroy": "update",
+        "append_album": "reorder",
+        "append_artist": "reorder",
+        "merge": "reorder",
+        "dedupe": "reorder",
+    }
+
+    def parse_rate(self, rate):
+        """
+        Returns the capacity and refill rate, in tokens a second, of
+        ``rate``.
+        """
+        capacity, duration = SimpleRateThrottle.parse_rate(None, rate)
+        return capacity, capacity / duration
+
+    def allow_request(self, request, view):
+        scope = self.scopes.get(getattr(view, "action", None))
+        rate = settings.PLAYLIST_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        if request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        capacity, refill = self.parse_rate(rate)
+        self.wait_seconds = get_buckets().take(f"{scope}:{ident}", capacity, refill)
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
@@ -4,10 +4,13 @@ from django.urls import include, path, re_path
 from django.views.generic.base import RedirectView
 from rest_framework.routers import DefaultRouter
 
+from .events import playlist_events
 from .viewsets import (
     AlbumViewSet,
     ArtistViewSet,
+    CatalogueChangeViewSet,
     PlaylistViewSet,
+    SmartPlaylistViewSet,
     TrackViewSet,
     mainpage,
 )
@@ -25,9 +28,16 @@ if settings.DJANGO_API_ENABLED:
     api_router = DefaultRouter(trailing_slash=False)
     api_router.register("artists", ArtistViewSet)
     api_router.register("albums", AlbumViewSet)
-    api_router.register("tracks", TrackViewSet)
+    api_router.register("tracks", TrackViewSet, basename="track")
     api_router.register(r"playlists", PlaylistViewSet)
+    api_router.register(r"smart-playlists", SmartPlaylistViewSet)
+    api_router.register(r"changes", CatalogueChangeViewSet)
 
     urlpatterns += [
+        path(
+            "api/<version>/playlist-events",
+            playlist_events,
+            name="playlist-events",
+        ),
         path("api/<version>/", include(api_router.urls)),
     ]
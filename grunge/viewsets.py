@@ -1,24 +1,163 @@
+import secrets
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
-from rest_framework import status, viewsets
+from django.urls import reverse
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from . import events, idempotency, operations, routers
 from .filters import AlbumFilter, ArtistFilter, TrackFilter
-from .models import Album, Artist, Playlist, Track
+from .models import (
+    Album,
+    Artist,
+    CatalogueChange,
+    Playlist,
+    SmartPlaylist,
+    Track,
+    TrackListing,
+)
+from .pagination import (
+    CachedQuerySetWindow,
+    SequencePagination,
+    ShufflePagination,
+)
+from .recommendations import get_playlist_continuation, get_similar_tracks
+from .renderers import StreamingJSONRenderer
 from .serializers import (
     AlbumSerializer,
     ArtistSerializer,
+    CatalogueChangeSerializer,
+    PlaylistAppendAlbumSerializer,
+    PlaylistAppendArtistSerializer,
+    PlaylistChangeSerializer,
+    PlaylistForkSerializer,
+    PlaylistMergeSerializer,
     PlaylistSerializer,
+    PlaylistSummarySerializer,
+    PlaylistTrackSerializer,
+    SmartPlaylistSerializer,
+    TrackListingSerializer,
     TrackSerializer,
+    bump_playlist_version,
 )
+from .shuffle import ShuffledPlaylistTracks
+from .throttling import PlaylistThrottle
+
+
+def get_limit(request, default=10, max_value=100):
+    """
+    Parses the ``limit`` query parameter of unpaginated list actions.
+    """
+    try:
+        return serializers.IntegerField(
+            min_value=1, max_value=max_value
+        ).run_validation(request.query_params.get("limit", default))
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({"limit": exc.detail})
+
+
+def get_version(request):
+    """
+    Parses the ``version`` a playlist write was made from, if it has one.
+    """
+    version = request.data.get("version")
+    if version is None:
+        return None
+    try:
+        return serializers.IntegerField(min_value=1).run_validation(version)
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({"version": exc.detail})
+
 
 class BaseAPIViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Base viewset for read-only APIs using UUID as the lookup field.
     All other read-only viewsets (e.g., Artist, Album, Track) inherit from this class.
     """
+
     lookup_field = "uuid"
     lookup_url_kwarg = "uuid"
+    # Responses are cached until the next catalogue write, see
+    # grunge.compression
+    cache_responses = True
+    # Rows read from the database at a time, while streaming
+    streaming_chunk_size = 100
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Reads from a replica database, when there are any.
+        """
+        with routers.replica_reads(request):
+            return super().dispatch(request, *args, **kwargs)
+
+    def is_streamed(self, rows):
+        """
+        Whether to stream a response listing ``rows`` rows.  Only responses
+        of more than ``STREAMING_THRESHOLD`` rows are, as smaller ones are
+        faster to render whole.
+        """
+        return (
+            isinstance(self.request.accepted_renderer, StreamingJSONRenderer)
+            and rows > settings.STREAMING_THRESHOLD
+        )
+
+    def get_streaming_response(self, data):
+        renderer = self.request.accepted_renderer
+        return StreamingHttpResponse(
+            renderer.iter_render(
+                data, self.request.accepted_media_type, self.get_renderer_context()
+            ),
+            content_type=renderer.media_type,
+        )
 
+    def list(self, request, *args, **kwargs):
+        """
+        Streams large pages, serializing and writing each row as it is read,
+        so a page's size does not change the memory it takes.
+        """
+        if not hasattr(self.paginator, "paginate_lazily") or not self.is_streamed(
+            self.paginator.get_page_size(request)
+        ):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginator.paginate_lazily(queryset, request, view=self)
+        # Reads from the database chosen now, as the response is streamed
+        # after the view returns
+        page = page.using(page.db)
+        serializer = self.get_serializer()
+        rows = (
+            serializer.to_representation(row)
+            for row in page.iterator(self.streaming_chunk_size)
+        )
+        return self.get_streaming_response(
+            self.paginator.get_paginated_response(rows).data
+        )
+
+    def get_streamed_rows(self, instance):
+        """
+        Returns the number of rows the detail of ``instance`` lists, to tell
+        whether it is streamed.
+        """
+        return 0
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Streams details listing many rows, whose serializers' nested lists
+        are read as they are written.
+        """
+        instance = self.get_object()
+        if not self.is_streamed(self.get_streamed_rows(instance)):
+            return Response(self.get_serializer(instance).data)
+
+        context = {**self.get_serializer_context(), "streaming": True}
+        serializer = self.get_serializer(instance, context=context)
+        return self.get_streaming_response(serializer.data)
 
 
 class ArtistViewSet(BaseAPIViewSet):
@@ -26,9 +165,11 @@ class ArtistViewSet(BaseAPIViewSet):
     API endpoint that allows read-only access to artist data.
     Supports filtering via ArtistFilter.
     """
+
     queryset = Artist.objects.all()
     serializer_class = ArtistSerializer
     filterset_class = ArtistFilter
+    ordering_fields = ("name",)
 
 
 class AlbumViewSet(BaseAPIViewSet):
@@ -37,35 +178,48 @@ class AlbumViewSet(BaseAPIViewSet):
     Supports filtering via AlbumFilter.
     Optimizes query performance using select_related and prefetch_related.
     """
+
     queryset = Album.objects.all()
     serializer_class = AlbumSerializer
     filterset_class = AlbumFilter
+    ordering_fields = ("name", "year")
 
     def get_queryset(self):
         """
         Optimizes album queries by fetching related artist and tracks in a single DB call.
         """
-        queryset = super().get_queryset()
-        return queryset.select_related("artist").prefetch_related("tracks")
+        queryset = super().get_queryset().select_related("artist")
+        if getattr(self, "action", None) == "retrieve":
+            # Tells whether the album is streamed, before its tracks are read
+            return queryset.annotate(track_count=Count("tracks"))
+        return queryset.prefetch_related("tracks")
+
+    def get_streamed_rows(self, album):
+        return album.track_count
 
 
 class TrackViewSet(BaseAPIViewSet):
     """
     API endpoint that allows read-only access to track data.
     Supports filtering via TrackFilter.
-    Uses select_related to reduce database queries for album and artist info.
+    Reads the flat TrackListing rows, which carry the album and artist info.
     """
-    queryset = Track.objects.all()
-    serializer_class = TrackSerializer
+
+    queryset = TrackListing.objects.all()
+    serializer_class = TrackListingSerializer
     filterset_class = TrackFilter
+    ordering_fields = ("name", "album_year", "artist_name")
 
-    def get_queryset(self):
+    @action(detail=True)
+    def similar(self, request, *args, **kwargs):
         """
-        Optimizes track queries by fetching album and artist in one go.
+        Lists the tracks that most often share a playlist with this track.
         """
-        queryset = super().get_queryset()
-        return queryset.select_related("album", "album__artist")
-
+        tracks = get_similar_tracks(self.get_object().track_id, get_limit(request))
+        serializer = TrackSerializer(
+            tracks, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
 
 
 class PlaylistViewSet(viewsets.ModelViewSet):
@@ -73,9 +227,18 @@ class PlaylistViewSet(viewsets.ModelViewSet):
     API endpoint that allows full CRUD operations on playlists.
     Uses UUID for lookup and handles playlist creation, update, and deletion.
     """
+
     queryset = Playlist.objects.all().order_by("name")
     serializer_class = PlaylistSerializer
     lookup_field = "uuid"
+    ordering_fields = ("name",)
+    throttle_classes = (PlaylistThrottle,)
+
+    def create(self, request, *args, **kwargs):
+        return idempotency.write_once(request, super().create, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        return idempotency.write_once(request, super().update, *args, **kwargs)
 
     def perform_destroy(self, instance):
         """
@@ -84,11 +247,211 @@ class PlaylistViewSet(viewsets.ModelViewSet):
         instance.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=True)
+    def shuffle(self, request, *args, **kwargs):
+        """
+        Lists a window of the playlist's tracks in a seeded, repeatable
+        shuffle.  Only the tracks in the requested window are fetched.
+        """
+        playlist = self.get_object()
+        seed = request.query_params.get("seed")
+        if seed is None:
+            seed = secrets.randbelow(2**31)
+        else:
+            try:
+                seed = serializers.IntegerField(min_value=0).run_validation(seed)
+            except serializers.ValidationError as exc:
+                raise serializers.ValidationError({"seed": exc.detail})
+
+        paginator = ShufflePagination(seed)
+        page = paginator.paginate_queryset(
+            ShuffledPlaylistTracks(playlist, seed), request, view=self
+        )
+        serializer = PlaylistTrackSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True)
+    def changes(self, request, *args, **kwargs):
+        """
+        Lists the operations applied to the playlist after the ``since``
+        sequence number, oldest first.  Pass the returned ``sequence`` as
+        ``since`` to read the following changes.
+        """
+        paginator = SequencePagination()
+        page = paginator.paginate_queryset(
+            self.get_object().changes.all(), request, view=self
+        )
+        serializer = PlaylistChangeSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, url_path="continue", url_name="continue")
+    def continue_playlist(self, request, *args, **kwargs):
+        """
+        Lists recommended tracks to continue the playlist with.
+        """
+        try:
+            tracks = get_playlist_continuation(
+                self.get_object(), get_limit(request)
+            )
+        except ValueError as exc:
+            raise serializers.ValidationError({"non_field_errors": [str(exc)]})
+        serializer = TrackSerializer(
+            tracks, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    def run_operation(
+        self, operation, serializer_class=None, writes_playlist=True, **kwargs
+    ):
+        """
+        Runs a set-based composition operation on the playlist and responds
+        with its summary.  Operations changing the playlist may send the
+        ``version`` they were made from, as updates do.
+        """
+        arguments = {}
+        if serializer_class is not None:
+            serializer = serializer_class(data=self.request.data)
+            serializer.is_valid(raise_exception=True)
+            arguments = serializer.validated_data
+
+        playlist = self.get_object()
+        try:
+            with transaction.atomic():
+                if writes_playlist:
+                    bump_playlist_version(playlist, get_version(self.request))
+                summary = operation(playlist, **arguments)
+        except ValueError as exc:
+            raise serializers.ValidationError({"non_field_errors": [str(exc)]})
+
+        serializer = PlaylistSummarySerializer(
+            summary, context=self.get_serializer_context()
+        )
+        return Response(serializer.data, **kwargs)
+
+    @action(detail=True, methods=["post"], url_path="append-album")
+    def append_album(self, request, *args, **kwargs):
+        return self.run_operation(
+            operations.append_album, PlaylistAppendAlbumSerializer
+        )
+
+    @action(detail=True, methods=["post"], url_path="append-artist")
+    def append_artist(self, request, *args, **kwargs):
+        return self.run_operation(
+            operations.append_artist, PlaylistAppendArtistSerializer
+        )
+
+    @action(detail=True, methods=["post"])
+    def merge(self, request, *args, **kwargs):
+        return self.run_operation(operations.merge_playlists, PlaylistMergeSerializer)
+
+    @action(detail=True, methods=["post"])
+    def dedupe(self, request, *args, **kwargs):
+        return self.run_operation(operations.dedupe_playlist)
+
+    @action(detail=True, methods=["post"])
+    def fork(self, request, *args, **kwargs):
+        return self.run_operation(
+            operations.fork_playlist,
+            PlaylistForkSerializer,
+            writes_playlist=False,
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class SmartPlaylistViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint that allows full CRUD operations on rule-based playlists.
+    Tracks are derived from the rules and paginated as they are read.
+    """
+
+    queryset = SmartPlaylist.objects.select_related("artist")
+    serializer_class = SmartPlaylistSerializer
+    lookup_field = "uuid"
+    lookup_url_kwarg = "uuid"
+    ordering_fields = ("name",)
+
+    @action(detail=True)
+    def tracks(self, request, *args, **kwargs):
+        """
+        Lists the playlist's tracks, reading and caching one page at a time.
+        """
+        smart_playlist = self.get_object()
+        window = CachedQuerySetWindow(
+            smart_playlist.get_tracks(),
+            smart_playlist.cache_key,
+            fetch_queryset=Track.objects.select_related("album", "album__artist"),
+        )
+        page = self.paginate_queryset(window)
+        serializer = TrackSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+
+class CatalogueChangeViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    API endpoint listing the artists, albums and tracks written or deleted
+    after the ``since`` sequence number, each once, oldest first.
+    Pass the returned ``sequence`` as ``since`` to read the following changes.
+    """
+
+    queryset = CatalogueChange.objects.all()
+    serializer_class = CatalogueChangeSerializer
+    pagination_class = SequencePagination
+    filter_backends = ()
+
+    # The querysets the catalogue endpoints render their objects from
+    catalogue_querysets = {
+        CatalogueChange.Kind.ARTIST: Artist.objects.all(),
+        CatalogueChange.Kind.ALBUM: Album.objects.select_related(
+            "artist"
+        ).prefetch_related("tracks"),
+        CatalogueChange.Kind.TRACK: Track.objects.select_related(
+            "album", "album__artist"
+        ),
+    }
+
+    def get_catalogue_objects(self, page):
+        """
+        Fetches the objects upserted in ``page`` with one query per kind.
+        """
+        uuids = {}
+        for change in page:
+            if not change.deleted:
+                uuids.setdefault(change.kind, []).append(change.object_uuid)
+
+        return {
+            (kind, uuid): instance
+            for kind, kind_uuids in uuids.items()
+            for uuid, instance in self.catalogue_querysets[kind]
+            .all()
+            .in_bulk(kind_uuids, field_name="uuid")
+            .items()
+        }
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(
+            page,
+            many=True,
+            context={
+                **self.get_serializer_context(),
+                "objects": self.get_catalogue_objects(page),
+            },
+        )
+        return self.get_paginated_response(serializer.data)
 
 
 def mainpage(request):
     """
     Renders the main homepage using a simple Django HTML template.
     """
-    return render(request, "home.html")
+    context = {}
+    # The page refreshes its playlists on events where they are streamed
+    if events.can_stream_events(request):
+        version = settings.REST_FRAMEWORK["DEFAULT_VERSION"]
+        context["playlist_events_url"] = reverse(
+            "playlist-events", kwargs={"version": version}
+        )
+    return render(request, "home.html", context)
 